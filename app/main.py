@@ -2,30 +2,59 @@
 #import eventlet
 #eventlet.monkey_patch()
 
-from flask import Flask
-from flask_login import LoginManager
-from flask_bcrypt import Bcrypt
+from flask import Flask, jsonify
+from flask_login import LoginManager, login_required
 from flask_mail import Mail
 from flask_socketio import SocketIO
-from app.utils.mail import mail
+from app.utils.mail import mail, mail_outbox
 from dotenv import load_dotenv
 import os
 
 from app.routes.auth import auth_bp, init_auth
-from app.routes.projects import projects_bp, init_projects
-from app.routes.cards import cards_bp, init_cards
+from app.routes.projects import projects_bp
+from app.routes.cards import cards_bp
+from app.routes.uploads import uploads_bp
 from app.routes.socket import register_socket_events
+from app.utils.indexes import ensure_indexes, verify_indexes
+from app.utils.helpers import logger
+from app.utils.db import mongo_client_options, pool_stats
+from app.utils.user_cache import get_user_identity
+from app.utils.notifications import notification_fanout
+from app.utils.history import history_writer
+from app.utils.ranking import find_projects_needing_rebalance, rebalance_project_ranks, run_rank_rebalancer
+from app.utils.search import rebuild_search_index
+from app.utils.counters import reconcile_card_counts, run_counter_reconciler
+from app.utils.pubsub import socketio_queue_options
+from app.utils.serialize import FastJSONProvider, SocketIOJSON
+from app.utils.changes import change_broadcaster, enable_pre_images
+from app.utils.invalidation import invalidation_bus
+from app.utils.images import image_store
+from app.utils.passwords import password_hasher
+from app.utils.upload_sessions import upload_sessions
 from app import mongo  # ✅ 이제 여기에 mongo 있음
+import click
 
 # 환경 변수 로드
 load_dotenv()
 
+# 프로세스 풀(이미지 변환 등)의 자식 프로세스는 `python -m app.main`으로 실행된 이 모듈을
+# __mp_main__으로 다시 불러오므로, 그때는 인덱스 생성과 백그라운드 작업을 시작하지 않음
+POOL_CHILD = __name__ == "__mp_main__"
+
 # Flask 앱 설정
 app = Flask(__name__)
 #app.config["MONGO_URI"] = f"mongodb://{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 app.config["MONGO_URI"] = os.getenv('DB_STRING')
 app.secret_key = os.getenv('SECRET_KEY')
 
+# 🔑 비밀번호 해시 (bcrypt cost, 해시 전용 프로세스 수, 동시에 맡길 수 있는 작업 수, 대기 제한 시간)
+app.config.update(
+    BCRYPT_LOG_ROUNDS=int(os.getenv('BCRYPT_LOG_ROUNDS', 12)),
+    PASSWORD_HASH_WORKERS=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+    PASSWORD_HASH_MAX_PENDING=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 8)),
+    PASSWORD_HASH_TIMEOUT=float(os.getenv('PASSWORD_HASH_TIMEOUT', 10)),
+)
+
 # 🔐 Flask-Mail 설정
 app.config.update(
     MAIL_SERVER=os.getenv('MAIL_SERVER'),
@@ -35,11 +64,24 @@ app.config.update(
     MAIL_PASSWORD=os.getenv('MAIL_PASSWORD'),
 )
 
+# 🗄️ MongoDB 커넥션 풀 설정 (워커당 하나의 MongoClient를 모든 블루프린트가 공유)
+app.config.update(
+    MONGO_MAX_POOL_SIZE=int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+    MONGO_MIN_POOL_SIZE=int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+    MONGO_WAIT_QUEUE_TIMEOUT_MS=int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+    MONGO_MAX_IDLE_TIME_MS=int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000)),
+)
+
 # ✅ 확장 기능 초기화
-mongo.init_app(app)
-bcrypt = Bcrypt(app)
+mongo.init_app(app, **mongo_client_options(app.config))
+# Flask-PyMongo가 설치하는 bson.json_util 기반 공급자 대신 사용 (ObjectId는 문자열, datetime은 ISO 8601)
+app.json = FastJSONProvider(app)
 mail.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# 📡 워커 간 Socket.IO 메시지 큐 (unix:// 또는 unix:///0700 전용 경로, redis://... / 비우면 사용 안 함)
+app.config["SOCKETIO_MESSAGE_QUEUE"] = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+app.config["SOCKETIO_CHANNEL"] = os.getenv('SOCKETIO_CHANNEL', 'collab-socketio')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', json=SocketIOJSON,
+                    **socketio_queue_options(app.config["SOCKETIO_MESSAGE_QUEUE"], app.config["SOCKETIO_CHANNEL"]))
 
 # 로그인 매니저 설정
 login_manager = LoginManager()
@@ -52,7 +94,6 @@ class User:
     def __init__(self, user_data):
         self.id = str(user_data["_id"])
         self.nickname = user_data.get("nickname", "알수없음")
-        self.invitations = user_data.get("invitations", [])
 
     def get_id(self):
         return self.id
@@ -72,21 +113,217 @@ class User:
 # 로그인 세션 로딩
 @login_manager.user_loader
 def load_user(user_id):
-    from bson import ObjectId
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    user_data = get_user_identity(mongo, user_id)
     return User(user_data) if user_data else None
 
+password_hasher.init_app(
+    app,
+    workers=0 if POOL_CHILD else app.config["PASSWORD_HASH_WORKERS"],
+    max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+    timeout=app.config["PASSWORD_HASH_TIMEOUT"]
+)
+
 # Blueprint 등록 및 초기화
 init_auth(app)
-init_projects(app)
-init_cards(app)
 app.register_blueprint(auth_bp)
 app.register_blueprint(projects_bp)
 app.register_blueprint(cards_bp)
+app.register_blueprint(uploads_bp)
 
 # ✅ 소켓 이벤트 등록
 register_socket_events(socketio)
 
+# 🧹 워커 간 캐시 무효화 (멤버십 캐시 등을 바꾼 워커가 기록하면 다른 워커도 같은 항목을 지움)
+app.config.update(
+    CACHE_INVALIDATION_LOG_SIZE=int(os.getenv('CACHE_INVALIDATION_LOG_SIZE', 1024 * 1024)),
+)
+invalidation_bus.init_app(
+    mongo, None if POOL_CHILD else socketio,
+    size=app.config["CACHE_INVALIDATION_LOG_SIZE"]
+)
+
+# 🔔 알림 팬아웃 (NOTIFY_ASYNC=True 이면 이벤트 처리와 분리된 워커 큐에서 전송)
+app.config.update(
+    NOTIFY_ASYNC=os.getenv('NOTIFY_ASYNC', 'False') == 'True',
+    NOTIFY_QUEUE_SIZE=int(os.getenv('NOTIFY_QUEUE_SIZE', 1000)),
+    NOTIFY_WORKERS=int(os.getenv('NOTIFY_WORKERS', 2)),
+)
+notification_fanout.init_app(
+    mongo, socketio,
+    async_delivery=app.config["NOTIFY_ASYNC"] and not POOL_CHILD,
+    queue_size=app.config["NOTIFY_QUEUE_SIZE"],
+    workers=app.config["NOTIFY_WORKERS"]
+)
+
+# 커넥션 풀 통계
+@app.route("/internal/db/pool", methods=["GET"])
+@login_required
+def get_pool_stats():
+    return jsonify(pool_stats.snapshot()), 200
+
+# 비밀번호 해시 풀 통계 (대기/계산 시간, 거부 수)
+@app.route("/internal/auth/hasher", methods=["GET"])
+@login_required
+def get_password_hasher_stats():
+    return jsonify(password_hasher.snapshot()), 200
+
+# 📝 히스토리 write-behind 버퍼 (HISTORY_SYNC=True 이면 매번 즉시 기록, 테스트용)
+app.config.update(
+    HISTORY_SYNC=os.getenv('HISTORY_SYNC', 'False') == 'True',
+    HISTORY_BATCH_SIZE=int(os.getenv('HISTORY_BATCH_SIZE', 100)),
+    HISTORY_FLUSH_INTERVAL=float(os.getenv('HISTORY_FLUSH_INTERVAL', 0.5)),
+    HISTORY_MAX_BUFFER=int(os.getenv('HISTORY_MAX_BUFFER', 5000)),
+)
+history_writer.init_app(
+    mongo, None if POOL_CHILD else socketio,
+    sync=app.config["HISTORY_SYNC"],
+    batch_size=app.config["HISTORY_BATCH_SIZE"],
+    flush_interval=app.config["HISTORY_FLUSH_INTERVAL"],
+    max_buffer=app.config["HISTORY_MAX_BUFFER"]
+)
+
+# 🗂️ 인덱스 생성 (MONGO_ENSURE_INDEXES=False 이면 CLI로만 수행)
+app.config["MONGO_ENSURE_INDEXES"] = os.getenv('MONGO_ENSURE_INDEXES', 'True') == 'True'
+if app.config["MONGO_ENSURE_INDEXES"] and not POOL_CHILD:
+    try:
+        ensure_indexes(mongo)
+    except Exception as e:
+        logger.error(f"Failed to ensure indexes on startup: {str(e)}")
+
+# 🖼️ 댓글 이미지 저장소 (내용 해시 이름으로 중복 제거, 축소본은 프로세스 풀에서 생성)
+app.config.update(
+    COMMENT_IMAGE_MAX_BYTES=int(os.getenv('COMMENT_IMAGE_MAX_BYTES', 10 * 1024 * 1024)),
+    IMAGE_WORKERS=int(os.getenv('IMAGE_WORKERS', 2)),
+)
+# 요청 본문 전체 크기 제한 (이미지 + 폼 필드 여유분)
+app.config["MAX_CONTENT_LENGTH"] = app.config["COMMENT_IMAGE_MAX_BYTES"] + 1024 * 1024
+image_store.init_app(
+    os.path.join(app.static_folder, "Uploads"),
+    max_bytes=app.config["COMMENT_IMAGE_MAX_BYTES"],
+    workers=0 if POOL_CHILD else app.config["IMAGE_WORKERS"]
+)
+# 📤 이어 올리기 세션 (받는 중인 파일은 정적 파일로 노출되지 않도록 instance 폴더에 둠)
+app.config.update(
+    UPLOAD_SESSION_DIR=os.getenv('UPLOAD_SESSION_DIR') or os.path.join(app.instance_path, "upload_sessions"),
+    UPLOAD_CHUNK_SIZE=int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024)),
+    UPLOAD_SESSION_TTL=int(os.getenv('UPLOAD_SESSION_TTL', 24 * 60 * 60)),
+)
+upload_sessions.init_app(
+    app.config["UPLOAD_SESSION_DIR"],
+    chunk_size=app.config["UPLOAD_CHUNK_SIZE"],
+    ttl_seconds=app.config["UPLOAD_SESSION_TTL"]
+)
+# /uploads 전송 방식 (UPLOADS_ACCEL_REDIRECT=/nginx의 internal location 이면 nginx가 파일을 보냄,
+# USE_X_SENDFILE=True 이면 Apache/lighttpd의 X-Sendfile, 둘 다 없으면 앱이 직접 전송)
+app.config.update(
+    UPLOADS_ACCEL_REDIRECT=(os.getenv('UPLOADS_ACCEL_REDIRECT') or "").rstrip("/") or None,
+    USE_X_SENDFILE=os.getenv('USE_X_SENDFILE', 'False') == 'True',
+)
+
+# 📮 메일 발송함 (MAIL_OUTBOX_INTERVAL=0 이면 백그라운드 발송 없이 CLI로만 발송)
+app.config.update(
+    MAIL_OUTBOX_INTERVAL=float(os.getenv('MAIL_OUTBOX_INTERVAL', 5)),
+    MAIL_OUTBOX_MAX_ATTEMPTS=int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 5)),
+    MAIL_OUTBOX_RETRY_BASE=int(os.getenv('MAIL_OUTBOX_RETRY_BASE', 30)),
+    MAIL_OUTBOX_PER_CONNECTION=int(os.getenv('MAIL_OUTBOX_PER_CONNECTION', 50)),
+    MAIL_OUTBOX_MAX_DEFERRALS=int(os.getenv('MAIL_OUTBOX_MAX_DEFERRALS', 100)),
+)
+mail_outbox.init_app(
+    app, mongo, None if POOL_CHILD else socketio,
+    interval=app.config["MAIL_OUTBOX_INTERVAL"],
+    max_attempts=app.config["MAIL_OUTBOX_MAX_ATTEMPTS"],
+    retry_base=app.config["MAIL_OUTBOX_RETRY_BASE"],
+    per_connection=app.config["MAIL_OUTBOX_PER_CONNECTION"],
+    max_deferrals=app.config["MAIL_OUTBOX_MAX_DEFERRALS"]
+)
+
+# 📡 변경 스트림 기반 실시간 전송 (레플리카 셋 필요, 켜면 클라이언트 중계 대신 DB 변경을 직접 전송)
+app.config.update(
+    REALTIME_CHANGE_STREAM=os.getenv('REALTIME_CHANGE_STREAM', 'False') == 'True',
+    CHANGE_STREAM_TOKEN_SAVE_INTERVAL=float(os.getenv('CHANGE_STREAM_TOKEN_SAVE_INTERVAL', 1.0)),
+    CHANGE_STREAM_LEADER_LEASE=int(os.getenv('CHANGE_STREAM_LEADER_LEASE', 15)),
+)
+if app.config["REALTIME_CHANGE_STREAM"] and not POOL_CHILD:
+    try:
+        enable_pre_images(mongo)
+    except Exception as e:
+        logger.error(f"Failed to enable change stream pre-images on startup: {str(e)}")
+change_broadcaster.init_app(
+    mongo, socketio,
+    enabled=app.config["REALTIME_CHANGE_STREAM"] and not POOL_CHILD,
+    save_interval=app.config["CHANGE_STREAM_TOKEN_SAVE_INTERVAL"],
+    lease=app.config["CHANGE_STREAM_LEADER_LEASE"]
+)
+
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """인덱스를 생성합니다."""
+    for name in ensure_indexes(mongo):
+        click.echo(name)
+
+@app.cli.command("verify-indexes")
+def verify_indexes_command():
+    """주요 쿼리의 실행 계획을 확인하고 COLLSCAN이나 검색어로 좁히지 못한 색인 스캔이 있으면 실패합니다."""
+    failures = verify_indexes(mongo)
+    for name, reason in failures:
+        click.echo(f"{reason}: {name}", err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo("모든 쿼리가 인덱스를 사용합니다.")
+
+@app.cli.command("migrate-card-ranks")
+def migrate_card_ranks_command():
+    """기존 정수 order 값을 rank 키로 변환하고, 너무 길어진 rank 키를 다시 배치합니다."""
+    project_ids = find_projects_needing_rebalance(mongo)
+    for project_id in project_ids:
+        count = rebalance_project_ranks(mongo, project_id)
+        click.echo(f"{project_id}: {count} cards")
+    click.echo(f"{len(project_ids)}개 프로젝트의 카드 순서를 재배치했습니다.")
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """프로젝트/카드 검색 색인을 처음부터 다시 만듭니다."""
+    count, removed = rebuild_search_index(mongo)
+    click.echo(f"{count}개 항목을 색인했고 {removed}개 항목을 제거했습니다.")
+
+@app.cli.command("enable-change-stream-pre-images")
+def enable_pre_images_command():
+    """삭제 이벤트 전송에 필요한 변경 전 문서(pre-image) 기록을 켭니다. (MongoDB 6.0+)"""
+    for name in enable_pre_images(mongo):
+        click.echo(name)
+
+@app.cli.command("sweep-comment-images")
+def sweep_comment_images_command():
+    """어떤 댓글도 참조하지 않는 댓글 이미지 파일과 만료된 업로드 조각 파일을 삭제합니다."""
+    removed = image_store.sweep_orphans(mongo)
+    click.echo(f"{removed}개 이미지를 삭제했습니다.")
+    parts = upload_sessions.sweep(mongo)
+    click.echo(f"{parts}개 만료된 업로드 조각 파일을 삭제했습니다.")
+
+@app.cli.command("drain-mail-outbox")
+def drain_mail_outbox_command():
+    """발송함에서 보낼 차례가 된 메일을 지금 보냅니다."""
+    sent = mail_outbox.deliver_pending(mongo)
+    click.echo(f"{sent}개 메일을 보냈습니다.")
+    for status, count in sorted(mail_outbox.stats(mongo).items()):
+        click.echo(f"{status}: {count}")
+
+@app.cli.command("reconcile-card-counts")
+def reconcile_card_counts_command():
+    """프로젝트별 카드 카운터를 실제 카드 개수와 맞춥니다."""
+    fixed = reconcile_card_counts(mongo)
+    click.echo(f"{fixed}개 프로젝트의 카드 카운터를 수정했습니다.")
+
+# 🔀 카드 rank 재배치 백그라운드 작업 (0이면 비활성화)
+app.config["RANK_REBALANCE_INTERVAL"] = int(os.getenv('RANK_REBALANCE_INTERVAL', 60))
+if app.config["RANK_REBALANCE_INTERVAL"] > 0 and not POOL_CHILD:
+    socketio.start_background_task(run_rank_rebalancer, mongo, socketio.sleep, app.config["RANK_REBALANCE_INTERVAL"])
+
+# 🧮 카드 카운터 보정 백그라운드 작업 (0이면 비활성화)
+app.config["CARD_COUNT_RECONCILE_INTERVAL"] = int(os.getenv('CARD_COUNT_RECONCILE_INTERVAL', 3600))
+if app.config["CARD_COUNT_RECONCILE_INTERVAL"] > 0 and not POOL_CHILD:
+    socketio.start_background_task(run_counter_reconciler, mongo, socketio.sleep, app.config["CARD_COUNT_RECONCILE_INTERVAL"])
+
 # 서버 실행
 if __name__ == "__main__":
     socketio.run(app, debug=True)
@@ -1,11 +1,15 @@
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from flask_pymongo import PyMongo
-from flask_bcrypt import Bcrypt
-from flask_mail import Message
-from app.utils.mail import mail
+from app.utils.mail import mail_outbox
+from app.utils.passwords import PasswordHasherBusy, password_hasher
 from app.utils.helpers import logger
+from app import mongo
+from app.utils.membership import invalidate_membership
+from app.utils.user_cache import invalidate_user
+from app.utils.search import index_user, unindex, unindex_projects
+from app.utils.summary import project_summaries
+from app.utils.changes import change_broadcaster
 from bson import ObjectId
 from authlib.integrations.flask_client import OAuth
 import os
@@ -18,9 +22,7 @@ serializer = None
 auth_bp = Blueprint('auth', __name__)
 
 def init_auth(app):
-    global mongo, bcrypt, oauth, serializer
-    mongo = PyMongo(app)
-    bcrypt = Bcrypt(app)
+    global oauth, serializer
     oauth = OAuth(app)
     serializer = URLSafeTimedSerializer(app.secret_key)
 
@@ -51,6 +53,12 @@ def home():
         return redirect(url_for("auth.dashboard"))
     return redirect(url_for("auth.login"))
 
+# 비밀번호 해시 작업이 밀려 있을 때
+@auth_bp.errorhandler(PasswordHasherBusy)
+def handle_password_hasher_busy(e):
+    flash("요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요.", "warning")
+    return redirect(request.url)
+
 # 회원가입
 @auth_bp.route("/register", methods=["GET", "POST"])
 def register():
@@ -59,7 +67,6 @@ def register():
         nickname = request.form["nickname"].strip()
         password = request.form["password"]
         confirm_password = request.form["confirm_password"]
-        hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
 
         # 이메일 유효성 검사
         email_regex = r"^[\w\.-]+@[\w\.-]+\.\w+$"
@@ -82,8 +89,8 @@ def register():
             return redirect(url_for("auth.register"))
 
         # 기존 이메일 중복 확인
-        if mongo.db.users.find_one({"email": email}):
-            existing_user = mongo.db.users.find_one({"email": email})
+        existing_user = mongo.db.users.find_one({"email": email})
+        if existing_user:
             if existing_user.get("is_verified", True):
                 flash("이미 등록된 사용자입니다. 로그인을 시도해주세요.", "danger")
                 return redirect(url_for("auth.login"))
@@ -91,20 +98,23 @@ def register():
                 flash("이미 등록된 이메일입니다. 이메일 인증 후 로그인해주세요.", "warning")
                 return redirect(url_for("auth.resend_verification", email=email))
 
+        # 검증을 모두 통과한 뒤에만 해시 (bcrypt 비용)
+        hashed_password = password_hasher.hash(password)
+
         # 이메일 인증 토큰 생성
         token = serializer.dumps(email, salt='email-confirm')
         verify_link = url_for('auth.confirm_email', token=token, _external=True)
 
-        msg = Message(
+        mail_outbox.enqueue(
+            mongo,
             subject="회원가입 이메일 인증",
             sender=os.environ.get("MAIL_USERNAME"),
             recipients=[email],
             body=f"[CollabTool] 아래 링크를 클릭해 이메일 인증을 완료해주세요:\n\n{verify_link}\n\n이 링크는 1시간 동안만 유효합니다."
         )
-        mail.send(msg)
 
         # 사용자 저장
-        mongo.db.users.insert_one({
+        result = mongo.db.users.insert_one({
             "email": email,
             "nickname": nickname,
             "password": hashed_password,
@@ -112,6 +122,7 @@ def register():
             "invitations": [],
             "is_verified": False
         })
+        index_user(mongo, {"_id": result.inserted_id, "nickname": nickname})
 
         flash("회원가입 완료! 입력하신 이메일에서 인증을 완료해주세요.", "success")
         return redirect(url_for("auth.login"))
@@ -146,13 +157,13 @@ def resend_verification():
         if user and not user.get("is_verified", False):
             token = serializer.dumps(email, salt="email-confirm")
             confirm_url = url_for("auth.confirm_email", token=token, _external=True)
-            msg = Message(
+            mail_outbox.enqueue(
+                mongo,
                 subject="이메일 인증 다시 받기",
                 sender=os.environ.get("MAIL_USERNAME"),
-                recipients=[email]
+                recipients=[email],
+                body=f"다시 인증하려면 아래 링크를 클릭하세요:\n\n{confirm_url}"
             )
-            msg.body = f"다시 인증하려면 아래 링크를 클릭하세요:\n\n{confirm_url}"
-            mail.send(msg)
 
             flash("인증 이메일이 재전송되었습니다 📩", "info")
             return redirect(url_for("auth.login"))
@@ -165,7 +176,7 @@ def resend_verification():
 def login():
     if request.method == "POST":
         email = request.form.get("email")
-        password = request.form.get("password")
+        password = request.form.get("password") or ""
         remember = request.form.get("remember") == "on"
         user_data = mongo.db.users.find_one({"email": email})
 
@@ -177,10 +188,14 @@ def login():
             flash("비밀번호가 설정되지 않은 계정입니다. 소셜 로그인을 이용해주세요.", "danger")
             return redirect(url_for("auth.login"))
 
-        if not bcrypt.check_password_hash(user_data["password"], password):
+        if not password_hasher.check(user_data["password"], password):
             flash("비밀번호가 틀렸습니다.", "danger")
             return redirect(url_for("auth.login"))
 
+        # BCRYPT_LOG_ROUNDS가 바뀌었으면 현재 cost로 다시 해시
+        if password_hasher.needs_rehash(user_data["password"]):
+            mongo.db.users.update_one({"_id": user_data["_id"]}, {"$set": {"password": password_hasher.hash(password)}})
+
         if not user_data.get("is_verified", False):
             flash("이메일 인증이 완료되지 않았습니다. 회원가입 시 받은 이메일을 확인하거나 다시 등록해주세요.", "warning")
             return redirect(url_for("auth.resend_verification", email=email))
@@ -207,11 +222,13 @@ def forgot_password():
         token = serializer.dumps(email, salt='reset-password')
         reset_link = url_for('auth.reset_password', token=token, _external=True)
 
-        msg = Message("[CollabTool] 비밀번호 재설정 링크",
-                      sender=os.environ.get("MAIL_USERNAME"),
-                      recipients=[email],
-                      body=f"아래 링크를 클릭하여 비밀번호를 재설정하세요 (1시간 유효):\n{reset_link}")
-        mail.send(msg)
+        mail_outbox.enqueue(
+            mongo,
+            subject="[CollabTool] 비밀번호 재설정 링크",
+            sender=os.environ.get("MAIL_USERNAME"),
+            recipients=[email],
+            body=f"아래 링크를 클릭하여 비밀번호를 재설정하세요 (1시간 유효):\n{reset_link}"
+        )
 
         flash("비밀번호 재설정 링크가 이메일로 전송되었습니다.", "info")
         return redirect(url_for("auth.login"))
@@ -246,7 +263,7 @@ def reset_password(token):
             flash("비밀번호가 일치하지 않습니다.", "danger")
             return redirect(request.url)
 
-        hashed = bcrypt.generate_password_hash(new_password).decode("utf-8")
+        hashed = password_hasher.hash(new_password)
         mongo.db.users.update_one({"email": email}, {"$set": {"password": hashed}})
         flash("비밀번호가 성공적으로 변경되었습니다.", "success")
         return redirect(url_for("auth.login"))
@@ -269,37 +286,18 @@ def dashboard():
 
     print("auth.py dashboard route executed")
 
-    user_data = mongo.db.users.find_one({"_id": ObjectId(current_user.id)})
-    projects = mongo.db.projects.find({"members": ObjectId(current_user.id)}).sort("order", 1)
-
-    project_list = []
-    for project in projects:
+    project_list = project_summaries(mongo, ObjectId(current_user.id), sort={"order": 1})
+    for project in project_list:
         project["owner"] = str(project.get("owner", None))
-        deadline = project.get("deadline", None)
-
-        if deadline and isinstance(deadline, datetime):
-            project["deadline"] = deadline.strftime("%Y-%m-%d")
-
-            today = date.today()
-            delta_days = (deadline.date() - today).days
-            if delta_days > 0:
-                project["d_day"] = f"D-{delta_days}"
-            elif delta_days == 0:
-                project["d_day"] = "D-Day"
-            else:
-                project["d_day"] = f"D+{abs(delta_days)}"
-        else:
-            project["d_day"] = None
-
-        card_count = mongo.db.cards.count_documents({"project_id": project["_id"]})
-        project["card_count"] = card_count
-        project_list.append(project)
+        if isinstance(project.get("deadline"), datetime):
+            project["deadline"] = project["deadline"].strftime("%Y-%m-%d")
 
     return render_template(
         "dashboard.html",
         user={"_id": str(current_user.id), "nickname": current_user.nickname},
         projects=project_list,
-        today=date.today().isoformat()
+        today=date.today().isoformat(),
+        server_push=change_broadcaster.enabled
     )
 
 # 소셜 로그인 시작
@@ -374,6 +372,7 @@ def set_nickname():
         }
         result = mongo.db.users.insert_one(new_user)
         new_user["_id"] = result.inserted_id
+        index_user(mongo, new_user)
 
         login_user(User(new_user))
         session.pop("temp_user_info", None)
@@ -414,6 +413,8 @@ def my_page():
             if mongo.db.users.find_one({"nickname": nickname, "_id": {"$ne": user_data["_id"]}}):
                 return render_with_message("이미 사용 중인 닉네임입니다.", "warning", override_nickname=nickname)
             mongo.db.users.update_one({"_id": user_data["_id"]}, {"$set": {"nickname": nickname}})
+            invalidate_user(user_data["_id"])
+            index_user(mongo, {"_id": user_data["_id"], "nickname": nickname})
             return render_with_message("닉네임이 성공적으로 변경되었습니다.", "success")
 
         # 비밀번호 변경 (로컬만)
@@ -421,14 +422,14 @@ def my_page():
             if current_password or new_password or confirm_password:
                 if not current_password:
                     return render_with_message("현재 비밀번호를 입력해주세요.", "danger", override_nickname=nickname)
-                if not bcrypt.check_password_hash(user_data["password"], current_password):
+                if not password_hasher.check(user_data["password"], current_password):
                     return render_with_message("현재 비밀번호가 일치하지 않습니다.", "danger", override_nickname=nickname)
                 if len(new_password) < 8 or not re.search(r"[!@#$%^&*(),.?\":{}|<>]", new_password):
                     return render_with_message("새 비밀번호는 8자 이상이고 특수문자를 포함해야 합니다.", "danger", override_nickname=nickname)
                 if new_password != confirm_password:
                     return render_with_message("새 비밀번호가 일치하지 않습니다.", "danger", override_nickname=nickname)
 
-                hashed = bcrypt.generate_password_hash(new_password).decode("utf-8")
+                hashed = password_hasher.hash(new_password)
                 mongo.db.users.update_one({"_id": user_data["_id"]}, {"$set": {"password": hashed}})
                 return render_with_message("비밀번호가 성공적으로 변경되었습니다.", "success")
 
@@ -437,7 +438,7 @@ def my_page():
             if user_data.get("auth_type") == "local":
                 if not delete_password:
                     return render_with_message("비밀번호를 입력해주세요.", "danger", override_nickname=nickname)
-                if not bcrypt.check_password_hash(user_data["password"], delete_password):
+                if not password_hasher.check(user_data["password"], delete_password):
                     return render_with_message("비밀번호가 일치하지 않습니다.", "danger", override_nickname=nickname)
             else:
                 if not delete_nickname:
@@ -446,16 +447,23 @@ def my_page():
                     return render_with_message("닉네임이 일치하지 않습니다.", "danger", override_nickname=nickname)
 
             # 내가 만든 프로젝트 삭제
+            owned_ids = mongo.db.projects.distinct("_id", {"owner": user_data["_id"]})
             mongo.db.projects.delete_many({"owner": user_data["_id"]})
+            for owned_id in owned_ids:
+                invalidate_membership(project_id=owned_id)
+            unindex_projects(mongo, owned_ids)
 
             # 초대받은 프로젝트 멤버에서 제거
             mongo.db.projects.update_many(
                 {"members": user_data["_id"]},
-                {"$pull": {"members": user_data["_id"]}}
+                {"$pull": {"members": user_data["_id"]}, "$inc": {"version": 1}}
             )
 
             # 유저 삭제 및 로그아웃
             mongo.db.users.delete_one({"_id": user_data["_id"]})
+            invalidate_membership(user_id=user_data["_id"])
+            invalidate_user(user_data["_id"])
+            unindex(mongo, [user_data["_id"]])
             logout_user()
             session.pop("user_id", None)
             return redirect(url_for("auth.login"))
@@ -1,55 +1,62 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from flask_pymongo import PyMongo
+from flask_socketio import emit
 from bson import ObjectId
 from datetime import datetime
 from pymongo.errors import PyMongoError
 from app.utils.helpers import logger, safe_object_id, handle_db_error
 from app.utils.history import log_history
+from app.utils.membership import get_member_project
+from app.utils.ordering import CARD_SORT, apply_card_order, next_card_rank
+from app.utils.counters import count_card_added, count_card_removed, count_status_changed
+from app.utils.db import optional_transaction
+from app.utils.changes import change_broadcaster
+from app.utils.search import index_card, unindex
+from app.utils.summary import project_summaries
+from app.utils.serialize import serialize_card
+from app.utils.streaming import STREAM_BATCH_SIZE, stream_format, stream_list
+from app.utils.etag import (
+    bump_project_version, make_etag, member_project_version, member_project_versions, not_modified, with_etag
+)
+from app import mongo
 
 cards_bp = Blueprint('cards', __name__)
 
-def init_cards(app):
-    global mongo
-    mongo = PyMongo(app)
-
 @cards_bp.route("/projects/all/cards", methods=["GET"])
 @login_required
 def get_all_cards():
     user_id = ObjectId(current_user.get_id())
-    projects = mongo.db.projects.find({"members": user_id})
-    project_ids = [project["_id"] for project in projects]
-    
-    cards = list(mongo.db.cards.find({"project_id": {"$in": project_ids}}).sort("order", 1))
+    versions = member_project_versions(mongo, user_id)
+    etag = make_etag(versions)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    project_ids = [project_id for project_id, _ in versions]
+
+    cursor = mongo.db.cards.find({"project_id": {"$in": project_ids}}).sort(CARD_SORT)
+    fmt = stream_format()
+    if fmt:
+        logger.info(f"Streaming cards of {len(project_ids)} projects for user {user_id}")
+        cards = (serialize_card(card) for card in cursor.batch_size(STREAM_BATCH_SIZE))
+        return with_etag(stream_list("cards", cards, fmt), etag)
+
+    cards = list(cursor)
     logger.info(f"Retrieved {len(cards)} cards for user {user_id}")
-    return jsonify({
-        "cards": [{
-            "id": str(card["_id"]),
-            "title": card["title"],
-            "description": card["description"],
-            "status": card["status"],
-            "project_id": str(card["project_id"]),
-            "created_by": str(card["created_by"]),
-            "created_at": card["created_at"].strftime("%H:%M:%S"),
-            "order": card.get("order", 0),
-            "due_date": card["due_date"].strftime("%Y-%m-%d") if card.get("due_date") else None
-        } for card in cards]
-    }), 200
+    return with_etag(jsonify({
+        "cards": [serialize_card(card) for card in cards]
+    }), etag), 200
 
 @cards_bp.route("/projects/all/cards/counts", methods=["GET"])
 @login_required
 def get_card_counts():
     user_id = ObjectId(current_user.get_id())
-    projects = mongo.db.projects.find({"members": user_id})
-    counts = {}
-    
-    for project in projects:
-        project_id = str(project["_id"])
-        count = mongo.db.cards.count_documents({"project_id": project["_id"]})
-        counts[project_id] = count
-    
+    projects = project_summaries(mongo, user_id)
+
     logger.info(f"Retrieved card counts for user {user_id}")
-    return jsonify({"counts": counts}), 200
+    return jsonify({
+        "counts": {str(project["_id"]): project["card_count"] for project in projects},
+        "by_status": {str(project["_id"]): project["card_counts"] for project in projects}
+    }), 200
 
 @cards_bp.route("/projects/<project_id>/cards/move", methods=["POST"])
 @login_required
@@ -88,7 +95,7 @@ def move_card(project_id):
         return jsonify({"message": "프로젝트 ID가 일치하지 않습니다."}), 400
 
     user_id = ObjectId(current_user.get_id())
-    target_project = mongo.db.projects.find_one({"_id": target_oid, "members": user_id})
+    target_project = get_member_project(mongo, user_id, target_oid)
     if not target_project:
         logger.error(f"Target project not found or user has no access: {target_project_id}")
         return jsonify({"message": "대상 프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -98,16 +105,33 @@ def move_card(project_id):
         logger.error(f"Card {card_id} not found in source project {source_project_id}")
         return jsonify({"message": "카드를 찾을 수 없습니다."}), 404
 
-    from_project = mongo.db.projects.find_one({"_id": source_oid, "members": user_id})
+    from_project = get_member_project(mongo, user_id, source_oid)
     if not from_project:
         logger.error(f"Source project not found or user has no access: {source_project_id}")
         return jsonify({"message": "원본 프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
 
     try:
-        mongo.db.cards.update_one(
-            {"_id": card_oid},
-            {"$set": {"project_id": target_oid}}
-        )
+        # 카드 이동과 카운터는 한 트랜잭션으로 (version도 함께 올려 카운터 초기화와 충돌하도록, standalone이면 트랜잭션 없이)
+        with optional_transaction(mongo) as session:
+            # 카운터는 읽어 둔 card가 아니라 실제로 바꾼 시점의 상태 기준
+            before = mongo.db.cards.find_one_and_update(
+                {"_id": card_oid, "project_id": source_oid},
+                {"$set": {"project_id": target_oid}},
+                projection={"status": 1},
+                session=session
+            )
+            if before and source_oid != target_oid:
+                count_card_removed(mongo, source_oid, before.get("status"), session)
+                count_card_added(mongo, target_oid, before.get("status"), session)
+                bump_project_version(mongo, source_oid, target_oid, session=session)
+        index_card(mongo, {**card, "project_id": target_oid})
+        if before and source_oid != target_oid and change_broadcaster.enabled and not change_broadcaster.sends_card_moved:
+            # 서버 푸시 중이라 클라이언트는 중계하지 않지만, pre-image가 꺼져 있어 변경 스트림도 원본 방을 모름
+            emit("card_moved", {
+                "card_id": card_id,
+                "source_project_id": source_project_id,
+                "target_project_id": target_project_id
+            }, room=[source_project_id, target_project_id], namespace='/')
 
         history_details = {
             "from_project": from_project["name"],
@@ -138,19 +162,16 @@ def move_card(project_id):
 
         order_oids = [safe_object_id(cid) for cid in order]
         if None in order_oids:
+            bump_project_version(mongo, source_oid, target_oid)
             logger.error(f"Invalid card IDs in order: {order}")
             return jsonify({"message": "유효하지 않은 카드 ID입니다."}), 400
 
-        for index, cid in enumerate(order_oids):
-            card_check = mongo.db.cards.find_one({"_id": cid, "project_id": target_oid})
-            if not card_check:
-                logger.error(f"Card {cid} not found in project {target_project_id}")
-                return jsonify({"message": f"카드 {cid}를 프로젝트에서 찾을 수 없습니다."}), 404
-
-            mongo.db.cards.update_one(
-                {"_id": cid, "project_id": target_oid},
-                {"$set": {"order": index}}
-            )
+        missing, _ = apply_card_order(mongo, target_oid, order_oids)
+        # 순서까지 반영한 뒤에 올려야 중간 상태가 새 ETag로 캐시되지 않음
+        bump_project_version(mongo, source_oid, target_oid)
+        if missing:
+            logger.error(f"Card {missing[0]} not found in project {target_project_id}")
+            return jsonify({"message": f"카드 {missing[0]}를 프로젝트에서 찾을 수 없습니다."}), 404
         logger.info(f"Card {card_id} moved from project {source_project_id} to {target_project_id} with order {order}")
         return jsonify({"message": "카드가 이동되고 순서가 업데이트되었습니다."}), 200
     except PyMongoError as e:
@@ -168,16 +189,12 @@ def create_card(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
 
     try:
-        max_order_doc = mongo.db.cards.find({"project_id": oid}).sort("order", -1).limit(1)
-        max_order_doc = next(max_order_doc, None)
-        max_order = max_order_doc["order"] + 1 if max_order_doc else 0
-
         user_id = ObjectId(current_user.get_id())
         new_card = {
             "project_id": oid,
@@ -186,11 +203,15 @@ def create_card(project_id):
             "created_by": user_id,
             "created_at": datetime.utcnow(),
             "status": data.get("status", "todo"),
-            "order": max_order
+            "rank": next_card_rank(mongo, oid)
         }
 
-        result = mongo.db.cards.insert_one(new_card)
+        with optional_transaction(mongo) as session:
+            result = mongo.db.cards.insert_one(new_card, session=session)
+            count_card_added(mongo, oid, new_card["status"], session)
+            bump_project_version(mongo, oid, session=session)
         card_id = str(result.inserted_id)
+        index_card(mongo, new_card)
 
         log_history(
             mongo=mongo,
@@ -213,7 +234,7 @@ def create_card(project_id):
             "description": new_card["description"],
             "status": new_card["status"],
             "project_id": project_id,
-            "order": new_card["order"]
+            "rank": new_card["rank"]
         }), 201
     except PyMongoError as e:
         return handle_db_error(e)
@@ -226,7 +247,7 @@ def delete_card(project_id, card_id):
     if not all([oid, card_oid]):
         return jsonify({"message": "유효하지 않은 프로젝트 또는 카드 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -250,7 +271,16 @@ def delete_card(project_id, card_id):
         }
     )
 
-    mongo.db.cards.delete_one({"_id": card_oid})
+    try:
+        with optional_transaction(mongo) as session:
+            # 동시에 삭제한 요청이 있으면 카운터는 한 번만 줄임
+            deleted = mongo.db.cards.find_one_and_delete({"_id": card_oid}, projection={"status": 1}, session=session)
+            if deleted:
+                count_card_removed(mongo, oid, deleted["status"], session)
+            bump_project_version(mongo, oid, session=session)
+    except PyMongoError as e:
+        return handle_db_error(e)
+    unindex(mongo, [card_oid])
     logger.info(f"Deleted card: {card_id} from project {project_id}")
     return jsonify({"message": "카드가 삭제되었습니다."}), 200
 
@@ -261,26 +291,21 @@ def get_project_cards(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
-    if not project:
+    version = member_project_version(mongo, ObjectId(current_user.get_id()), oid)
+    if version is None:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
 
-    cards = list(mongo.db.cards.find({"project_id": oid}).sort("order", 1))
+    etag = make_etag(oid, version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    cards = list(mongo.db.cards.find({"project_id": oid}).sort(CARD_SORT))
     logger.info(f"Retrieved {len(cards)} cards for project {project_id}")
-    return jsonify({
-        "cards": [{
-            "id": str(card["_id"]),
-            "title": card["title"],
-            "description": card["description"],
-            "status": card["status"],
-            "project_id": str(card["project_id"]),
-            "created_by": str(card["created_by"]),
-            "created_at": card["created_at"].strftime("%H:%M:%S"),
-            "order": card.get("order", 0),
-            "due_date": card["due_date"].strftime("%Y-%m-%d") if card.get("due_date") else None
-        } for card in cards]
-    }), 200
+    return with_etag(jsonify({
+        "cards": [serialize_card(card) for card in cards]
+    }), etag), 200
 
 @cards_bp.route("/projects/<project_id>/cards/<card_id>/status", methods=["PUT"])
 @login_required
@@ -295,7 +320,7 @@ def update_card_status(project_id, card_id):
     if not all([oid, card_oid]):
         return jsonify({"message": "유효하지 않은 프로젝트 또는 카드 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -321,10 +346,20 @@ def update_card_status(project_id, card_id):
         }
     )
 
-    mongo.db.cards.update_one(
-        {"_id": card_oid},
-        {"$set": {"status": data["status"]}}
-    )
+    try:
+        with optional_transaction(mongo) as session:
+            # 카운터는 읽어 둔 card가 아니라 실제로 바꾼 시점의 상태 기준 (그 사이 다른 요청이 바꿨을 수 있음)
+            before = mongo.db.cards.find_one_and_update(
+                {"_id": card_oid},
+                {"$set": {"status": data["status"]}},
+                projection={"status": 1},
+                session=session
+            )
+            if before:
+                count_status_changed(mongo, oid, before["status"], data["status"], session)
+            bump_project_version(mongo, oid, session=session)
+    except PyMongoError as e:
+        return handle_db_error(e)
     logger.info(f"Updated status of card {card_id} to {data['status']}")
     return jsonify({"message": "카드 상태가 업데이트되었습니다."}), 200
 
@@ -335,7 +370,7 @@ def reorder_cards(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -354,30 +389,32 @@ def reorder_cards(project_id):
     try:
         with mongo.cx.start_session() as session:
             with session.start_transaction():
-                for index, cid in enumerate(order_oids):
-                    card = mongo.db.cards.find_one({"_id": cid, "project_id": oid})
-                    if not card:
-                        logger.error(f"Card {cid} not found in project {project_id}")
-                        return jsonify({"message": f"카드 {cid}를 프로젝트에서 찾을 수 없습니다."}), 404
-
-                    mongo.db.cards.update_one(
-                        {"_id": cid, "project_id": oid},
-                        {"$set": {"order": index}},
-                        session=session
-                    )
+                missing, changed = apply_card_order(mongo, oid, order_oids, session=session)
+                if missing:
+                    logger.error(f"Card {missing[0]} not found in project {project_id}")
+                    return jsonify({"message": f"카드 {missing[0]}를 프로젝트에서 찾을 수 없습니다."}), 404
+                if changed:
+                    bump_project_version(mongo, oid, session=session)
+
+                # 카드별 기록 대신 재정렬 1회당 요약 기록 1건
+                if changed:
+                    details = {
+                        "card_count": len(changed),
+                        "titles": [card["title"] for card in changed[:10]],
+                        "project_name": project["name"]
+                    }
+                    if len(changed) == 1:
+                        details["title"] = changed[0]["title"]
+                        details["new_order"] = changed[0]["new_order"]
 
                     log_history(
                         mongo=mongo,
                         project_id=project_id,
-                        card_id=str(cid),
+                        card_id=str(changed[0]["id"]) if len(changed) == 1 else None,
                         user_id=str(user_id),
                         nickname= current_user.nickname,
                         action="card_reorder",
-                        details={
-                            "title": card["title"],
-                            "new_order": index,
-                            "project_name": project["name"]
-                        },
+                        details=details,
                         session=session
                     )
     except PyMongoError as e:
@@ -399,7 +436,7 @@ def update_card(project_id, card_id):
     if not all([oid, card_oid]):
         return jsonify({"message": "유효하지 않은 프로젝트 또는 카드 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -449,10 +486,20 @@ def update_card(project_id, card_id):
             details={**changes, "project_name": project["name"]}
         )
 
-    mongo.db.cards.update_one(
-        {"_id": card_oid},
-        {"$set": update_data}
-    )
+    try:
+        with optional_transaction(mongo) as session:
+            before = mongo.db.cards.find_one_and_update(
+                {"_id": card_oid},
+                {"$set": update_data},
+                projection={"status": 1},
+                session=session
+            )
+            if before:
+                count_status_changed(mongo, oid, before["status"], update_data["status"], session)
+            bump_project_version(mongo, oid, session=session)
+    except PyMongoError as e:
+        return handle_db_error(e)
+    index_card(mongo, {**card, **update_data})
     logger.info(f"Updated card: {card_id} in project {project_id}")
     return jsonify({"message": "카드가 수정되었습니다."}), 200
 
@@ -464,7 +511,7 @@ def get_card(project_id, card_id):
     if not all([oid, card_oid]):
         return jsonify({"message": "유효하지 않은 프로젝트 또는 카드 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -475,17 +522,7 @@ def get_card(project_id, card_id):
         return jsonify({"message": "카드를 찾을 수 없습니다."}), 404
 
     logger.info(f"Retrieved card: {card_id} from project {project_id}")
-    return jsonify({
-        "id": str(card["_id"]),
-        "title": card["title"],
-        "description": card["description"],
-        "status": card["status"],
-        "project_id": str(card["project_id"]),
-        "created_by": str(card["created_by"]),
-        "created_at": card["created_at"].strftime("%H:%M:%S"),
-        "order": card.get("order", 0),
-        "due_date": card["due_date"].strftime("%Y-%m-%d") if card.get("due_date") else None
-    }), 200
+    return jsonify(serialize_card(card)), 200
 
 @cards_bp.route("/projects/<project_id>/cards/<card_id>/due_date", methods=["PUT"])
 @login_required
@@ -495,7 +532,7 @@ def set_due_date(project_id, card_id):
     if not all([oid, card_oid]):
         return jsonify({"message": "유효하지 않은 프로젝트 또는 카드 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -521,6 +558,7 @@ def set_due_date(project_id, card_id):
         {"_id": card_oid},
         {"$set": {"due_date": due_date_dt}}
     )
+    bump_project_version(mongo, oid)
 
     log_history(
         mongo=mongo,
@@ -546,7 +584,7 @@ def update_due_date(project_id, card_id):
     if not all([oid, card_oid]):
         return jsonify({"message": "유효하지 않은 프로젝트 또는 카드 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -573,6 +611,7 @@ def update_due_date(project_id, card_id):
         {"_id": card_oid},
         {"$set": {"due_date": new_due_date_dt}}
     )
+    bump_project_version(mongo, oid)
 
     log_history(
         mongo=mongo,
@@ -1,21 +1,29 @@
-from flask import Blueprint, request, jsonify, current_app, url_for
+from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from flask_pymongo import PyMongo
 from bson import ObjectId
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from app.utils.helpers import logger, safe_object_id, handle_db_error
-from app.utils.history import log_history
-import os
-import uuid
+from app.utils.history import log_history, history_writer, fetch_history_page, parse_history_args, resolve_history_nicknames
+from app.utils.membership import get_member_project, invalidate_membership
+from app.utils.summary import project_summaries
+from app.utils.search import (
+    SEARCH_PAGE_SIZE, index_project, parse_query, query_search_index, scan_search, scan_user_ids,
+    search_user_ids, unindex_projects
+)
+from app.utils.changes import change_broadcaster
+from app.utils.images import UploadError, image_store
+from app.utils.upload_sessions import upload_sessions
+from app.utils.streaming import STREAM_BATCH_SIZE, stream_format, stream_list
+from app.utils.etag import (
+    bump_project_version, make_etag, member_project_version, member_project_versions, not_modified,
+    project_order_state, with_etag
+)
+from app import mongo
 from werkzeug.utils import secure_filename
 from flask_socketio import emit
 
 projects_bp = Blueprint('projects', __name__)
 
-def init_projects(app):
-    global mongo
-    mongo = PyMongo(app)
-
 @projects_bp.route("/projects/reorder", methods=["POST"])
 @login_required
 def reorder_projects():
@@ -36,21 +44,22 @@ def reorder_projects():
 def get_project_order():
     user_id = safe_object_id(current_user.get_id())
 
-    user = mongo.db.users.find_one({"_id": user_id}, {"project_order": 1})
-    project_order = user.get("project_order", []) if user else []
-
-    # 현재 사용자가 속한 프로젝트 리스트
-    projects = list(mongo.db.projects.find({"members": user_id}))
+    # 저장된 순서와 현재 사용자가 속한 프로젝트 ID 목록 (순서는 버전과 무관하므로 ID만 사용)
+    project_order, projects = project_order_state(mongo, user_id)
+    etag = make_etag(project_order, projects)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
     # 프로젝트 ID 집합
-    project_ids = set(str(p["_id"]) for p in projects)
+    project_ids = set(projects)
 
     # project_order에 없는 새 프로젝트는 뒤에 추가
     full_order = [pid for pid in project_order if pid in project_ids]
-    missing_projects = [str(p["_id"]) for p in projects if str(p["_id"]) not in full_order]
+    missing_projects = [pid for pid in projects if pid not in full_order]
     full_order.extend(missing_projects)
 
-    return jsonify({"order": full_order}), 200
+    return with_etag(jsonify({"order": full_order}), etag), 200
 
 @projects_bp.route("/projects/create", methods=["POST"])
 @login_required
@@ -79,10 +88,14 @@ def create_project():
             "members": [user_id],
             "owner": user_id,
             "created_at": datetime.utcnow(),
+            "card_count": 0,
+            "card_counts": {},
+            "version": 0,
         }
 
         result = mongo.db.projects.insert_one(new_project)
         project_id = str(result.inserted_id)
+        index_project(mongo, new_project)
 
         # 프로젝트 생성 후 사용자 정보 업데이트
         mongo.db.users.update_one(
@@ -133,10 +146,12 @@ def delete_or_leave_project(project_id):
         mongo.db.projects.delete_one({"_id": oid})
         mongo.db.cards.delete_many({"project_id": oid})
         mongo.db.comments.delete_many({"project_id": oid})
+        unindex_projects(mongo, [oid])
         mongo.db.users.update_many(
             {"_id": {"$in": member_ids}},
             {"$pull": {"project_order": str(project_id)}}
         )
+        invalidate_membership(project_id=oid)
 
         log_history(
             mongo=mongo,
@@ -155,8 +170,9 @@ def delete_or_leave_project(project_id):
     elif user_id in project.get("members", []):
         mongo.db.projects.update_one(
             {"_id": oid},
-            {"$pull": {"members": user_id}}
+            {"$pull": {"members": user_id}, "$inc": {"version": 1}}
         )
+        invalidate_membership(user_id=user_id, project_id=oid)
         mongo.db.users.update_one(
             {"_id": user_id},
             {"$pull": {"project_order": str(project_id)}}
@@ -187,16 +203,23 @@ def get_project(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": safe_object_id(current_user.get_id())})
+    project = mongo.db.projects.find_one(
+        {"_id": oid, "members": safe_object_id(current_user.get_id())},
+        {"name": 1, "owner": 1, "description": 1, "deadline": 1, "version": 1}
+    )
     if project:
+        etag = make_etag(oid, project.get("version", 0))
+        cached = not_modified(etag)
+        if cached:
+            return cached
         logger.info(f"Retrieved project: {project_id}")
-        return jsonify({
+        return with_etag(jsonify({
             "id": str(project["_id"]),
             "name": project["name"],
             "owner_id": str(project["owner"]),
             "description": project.get("description", ""),
             "deadline": project["deadline"].strftime("%Y-%m-%d") if project.get("deadline") else None
-        }), 200
+        }), etag), 200
     logger.error(f"Project not found or user has no access: {project_id}")
     return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
 
@@ -235,6 +258,9 @@ def edit_project(project_id):
 
     # 3) 히스토리 기록
     if result.modified_count:
+        bump_project_version(mongo, oid)
+        if "name" in update_fields:
+            invalidate_membership(project_id=oid)
         details = {}
         # 제목 변경 감지
         if "name" in update_fields and old_proj["name"] != update_fields["name"]:
@@ -259,14 +285,16 @@ def edit_project(project_id):
 
     if result.modified_count:
         proj = mongo.db.projects.find_one({"_id": oid})
-        emit('project_updated', {
-     'project_id': project_id,
-     'action': '수정',
-     'user_nickname': current_user.nickname,
-     'name': proj.get("name", ""),
-     'description': proj.get("description", ""),
-     'deadline': proj.get("deadline").strftime("%Y-%m-%d") if proj.get("deadline") else None
-   }, room=project_id, namespace='/')
+        index_project(mongo, proj)
+        if not change_broadcaster.enabled:
+            emit('project_updated', {
+         'project_id': project_id,
+         'action': '수정',
+         'user_nickname': current_user.nickname,
+         'name': proj.get("name", ""),
+         'description': proj.get("description", ""),
+         'deadline': proj.get("deadline").strftime("%Y-%m-%d") if proj.get("deadline") else None
+       }, room=project_id, namespace='/')
         return jsonify({
             "id": str(proj["_id"]),
             "name": proj.get("name", ""),
@@ -285,7 +313,10 @@ def invite_member(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": safe_object_id(current_user.get_id())})
+    project = mongo.db.projects.find_one(
+        {"_id": oid, "members": safe_object_id(current_user.get_id())},
+        {"name": 1, "members": 1}
+    )
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -307,6 +338,7 @@ def invite_member(project_id):
         {"_id": invitee["_id"]},
         {"$push": {"invitations": oid}}
     )
+    invalidate_membership(user_id=invitee["_id"], project_id=oid)
 
     log_history(
         mongo=mongo,
@@ -359,8 +391,9 @@ def respond_invitation():
     if action == "accept":
         mongo.db.projects.update_one(
             {"_id": project_id},
-            {"$addToSet": {"members": user_id}}
+            {"$addToSet": {"members": user_id}, "$inc": {"version": 1}}
         )
+        invalidate_membership(user_id=user_id, project_id=project_id)
 
         log_history(
             mongo=mongo,
@@ -405,80 +438,124 @@ def search_projects_and_cards():
         if not keyword and not due_date:
             return jsonify({"projects": [], "cards": [], "message": "키워드 또는 마감일을 입력하세요."}), 200
 
-        user_id = safe_object_id(current_user.get_id())
-        project_query = {"members": user_id}
-
-        # 키워드 검색 조건
-        if keyword:
-            project_query["$or"] = [
-                {"name": {"$regex": keyword, "$options": "i"}},
-                {"description": {"$regex": keyword, "$options": "i"}}
-            ]
+        try:
+            page = int(request.args.get("page", 1))
+            limit = int(request.args.get("limit", SEARCH_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"projects": [], "cards": [], "message": "잘못된 페이지 요청입니다."}), 400
 
         # 마감일 검색 조건
+        due_date_end = None
         if due_date:
             try:
                 # due_date는 YYYY-MM-DD 형식으로 입력됨
                 due_date_obj = datetime.strptime(due_date, "%Y-%m-%d")
                 # due_date의 자정(23:59:59.999+00:00)까지 포함
                 due_date_end = due_date_obj.replace(hour=23, minute=59, second=59, microsecond=999999)
-                project_query["deadline"] = {"$lte": due_date_end}
-                logger.debug(f"마감일 쿼리: {project_query['deadline']}")
             except ValueError:
                 logger.error(f"잘못된 날짜 형식: {due_date}")
                 return jsonify({"projects": [], "cards": [], "message": "잘못된 날짜 형식입니다."}), 400
 
-        # 프로젝트 검색 및 마감일 기준 오름차순 정렬
-        projects = mongo.db.projects.find(project_query).sort("deadline", 1)
+        # 검색 범위는 사용자가 속한 프로젝트로 먼저 제한
+        user_id = safe_object_id(current_user.get_id())
+        member_projects = {
+            project["_id"]: project
+            for project in mongo.db.projects.find({"members": user_id}, {"name": 1, "description": 1, "deadline": 1})
+        }
+        project_scope = [
+            oid for oid, project in member_projects.items()
+            if not due_date_end or (isinstance(project.get("deadline"), datetime) and project["deadline"] <= due_date_end)
+        ]
+
+        has_more = False
+        if keyword:
+            # 카드는 키워드만 적용, 프로젝트는 마감일 조건도 적용
+            query = parse_query(keyword)
+            if query[0]:
+                hits, has_more = query_search_index(
+                    mongo, query, list(member_projects), project_scope, page=page, limit=limit
+                )
+            else:
+                # 특수문자만 입력한 검색어는 색인에 단어가 없으므로 원본을 정규식으로 검색
+                hits, has_more = scan_search(
+                    mongo, keyword, list(member_projects), project_scope, page=page, limit=limit
+                )
+            project_ids = [hit["_id"] for hit in hits if hit["kind"] == "project"]
+            card_ids = [hit["_id"] for hit in hits if hit["kind"] == "card"]
+        else:
+            # 마감일만 입력된 경우 마감일 기준 오름차순 정렬
+            project_ids = sorted(project_scope, key=lambda oid: member_projects[oid]["deadline"])
+            card_ids = []
+
         project_results = []
-        for project in projects:
+        for oid in project_ids:
+            project = member_projects[oid]
             # deadline이 datetime 객체이므로 YYYY-MM-DD 형식으로 변환
             deadline = project.get("deadline")
             deadline_str = deadline.strftime("%Y-%m-%d") if isinstance(deadline, datetime) else ""
             project_results.append({
-                "id": str(project["_id"]),
+                "id": str(oid),
                 "name": project["name"],
                 "description": project.get("description", ""),
                 "due_date": deadline_str,
                 "type": "project"
             })
-        logger.debug(f"프로젝트 검색 결과: {len(project_results)}개, 조건: {project_query}")
 
-        # 카드 검색 (키워드만 적용)
         card_results = []
-        if keyword:
-            card_query = {
-                "$or": [
-                    {"title": {"$regex": keyword, "$options": "i"}},
-                    {"description": {"$regex": keyword, "$options": "i"}}
-                ]
+        if card_ids:
+            cards = {
+                card["_id"]: card
+                for card in mongo.db.cards.find(
+                    {"_id": {"$in": card_ids}},
+                    {"project_id": 1, "title": 1, "description": 1, "due_date": 1}
+                )
             }
-            cards = mongo.db.cards.find(card_query)
-            for card in cards:
-                project = mongo.db.projects.find_one({
-                    "_id": card["project_id"],
-                    "members": user_id
+            # 관련도 순서 유지 (색인에는 있지만 이미 삭제된 카드는 제외)
+            for card_id in card_ids:
+                card = cards.get(card_id)
+                if not card or card["project_id"] not in member_projects:
+                    continue
+                card_results.append({
+                    "id": str(card["_id"]),
+                    "project_id": str(card["project_id"]),
+                    "project_name": member_projects[card["project_id"]]["name"],
+                    "title": card["title"],
+                    "description": card.get("description", ""),
+                    "due_date": card["due_date"].strftime("%Y-%m-%d") if card.get("due_date") else None,
+                    "type": "card"
                 })
-                if project:
-                    card_results.append({
-                        "id": str(card["_id"]),
-                        "project_id": str(card["project_id"]),
-                        "project_name": project["name"],
-                        "title": card["title"],
-                        "description": card.get("description", ""),
-                        "type": "card"
-                    })
 
         logger.info(f"Search executed: keyword={keyword}, due_date={due_date}, projects={len(project_results)}, cards={len(card_results)}")
         return jsonify({
             "projects": project_results,
             "cards": card_results,
+            "page": page,
+            "has_more": has_more,
             "message": "검색 완료"
         }), 200
     except Exception as e:
         logger.error(f"Unexpected search error: {str(e)}")
         return handle_db_error(e)
 
+@projects_bp.route("/projects/search/users", methods=["GET"])
+@login_required
+def search_users():
+    keyword = request.args.get("keyword", "").strip()
+    if not keyword:
+        return jsonify({"users": []}), 200
+
+    try:
+        query = parse_query(keyword)
+        user_ids = search_user_ids(mongo, query) if query[0] else scan_user_ids(mongo, keyword)
+        users = {user["_id"]: user for user in mongo.db.users.find({"_id": {"$in": user_ids}}, {"nickname": 1})}
+    except Exception as e:
+        logger.error(f"Unexpected user search error: {str(e)}")
+        return handle_db_error(e)
+
+    return jsonify({
+        "users": [{"nickname": users[user_id]["nickname"]} for user_id in user_ids if user_id in users]
+    }), 200
+
 @projects_bp.route("/history/<project_id>", methods=["GET"])
 @login_required
 def get_history(project_id):
@@ -486,22 +563,35 @@ def get_history(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": safe_object_id(current_user.get_id())})
-    if not project:
+    if not get_member_project(mongo, current_user.get_id(), oid):
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
     
-    history = list(mongo.db.history.find({"project_id": oid}).sort("created_at", -1))
-    return jsonify({
-        "history": [{
-            "id": str(h["_id"]),
-            "action": h["action"],
-            "details": h["details"],
-            "user_id": h["user_id"],
-            "nickname": h["nickname"],
-            "created_at": h["created_at"].replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=9))).strftime("%Y-%m-%d %H:%M:%S")
-        } for h in history]
-    }), 200
+    page_options = parse_history_args(request.args)
+    if page_options is None:
+        return jsonify({"message": "유효하지 않은 조회 조건입니다."}), 400
+
+    # 이 프로젝트의 기록이 버퍼에 남아 있으면 먼저 기록한 뒤 조회
+    history_writer.flush(oid)
+    history, next_cursor = fetch_history_page(mongo, oid, **page_options)
+    fields = page_options.get("fields")
+    nicknames = resolve_history_nicknames(mongo, history) if not fields or "nickname" in fields else {}
+
+    history_list = []
+    for h in history:
+        item = {"id": str(h["_id"])}
+        for field in ("action", "details"):
+            if field in h:
+                item[field] = h[field]
+        if h["_id"] in nicknames:
+            item["nickname"] = nicknames[h["_id"]]
+        for field in ("user_id", "card_id"):
+            if h.get(field):
+                item[field] = str(h[field])
+        item["created_at"] = h["created_at"].replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=9))).strftime("%Y-%m-%d %H:%M:%S")
+        history_list.append(item)
+
+    return jsonify({"history": history_list, "next": next_cursor}), 200
 
 @projects_bp.route("/projects/<project_id>/comments", methods=["GET"])
 @login_required
@@ -511,25 +601,38 @@ def get_comments(project_id):
     except:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": safe_object_id(current_user.get_id())})
-    if not project:
+    version = member_project_version(mongo, safe_object_id(current_user.get_id()), oid)
+    if version is None:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
 
-    comments = list(mongo.db.comments.find({"project_id": oid}).sort("created_at", 1))
-    result = []
-    for c in comments:
-        item = {
-            "_id": str(c["_id"]),
-            "author_id": str(c["author_id"]),
-            "author_name": c["author_name"],
-            "content": c["content"],
-            "created_at": c["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-        }
-        if c.get("image_filename"):
-            item["image_url"] = url_for('static', filename=f"uploads/{c['image_filename']}")
-        result.append(item)
-    return jsonify({"comments": result}), 200
+    etag = make_etag(oid, version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    cursor = mongo.db.comments.find({"project_id": oid}).sort("created_at", 1)
+    fmt = stream_format()
+    if fmt:
+        comments = (_serialize_comment(c) for c in cursor.batch_size(STREAM_BATCH_SIZE))
+        return with_etag(stream_list("comments", comments, fmt), etag)
+
+    result = [_serialize_comment(c) for c in cursor]
+    return with_etag(jsonify({"comments": result}), etag), 200
+
+def _serialize_comment(c):
+    item = {
+        "_id": str(c["_id"]),
+        "author_id": str(c["author_id"]),
+        "author_name": c["author_name"],
+        "content": c["content"],
+        "created_at": c["created_at"].strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if c.get("image_filename"):
+        # 목록에는 축소본, 크게 보기에는 재압축본 (아직 만드는 중이면 /uploads가 원본으로 리다이렉트)
+        item["image_url"] = image_store.variant_url(c["image_filename"], "thumb")
+        item["image_full_url"] = image_store.variant_url(c["image_filename"], "large")
+    return item
 
 @projects_bp.route("/projects/<project_id>/comments", methods=["POST"])
 @login_required
@@ -538,29 +641,39 @@ def add_comment(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": safe_object_id(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), oid)
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
 
     content = request.form.get("content", "").strip()
     file = request.files.get("image")
+    upload_id = request.form.get("upload_id")
 
-    if not content and not file:
+    if not content and not file and not upload_id:
         return jsonify({"message": "댓글 또는 이미지를 입력하세요."}), 400
 
     user_id = safe_object_id(current_user.get_id())
-    upload_dir = os.path.join(current_app.static_folder, "Uploads")
-    os.makedirs(upload_dir, exist_ok=True)
 
     image_filename = None
     image_url = None
-    if file and file.filename:
-        ext = os.path.splitext(file.filename)[1]
-        image_filename = f"{uuid.uuid4().hex}{ext}"
-        save_path = os.path.join(upload_dir, image_filename)
-        file.save(save_path)
-        image_url = f"/static/Uploads/{image_filename}"
+    upload_session = None
+    if upload_id:
+        # 이어 올리기 세션으로 미리 올려 둔 이미지
+        upload_oid = safe_object_id(upload_id)
+        upload_session = upload_sessions.completed(mongo, user_id, upload_oid) if upload_oid else None
+        if not upload_session:
+            logger.error(f"Upload session not found or not complete: {upload_id}")
+            return jsonify({"message": "업로드를 찾을 수 없거나 아직 완료되지 않았습니다."}), 400
+        image_filename = upload_session["image_filename"]
+        image_url = image_store.variant_url(image_filename, "thumb")
+    elif file and file.filename:
+        try:
+            image_filename = image_store.save(file)
+        except UploadError as e:
+            logger.error(f"Rejected comment image for project {project_id}: {e.message}")
+            return jsonify({"message": e.message}), e.status
+        image_url = image_store.variant_url(image_filename, "thumb")
         logger.info(f"Saved comment image as: {image_filename}")
 
     new_comment = {
@@ -575,6 +688,9 @@ def add_comment(project_id):
 
     result = mongo.db.comments.insert_one(new_comment)
     comment_id = str(result.inserted_id)
+    bump_project_version(mongo, oid)
+    if upload_session:
+        upload_sessions.abort(mongo, upload_session)
 
     log_history(
         mongo=mongo,
@@ -612,7 +728,7 @@ def edit_comment(comment_id):
         logger.error(f"Comment not found: {comment_id}")
         return jsonify({"message": "댓글을 찾을 수 없습니다."}), 404
 
-    project = mongo.db.projects.find_one({"_id": comment["project_id"], "members": safe_object_id(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), comment["project_id"])
     if not project:
         logger.error(f"Project not found or user has no access for comment: {comment_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -624,6 +740,7 @@ def edit_comment(comment_id):
     content = None
     delete_image = False
     new_file = None
+    upload_id = None
     image_url = None
     if request.content_type.startswith("application/json"):
         data = request.get_json()
@@ -633,39 +750,54 @@ def edit_comment(comment_id):
         content = request.form.get("content", "").strip()
         delete_image = request.form.get("delete_image") == '1'
         new_file = request.files.get("image")
+        upload_id = request.form.get("upload_id")
 
-    if not content and not delete_image and not (new_file and new_file.filename):
+    if not content and not delete_image and not (new_file and new_file.filename) and not upload_id:
         return jsonify({"message": "댓글 내용이 필요합니다."}), 400
 
+    upload_session = None
+    if upload_id:
+        upload_oid = safe_object_id(upload_id)
+        upload_session = upload_sessions.completed(mongo, safe_object_id(current_user.get_id()), upload_oid) if upload_oid else None
+        if not upload_session:
+            logger.error(f"Upload session not found or not complete: {upload_id}")
+            return jsonify({"message": "업로드를 찾을 수 없거나 아직 완료되지 않았습니다."}), 400
+
     try:
-        upload_dir = os.path.join(current_app.static_folder, "Uploads")
-        if delete_image and comment.get("image_filename"):
-            old_path = os.path.join(upload_dir, comment["image_filename"])
-            if os.path.exists(old_path):
-                os.remove(old_path)
+        old_filename = comment.get("image_filename")
+        if upload_session:
             mongo.db.comments.update_one(
                 {"_id": oid},
-                {"$unset": {"image_filename": ""}}
+                {"$set": {"image_filename": upload_session["image_filename"]}}
             )
-
-        if new_file and new_file.filename:
-            if comment.get("image_filename"):
-                old_path = os.path.join(upload_dir, comment["image_filename"])
-                if os.path.exists(old_path):
-                    os.remove(old_path)
-            ext = os.path.splitext(new_file.filename)[1]
-            image_filename = f"{uuid.uuid4().hex}{ext}"
-            new_file.save(os.path.join(upload_dir, image_filename))
+            image_url = image_store.variant_url(upload_session["image_filename"], "thumb")
+        elif new_file and new_file.filename:
+            try:
+                image_filename = image_store.save(new_file)
+            except UploadError as e:
+                logger.error(f"Rejected comment image for comment {comment_id}: {e.message}")
+                return jsonify({"message": e.message}), e.status
             mongo.db.comments.update_one(
                 {"_id": oid},
                 {"$set": {"image_filename": image_filename}}
             )
-            image_url = f"/static/Uploads/{image_filename}"
+            image_url = image_store.variant_url(image_filename, "thumb")
+        elif delete_image and old_filename:
+            mongo.db.comments.update_one(
+                {"_id": oid},
+                {"$unset": {"image_filename": ""}}
+            )
 
         mongo.db.comments.update_one(
             {"_id": oid},
             {"$set": {"content": content}}
         )
+        bump_project_version(mongo, comment["project_id"])
+        if upload_session:
+            upload_sessions.abort(mongo, upload_session)
+        # 다른 댓글이 같은 이미지를 쓰고 있지 않으면 이전 이미지 삭제
+        if old_filename and (delete_image or image_url):
+            image_store.release(mongo, old_filename)
 
         log_history(
             mongo=mongo,
@@ -678,7 +810,7 @@ def edit_comment(comment_id):
                 "old_content": comment["content"],
                 "new_content": content,
                 "project_name": project["name"],
-                "image_updated": bool(new_file and new_file.filename),
+                "image_updated": bool(image_url),
                 "image_deleted": delete_image
             }
         )
@@ -708,7 +840,7 @@ def delete_comment(comment_id):
         logger.error(f"Comment not found: {comment_id}")
         return jsonify({"message": "댓글을 찾을 수 없습니다."}), 404
 
-    project = mongo.db.projects.find_one({"_id": comment["project_id"], "members": safe_object_id(current_user.get_id())})
+    project = get_member_project(mongo, current_user.get_id(), comment["project_id"])
     if not project:
         logger.error(f"Project not found or user has no access for comment: {comment_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -718,12 +850,9 @@ def delete_comment(comment_id):
         return jsonify({"message": "댓글 삭제 권한이 없습니다."}), 403
 
     try:
-        if comment.get("image_filename"):
-            file_path = os.path.join(current_app.static_folder, "Uploads", comment["image_filename"])
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
         mongo.db.comments.delete_one({"_id": oid})
+        bump_project_version(mongo, comment["project_id"])
+        image_store.release(mongo, comment.get("image_filename"))
 
         log_history(
             mongo=mongo,
@@ -751,7 +880,10 @@ def update_deadline(project_id):
     if not oid:
         return jsonify({"message": "유효하지 않은 프로젝트 ID입니다."}), 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": safe_object_id(current_user.get_id())})
+    project = mongo.db.projects.find_one(
+        {"_id": oid, "members": safe_object_id(current_user.get_id())},
+        {"name": 1, "deadline": 1}
+    )
     if not project:
         logger.error(f"Project not found or user has no access: {project_id}")
         return jsonify({"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}), 404
@@ -765,7 +897,7 @@ def update_deadline(project_id):
 
         mongo.db.projects.update_one(
             {"_id": oid},
-            {"$unset": {"deadline": ""}}  # deadline 필드 삭제
+            {"$unset": {"deadline": ""}, "$inc": {"version": 1}}  # deadline 필드 삭제
         )
 
         log_history(
@@ -795,7 +927,7 @@ def update_deadline(project_id):
 
     mongo.db.projects.update_one(
         {"_id": oid},
-        {"$set": {"deadline": deadline_dt}}
+        {"$set": {"deadline": deadline_dt}, "$inc": {"version": 1}}
     )
 
     log_history(
@@ -821,44 +953,25 @@ def update_deadline(project_id):
 def get_all_projects():
     try:
         user_id = safe_object_id(current_user.get_id())
-        projects = mongo.db.projects.find({"members": user_id})
-        
-        project_list = []
-        for project in projects:
-            # D-Day 계산 (선택 사항)
-            deadline_str = project.get("deadline")
-            d_day_status = None
-            if deadline_str:
-                if isinstance(deadline_str, datetime):
-                    deadline_dt = deadline_str
-                else:
-                    try:
-                        deadline_dt = datetime.strptime(deadline_str, "%Y-%m-%d")
-                    except ValueError:
-                        deadline_dt = None # 잘못된 형식은 무시
-
-                if deadline_dt:
-                    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-                    deadline_only_date = deadline_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-                    
-                    diff = (deadline_only_date - today).days
-                    if diff > 0:
-                        d_day_status = f"D-{diff}"
-                    elif diff == 0:
-                        d_day_status = "D-Day"
-                    else:
-                        d_day_status = f"D+{abs(diff)}"
-            
-            project_list.append({
-                "id": str(project["_id"]),
-                "name": project["name"],
-                "description": project.get("description", ""),
-                "deadline": project["deadline"].strftime("%Y-%m-%d") if project.get("deadline") else None,
-                "d_day": d_day_status, # D-Day 정보 추가
-                "owner_id": str(project["owner"]),
-            })
-        
+        # D-Day가 날짜에 따라 바뀌므로 오늘 날짜도 포함
+        etag = make_etag(member_project_versions(mongo, user_id), date.today().isoformat())
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        project_list = [{
+            "id": str(project["_id"]),
+            "name": project["name"],
+            "description": project.get("description", ""),
+            "deadline": project["deadline"].strftime("%Y-%m-%d") if project.get("deadline") else None,
+            "d_day": project["d_day"], # D-Day 정보 추가
+            "owner_id": str(project["owner"]),
+            "card_count": project["card_count"],
+            "card_counts": project["card_counts"],
+            "next_due_date": project["next_due_date"].strftime("%Y-%m-%d") if project["next_due_date"] else None,
+            "next_due_d_day": project["next_due_d_day"],
+        } for project in project_summaries(mongo, user_id)]
+
         logger.info(f"Retrieved {len(project_list)} projects for user {user_id}")
-        return jsonify({"projects": project_list}), 200
+        return with_etag(jsonify({"projects": project_list}), etag), 200
     except Exception as e:
         return handle_db_error(e)
\ No newline at end of file
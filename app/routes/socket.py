@@ -5,7 +5,18 @@ from flask_login import current_user, login_required
 from datetime import datetime, timedelta
 from bson.objectid import ObjectId
 from app import mongo
+from app.utils.chat import (
+    CHAT_PAGE_SIZE, chat_buffer, chat_timestamp, decode_chat_cursor, encode_chat_cursor,
+    fetch_older_messages, serialize_chat_message
+)
 from app.utils.history import log_history
+from app.utils.membership import get_member_project, invalidate_membership
+from app.utils.notifications import notification_fanout
+from app.utils.counters import count_card_removed, count_status_changed
+from app.utils.db import optional_transaction
+from app.utils.search import index_card, unindex
+from app.utils.changes import change_broadcaster
+from app.utils.etag import bump_project_version
 import os
 import logging
 
@@ -96,28 +107,18 @@ def register_socket_events(socketio):
             emit('notice', {'msg': '인증되지 않은 사용자입니다.', 'project_id': project_id}, to=sid)
             return
 
-        project = mongo.db.projects.find_one({'_id': ObjectId(project_id)})
-        if not project:
-            emit('notice', {'msg': '프로젝트를 찾을 수 없습니다.', 'project_id': project_id}, to=sid)
-            return
-
-        if ObjectId(current_user.get_id()) not in project.get('members', []):
-            emit('notice', {'msg': '프로젝트에 대한 권한이 없습니다.', 'project_id': project_id}, to=sid)
+        if not get_member_project(mongo, current_user.get_id(), project_id):
+            emit('notice', {'msg': '프로젝트를 찾을 수 없거나 권한이 없습니다.', 'project_id': project_id}, to=sid)
             return
 
         join_room(project_id)
-        # 메시지 기록 DB에서 불러오기
-        messages = mongo.db.chat_messages.find({"project_id": project_id}).sort("timestamp", 1)
-        history = []
-        for msg in messages:
-            history.append({
-                "project_id": project_id,
-                "nickname": msg.get("nickname"),
-                "message": msg.get("message"),
-                "timestamp": msg.get("timestamp").strftime("%Y-%m-%d %H:%M")
-            })
-        
-        emit("chat_history", history, room=current_user.nickname)  # 특정 사용자에게만 전송
+        # 최근 메시지만 메모리 버퍼에서 전송 (이전 메시지는 load_older_messages로 조회)
+        recent = chat_buffer.recent(mongo, project_id)
+        emit("chat_history", {
+            "project_id": project_id,
+            "messages": [serialize_chat_message(project_id, msg) for msg in recent],
+            "before": encode_chat_cursor(recent[0]) if len(recent) >= chat_buffer.maxlen else None
+        }, room=current_user.nickname)  # 특정 사용자에게만 전송
 
         emit("notice", {
             "project_id": project_id,
@@ -130,13 +131,8 @@ def register_socket_events(socketio):
     def handle_leave(data):
         project_id = str(data.get('project_id'))
         sid = request.sid
-        project = mongo.db.projects.find_one({'_id': ObjectId(project_id)})
-        if not project:
-            emit('notice', {'msg': '프로젝트를 찾을 수 없습니다.', 'project_id': project_id}, to=sid)
-            return
-
-        if ObjectId(current_user.get_id()) not in project.get('members', []):
-            emit('notice', {'msg': '프로젝트에 대한 권한이 없습니다.', 'project_id': project_id}, to=sid)
+        if not get_member_project(mongo, current_user.get_id(), project_id):
+            emit('notice', {'msg': '프로젝트를 찾을 수 없거나 권한이 없습니다.', 'project_id': project_id}, to=sid)
             return
 
         emit('notice', {'msg': f'{current_user.nickname}님이 퇴장하셨습니다.', 'project_id': project_id}, room=project_id, include_self=True)
@@ -152,33 +148,60 @@ def register_socket_events(socketio):
             emit('notice', {'msg': '메시지 또는 프로젝트 ID가 필요합니다.', 'project_id': project_id}, to=request.sid)
             return
 
-        project = mongo.db.projects.find_one({'_id': ObjectId(project_id)})
-        if not project:
-            emit('notice', {'msg': '프로젝트를 찾을 수 없습니다.', 'project_id': project_id}, to=request.sid)
-            return
-
-        if ObjectId(current_user.get_id()) not in project.get('members', []):
-            emit('notice', {'msg': '프로젝트에 대한 권한이 없습니다.', 'project_id': project_id}, to=request.sid)
+        if not get_member_project(mongo, current_user.get_id(), project_id):
+            emit('notice', {'msg': '프로젝트를 찾을 수 없거나 권한이 없습니다.', 'project_id': project_id}, to=request.sid)
             return
 
         user_id = str(current_user.get_id())
-        timestamp = datetime.now()
-        mongo.db.chat_messages.insert_one({
+        timestamp = chat_timestamp()
+        doc = {
             'project_id': project_id,
             'user_id': user_id,
             'nickname': current_user.nickname,
             'message': message,
             'timestamp': timestamp
-        })
+        }
+        mongo.db.chat_messages.insert_one(doc)
+        chat_buffer.append(project_id, doc)
 
+        # 다른 워커는 이 이벤트를 메시지 큐에서 받아 자기 채팅 버퍼에도 넣음 (sent_at: 정렬용 전체 시각)
         emit('message', {
+            'id': str(doc['_id']),
             'user_id': user_id,
             'project_id': project_id,
             'nickname': current_user.nickname,
             'message': message,
-            'timestamp': timestamp.strftime('%H:%M:%S')
+            'timestamp': timestamp.strftime('%H:%M:%S'),
+            'sent_at': timestamp.isoformat()
         }, room=project_id)
 
+    # 'load_older_messages' 이벤트 핸들러
+    @socketio.on('load_older_messages')
+    @login_required
+    def handle_load_older_messages(data):
+        project_id = str(data.get('project_id'))
+        sid = request.sid
+        if not get_member_project(mongo, current_user.get_id(), project_id):
+            emit('notice', {'msg': '프로젝트를 찾을 수 없거나 권한이 없습니다.', 'project_id': project_id}, to=sid)
+            return
+
+        cursor = decode_chat_cursor(data.get('before') or '')
+        if not cursor:
+            emit('notice', {'msg': '잘못된 요청입니다.', 'project_id': project_id}, to=sid)
+            return
+
+        try:
+            limit = int(data.get('limit', CHAT_PAGE_SIZE))
+        except (TypeError, ValueError):
+            limit = CHAT_PAGE_SIZE
+
+        messages, before = fetch_older_messages(mongo, project_id, cursor, limit)
+        emit('older_messages', {
+            'project_id': project_id,
+            'messages': [serialize_chat_message(project_id, msg) for msg in messages],
+            'before': before
+        }, to=sid)
+
     # 'disconnect' 이벤트 핸들러
     @socketio.on('disconnect')
     def handle_disconnect():
@@ -193,7 +216,7 @@ def register_socket_events(socketio):
         user_id = str(current_user.get_id())
         timestamp = get_timestamp()
 
-        project = mongo.db.projects.find_one({'_id': ObjectId(project_id)})
+        project = get_member_project(mongo, user_id, project_id)
         if not project:
             emit('notice', {'msg': '프로젝트를 찾을 수 없습니다.', 'project_id': project_id}, to=request.sid)
             return
@@ -309,30 +332,24 @@ def register_socket_events(socketio):
             'read': False
         }, room=invitee['nickname'])
 
-        # 프로젝트 멤버들에게 알림 전송
-        for member in project.get('members', []):
-            member_nickname = mongo.db.users.find_one({'_id': member}).get('nickname')
-            if member_nickname and str(member) != inviter_id:  # 초대한 사람을 제외한 멤버들에게만 알림
-                notification_message = f'[{project["name"]}] {current_user.nickname}님이 {invitee_nickname}님을 프로젝트에 초대했습니다.'
-                notification_data = {
-                    'user_id': member,
-                    'message': notification_message,
-                    'type': 'project_invite',
-                    'timestamp': datetime.utcnow(),
-                    'read': False,
-                    'project_id': ObjectId(project_id)
-                }
-                mongo.db.notifications.insert_one(notification_data)
-                emit('notification', {
-                    'id': str(notification_data['_id']),
-                    'message': notification_message,
-                    'type': 'project_invite',
-                    'project_id': project_id,
-                    'project_name': project['name'],
-                    'author_name': current_user.nickname,
-                    'timestamp': notification_data['timestamp'].isoformat(),
-                    'read': False
-                }, room=member_nickname)
+        # 프로젝트 멤버들에게 알림 전송 (초대한 사람 제외)
+        notification_message = f'[{project["name"]}] {current_user.nickname}님이 {invitee_nickname}님을 프로젝트에 초대했습니다.'
+        notification_fanout.publish(
+            project.get('members', []),
+            exclude_user_id=inviter_id,
+            notification={
+                'message': notification_message,
+                'type': 'project_invite',
+                'project_id': ObjectId(project_id)
+            },
+            payload={
+                'message': notification_message,
+                'type': 'project_invite',
+                'project_id': project_id,
+                'project_name': project['name'],
+                'author_name': current_user.nickname
+            }
+        )
 
     # 'respond_invite' 이벤트 핸들러
     @socketio.on('respond_invite')
@@ -357,8 +374,9 @@ def register_socket_events(socketio):
             # 프로젝트 멤버로 추가
             mongo.db.projects.update_one(
                 {'_id': ObjectId(project_id)},
-                {'$addToSet': {'members': ObjectId(user_id)}}
+                {'$addToSet': {'members': ObjectId(user_id)}, '$inc': {'version': 1}}
             )
+            invalidate_membership(user_id=user_id, project_id=project_id)
             log_history(
                 mongo=mongo,
                 project_id=project_id,
@@ -410,37 +428,32 @@ def register_socket_events(socketio):
 
         project = mongo.db.projects.find_one({'_id': ObjectId(project_id)})
 
-        # 프로젝트 멤버들에게 알림 전송
-        for member in project.get('members', []):
-            member_nickname = mongo.db.users.find_one({'_id': member}).get('nickname')
-            if member_nickname and str(member) != user_id:  # 자신을 제외한 멤버들에게만 알림
-                notification_message = f'[{project["name"]}] {current_user.nickname}님이 새로운 카드를 생성했습니다: {card.get("title")}'
-                notification_data = {
-                    'user_id': member,
-                    'message': notification_message,
-                    'type': 'card_created',
-                    'timestamp': datetime.utcnow(),
-                    'read': False,
-                    'project_id': ObjectId(project_id),
-                    'card_id': card.get('_id')
-                }
-                mongo.db.notifications.insert_one(notification_data)
-                emit('notification', {
-                    'id': str(notification_data['_id']),
-                    'message': notification_message,
-                    'type': 'card_created',
-                    'timestamp': notification_data['timestamp'].isoformat(),
-                    'read': False,
-                    'project_id': str(project_id),
-                    'card_id': str(card.get('_id'))
-                }, room=member_nickname)
-                emit('card_created', {
+        # 프로젝트 멤버들에게 알림 전송 (자신 제외)
+        notification_message = f'[{project["name"]}] {current_user.nickname}님이 새로운 카드를 생성했습니다: {card.get("title")}'
+        notification_fanout.publish(
+            project.get('members', []),
+            exclude_user_id=user_id,
+            notification={
+                'message': notification_message,
+                'type': 'card_created',
+                'project_id': ObjectId(project_id),
+                'card_id': card.get('_id')
+            },
+            payload={
+                'message': notification_message,
+                'type': 'card_created',
+                'project_id': str(project_id),
+                'card_id': str(card.get('_id'))
+            },
+            # 변경 스트림을 쓰면 card_created는 DB 변경에서 전송됨
+            extra_events=[] if change_broadcaster.enabled else [('card_created', {
                 'project_id': project_id,
                 'card': card,
-                'user_id': str(current_user.get_id()),
+                'user_id': user_id,
                 'nickname': current_user.nickname,
                 'timestamp': datetime.utcnow().isoformat()
-                },room=member_nickname)
+            })]
+        )
 
     # 'delete_card' 이벤트 핸들러
     @socketio.on('delete_card')
@@ -475,32 +488,33 @@ def register_socket_events(socketio):
             details={'title': card['title']}
         )
 
-        # 프로젝트 멤버들에게 알림 전송
-        for member in project.get('members', []):
-            member_nickname = mongo.db.users.find_one({'_id': member}).get('nickname')
-            if member_nickname and str(member) != user_id:  # 자신을 제외한 멤버들에게만 알림
-                notification_message = f'[{project["name"]}] {current_user.nickname}님이 카드를 삭제했습니다: {card["title"]}'
-                notification_data = {
-                    'user_id': member,
-                    'message': notification_message,
-                    'type': 'card_deleted',
-                    'timestamp': datetime.utcnow(),
-                    'read': False,
-                    'project_id': ObjectId(project_id),
-                    'card_id': ObjectId(card_id)
-                }
-                mongo.db.notifications.insert_one(notification_data)
-                emit('notification', {
-                    'id': str(notification_data['_id']),
-                    'message': notification_message,
-                    'type': 'card_deleted',
-                    'timestamp': notification_data['timestamp'].isoformat(),
-                    'read': False,
-                    'project_id': str(project_id),
-                    'card_id': card_id
-                }, room=member_nickname)
+        # 프로젝트 멤버들에게 알림 전송 (자신 제외)
+        notification_message = f'[{project["name"]}] {current_user.nickname}님이 카드를 삭제했습니다: {card["title"]}'
+        notification_fanout.publish(
+            project.get('members', []),
+            exclude_user_id=user_id,
+            notification={
+                'message': notification_message,
+                'type': 'card_deleted',
+                'project_id': ObjectId(project_id),
+                'card_id': ObjectId(card_id)
+            },
+            payload={
+                'message': notification_message,
+                'type': 'card_deleted',
+                'project_id': str(project_id),
+                'card_id': card_id
+            }
+        )
 
-        mongo.db.cards.delete_one({'_id': ObjectId(card_id)})
+        with optional_transaction(mongo) as session:
+            deleted = mongo.db.cards.find_one_and_delete({'_id': ObjectId(card_id)}, projection={'status': 1}, session=session)
+            if deleted:
+                count_card_removed(mongo, ObjectId(project_id), deleted['status'], session)
+            bump_project_version(mongo, ObjectId(project_id), session=session)
+        unindex(mongo, [ObjectId(card_id)])
+        if change_broadcaster.enabled:
+            return
         emit('card_deleted', {
             'project_id': project_id,
             'card_id': card_id,
@@ -598,44 +612,47 @@ def register_socket_events(socketio):
             #     details=changes
             # )
 
-            # 프로젝트 멤버들에게 알림 전송
-            for member in project.get('members', []):
-                member_nickname = mongo.db.users.find_one({'_id': member}).get('nickname')
-                if member_nickname and str(member) != user_id:  # 자신을 제외한 멤버들에게만 알림
-                    change_messages = []
-                    if 'title' in changes:
-                        change_messages.append(f'제목: {changes["title"]["from"]} → {changes["title"]["to"]}')
-                    if 'status' in changes:
-                        status_map = {'todo': 'To Do', 'in_progress': 'In Progress', 'done': 'Done'}
-                        from_status = status_map.get(changes['status']['from'], changes['status']['from'])
-                        to_status = status_map.get(changes['status']['to'], changes['status']['to'])
-                        change_messages.append(f'상태: {from_status} → {to_status}')
-                    
-                    notification_message = f'[{project["name"]}] {current_user.nickname}님이 카드를 수정했습니다: {card["title"]}\n변경사항: {", ".join(change_messages)}'
-                    notification_data = {
-                        'user_id': member,
-                        'message': notification_message,
-                        'type': 'card_updated',
-                        'timestamp': datetime.utcnow(),
-                        'read': False,
-                        'project_id': ObjectId(project_id),
-                        'card_id': ObjectId(card_id)
-                    }
-                    mongo.db.notifications.insert_one(notification_data)
-                    emit('notification', {
-                        'id': str(notification_data['_id']),
-                        'message': notification_message,
-                        'type': 'card_updated',
-                        'timestamp': notification_data['timestamp'].isoformat(),
-                        'read': False,
-                        'project_id': str(project_id),
-                        'card_id': card_id
-                    }, room=member_nickname)
+            # 프로젝트 멤버들에게 알림 전송 (자신 제외)
+            change_messages = []
+            if 'title' in changes:
+                change_messages.append(f'제목: {changes["title"]["from"]} → {changes["title"]["to"]}')
+            if 'status' in changes:
+                status_map = {'todo': 'To Do', 'in_progress': 'In Progress', 'done': 'Done'}
+                from_status = status_map.get(changes['status']['from'], changes['status']['from'])
+                to_status = status_map.get(changes['status']['to'], changes['status']['to'])
+                change_messages.append(f'상태: {from_status} → {to_status}')
+
+            notification_message = f'[{project["name"]}] {current_user.nickname}님이 카드를 수정했습니다: {card["title"]}\n변경사항: {", ".join(change_messages)}'
+            notification_fanout.publish(
+                project.get('members', []),
+                exclude_user_id=user_id,
+                notification={
+                    'message': notification_message,
+                    'type': 'card_updated',
+                    'project_id': ObjectId(project_id),
+                    'card_id': ObjectId(card_id)
+                },
+                payload={
+                    'message': notification_message,
+                    'type': 'card_updated',
+                    'project_id': str(project_id),
+                    'card_id': card_id
+                }
+            )
 
-        mongo.db.cards.update_one(
-            {'_id': ObjectId(card_id)},
-            {'$set': update_data}
-        )
+        with optional_transaction(mongo) as session:
+            before = mongo.db.cards.find_one_and_update(
+                {'_id': ObjectId(card_id)},
+                {'$set': update_data},
+                projection={'status': 1},
+                session=session
+            )
+            if before:
+                count_status_changed(mongo, ObjectId(project_id), before['status'], update_data['status'], session)
+            bump_project_version(mongo, ObjectId(project_id), session=session)
+        index_card(mongo, {**card, **update_data})
+        if change_broadcaster.enabled:
+            return
 
         emit('card_updated', {
             'project_id': project_id,
@@ -658,15 +675,9 @@ def register_socket_events(socketio):
         timestamp = get_timestamp()
 
         try:
-            project = mongo.db.projects.find_one({'_id': ObjectId(project_id)})
-            if not project:
-                print(f"프로젝트 찾을 수 없음: {project_id}")
-                emit('notice', {'msg': '프로젝트를 찾을 수 없습니다.', 'project_id': project_id}, to=request.sid)
-                return
-
-            if ObjectId(user_id) not in project.get('members', []):
+            if not get_member_project(mongo, user_id, project_id):
                 print(f"사용자 {user_id}는 프로젝트 {project_id}의 멤버가 아님")
-                emit('notice', {'msg': '프로젝트에 대한 권한이 없습니다.', 'project_id': project_id}, to=request.sid)
+                emit('notice', {'msg': '프로젝트를 찾을 수 없거나 권한이 없습니다.', 'project_id': project_id}, to=request.sid)
                 return
 
             if deadline:
@@ -720,50 +731,40 @@ def register_socket_events(socketio):
                 emit('notice', {'msg': '프로젝트에 대한 권한이 없습니다.', 'project_id': project_id}, to=request.sid)
                 return
 
-            emit('create_comment', {
-                'project_id': project_id,
-                'comment': {
-                    'id': comment_id,
-                    'content': content,
-                    'user_id': user_id,
-                    'nickname': nickname,
-                    'image_url': image_url,
-                    'timestamp': timestamp
-                }
-            }, room=project_id)
+            if not change_broadcaster.enabled:
+                emit('create_comment', {
+                    'project_id': project_id,
+                    'comment': {
+                        'id': comment_id,
+                        'content': content,
+                        'user_id': user_id,
+                        'nickname': nickname,
+                        'image_url': image_url,
+                        'timestamp': timestamp
+                    }
+                }, room=project_id)
 
             members = project.get('members', [])
             print(f"{len(members)}명의 멤버에게 알림 전송")
-            for member in members:
-                member_data = mongo.db.users.find_one({'_id': member})
-                if not member_data:
-                    print(f"멤버 ID {member}에 대한 사용자 정보 없음")
-                    continue
-                member_nickname = member_data.get('nickname')
-                if member_nickname and str(member) != user_id:
-                    print(f"멤버 {member_nickname}에게 알림 전송")
-                    notification_message = f'[{project["name"]}] {nickname}님이 새로운 댓글을 달았습니다.'
-                    notification_data = {
-                        'user_id': member,
-                        'message': notification_message,
-                        'type': 'new_comment',
-                        'timestamp': datetime.utcnow(),
-                        'read': False,
-                        'project_id': ObjectId(project_id),
-                        'comment_id': comment_id
-                    }
-                    mongo.db.notifications.insert_one(notification_data)
-                    emit('notification', {
-                        'id': str(notification_data['_id']),
-                        'message': notification_message,
-                        'type': 'new_comment',
-                        'project_id': project_id,
-                        'project_name': project['name'],
-                        'author_name': nickname,
-                        'timestamp': notification_data['timestamp'].isoformat(),
-                        'read': False,
-                        'comment_id': str(comment_id)
-                    }, room=member_nickname)
+            notification_message = f'[{project["name"]}] {nickname}님이 새로운 댓글을 달았습니다.'
+            notification_fanout.publish(
+                members,
+                exclude_user_id=user_id,
+                notification={
+                    'message': notification_message,
+                    'type': 'new_comment',
+                    'project_id': ObjectId(project_id),
+                    'comment_id': comment_id
+                },
+                payload={
+                    'message': notification_message,
+                    'type': 'new_comment',
+                    'project_id': project_id,
+                    'project_name': project['name'],
+                    'author_name': nickname,
+                    'comment_id': str(comment_id)
+                }
+            )
 
         except Exception as e:
             print(f"add_comment 처리 중 오류: {str(e)}")
@@ -774,6 +775,8 @@ def register_socket_events(socketio):
     @login_required
     def handle_edit_comment(data):
         print(f"edit_comment 이벤트 수신: {data}")
+        if change_broadcaster.enabled:
+            return  # 변경 스트림에서 comment_edited 전송
         project_id = str(data.get('project_id'))  # 프로젝트 ID
         comment_id = str(data.get('comment_id'))  # 댓글 ID
         content = data.get('content')  # 댓글 내용
@@ -802,7 +805,9 @@ def register_socket_events(socketio):
     @login_required
     def handle_delete_comment(data):
         print(f"delete_comment 이벤트 처리 시작: data={data}, socket_id={request.sid}")
-        
+        if change_broadcaster.enabled:
+            return  # 변경 스트림에서 comment_deleted 전송
+
         project_id = str(data.get('project_id'))  # 프로젝트 ID
         comment_id = str(data.get('comment_id'))  # 댓글 ID
         user_id = str(current_user.get_id())  # 작성자 ID
@@ -828,9 +833,17 @@ def register_socket_events(socketio):
             check_deadline_notifications(user_id)
 
     @socketio.on("card_moved")
+    @login_required
     def broadcast_card_moved(data):
+        if change_broadcaster.enabled:
+            return  # 변경 스트림에서 card_moved 전송
         source_project_id = data.get("source_project_id")
         target_project_id = data.get("target_project_id")
+        user_id = current_user.get_id()
+        if not get_member_project(mongo, user_id, source_project_id) or \
+                not get_member_project(mongo, user_id, target_project_id):
+            emit('notice', {'msg': '프로젝트를 찾을 수 없거나 권한이 없습니다.', 'project_id': source_project_id}, to=request.sid)
+            return
         emit("card_moved", data, room= source_project_id)
         if source_project_id != target_project_id:
             emit("card_moved", data, room= target_project_id)
@@ -0,0 +1,173 @@
+import mimetypes
+import os
+from flask import Blueprint, current_app, abort, jsonify, redirect, request, send_from_directory
+from flask_login import login_required, current_user
+from pymongo.errors import PyMongoError
+from werkzeug.security import safe_join
+from app.utils.helpers import logger, safe_object_id, handle_db_error
+from app.utils.images import UploadError, image_store
+from app.utils.upload_sessions import upload_sessions
+from app import mongo
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# 내용 해시 이름의 파일은 1년 + immutable, 이전 방식(uuid 이름) 파일은 매번 재검증
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _set_cache_headers(response, filename):
+    if image_store.is_content_named(filename):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.no_cache = True
+    return response
+
+
+@uploads_bp.route("/uploads/<path:filename>", methods=["GET"])
+def serve_upload(filename):
+    """댓글 이미지 전송
+
+    UPLOADS_ACCEL_REDIRECT가 설정되어 있으면 헤더만 응답하고 실제 전송(sendfile, Range, 조건부 요청)은
+    nginx가 맡는다. 아니면 send_from_directory가 Range와 If-None-Match/If-Modified-Since를 처리하고
+    USE_X_SENDFILE 또는 wsgi.file_wrapper(gunicorn은 sendfile)로 파일을 보낸다.
+    """
+    if filename.endswith((".upload", ".tmp")):
+        abort(404)  # 저장 중인 임시 파일
+
+    original, variant = image_store.split_variant(filename)
+    if variant and image_store.has_variants(original):
+        path = safe_join(image_store.root, filename)
+        if path is not None and not os.path.isfile(path):
+            # 축소본을 아직 만드는 중: 원본으로 보내되 리다이렉트는 캐시하지 않아 다음 요청에서 축소본을 받게 함
+            image_store.ensure_variants(original)
+            response = redirect(image_store.url(original))
+            response.cache_control.no_store = True
+            return response
+
+    accel_prefix = current_app.config.get("UPLOADS_ACCEL_REDIRECT")
+    if accel_prefix:
+        path = safe_join(image_store.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix}/{filename}"
+        return _set_cache_headers(response, filename)
+
+    max_age = IMMUTABLE_MAX_AGE if image_store.is_content_named(filename) else 0
+    response = send_from_directory(image_store.root, filename, max_age=max_age)
+    return _set_cache_headers(response, filename)
+
+
+def _session_response(session, status=200, message=None):
+    body = {
+        "upload_id": str(session["_id"]),
+        "size": session["size"],
+        "offset": session["received"],
+        "status": session["status"],
+        "chunk_size": upload_sessions.chunk_size
+    }
+    if message:
+        body["message"] = message
+    response = jsonify(body)
+    response.headers["Upload-Offset"] = str(session["received"])
+    return response, status
+
+
+def _find_session(upload_id):
+    upload_oid = safe_object_id(upload_id)
+    if not upload_oid:
+        return None
+    return upload_sessions.get(mongo, safe_object_id(current_user.get_id()), upload_oid)
+
+
+@uploads_bp.route("/upload-sessions", methods=["POST"])
+@login_required
+def create_upload_session():
+    """이어 올리기 세션 생성 ({"size": 전체 바이트 수})"""
+    data = request.get_json(silent=True) or {}
+    size = data.get("size")
+    if not isinstance(size, int) or isinstance(size, bool):
+        return jsonify({"message": "파일 크기가 필요합니다."}), 400
+    try:
+        session = upload_sessions.create(mongo, safe_object_id(current_user.get_id()), size)
+    except UploadError as e:
+        logger.error(f"Rejected upload session: {e.message}")
+        return jsonify({"message": e.message}), e.status
+    except PyMongoError as e:
+        return handle_db_error(e)
+    return _session_response(session, 201)
+
+
+@uploads_bp.route("/upload-sessions/<upload_id>", methods=["GET"])
+@login_required
+def get_upload_session(upload_id):
+    """이어 올릴 위치 조회 (연결이 끊긴 뒤 offset부터 다시 보냄)"""
+    session = _find_session(upload_id)
+    if not session:
+        return jsonify({"message": "업로드를 찾을 수 없습니다."}), 404
+    return _session_response(session)
+
+
+@uploads_bp.route("/upload-sessions/<upload_id>", methods=["PUT"])
+@login_required
+def put_upload_chunk(upload_id):
+    """본문을 offset(?offset= 또는 Upload-Offset 헤더) 위치부터 이어서 기록"""
+    session = _find_session(upload_id)
+    if not session:
+        return jsonify({"message": "업로드를 찾을 수 없습니다."}), 404
+    offset = request.args.get("offset", request.headers.get("Upload-Offset"))
+    if offset is None or not offset.isdigit():
+        return jsonify({"message": "업로드 위치(offset)가 필요합니다."}), 400
+    if request.content_length is None:
+        return jsonify({"message": "Content-Length가 필요합니다."}), 411
+
+    try:
+        received = upload_sessions.write_chunk(mongo, session, int(offset), request.stream, request.content_length)
+    except UploadError as e:
+        logger.error(f"Rejected chunk for upload session {upload_id}: {e.message}")
+        if e.status == 409:
+            # 현재 받은 위치를 알려 주어 그 위치부터 다시 보내게 함
+            return _session_response(_find_session(upload_id) or session, 409, e.message)
+        return jsonify({"message": e.message}), e.status
+    except PyMongoError as e:
+        return handle_db_error(e)
+    session["received"] = received
+    return _session_response(session)
+
+
+@uploads_bp.route("/upload-sessions/<upload_id>/complete", methods=["POST"])
+@login_required
+def complete_upload_session(upload_id):
+    """다 받은 파일을 이미지 저장소로 옮김, 이후 댓글 작성 시 upload_id로 첨부"""
+    session = _find_session(upload_id)
+    if not session:
+        return jsonify({"message": "업로드를 찾을 수 없습니다."}), 404
+    try:
+        image_filename = upload_sessions.complete(mongo, session)
+    except UploadError as e:
+        logger.error(f"Failed to complete upload session {upload_id}: {e.message}")
+        return jsonify({"message": e.message}), e.status
+    except PyMongoError as e:
+        return handle_db_error(e)
+    except OSError as e:
+        logger.error(f"Failed to store upload session {upload_id}: {str(e)}")
+        return jsonify({"message": "이미지를 저장하지 못했습니다. 다시 업로드해주세요."}), 500
+    return jsonify({
+        "upload_id": upload_id,
+        "image_url": image_store.variant_url(image_filename, "thumb")
+    }), 200
+
+
+@uploads_bp.route("/upload-sessions/<upload_id>", methods=["DELETE"])
+@login_required
+def delete_upload_session(upload_id):
+    session = _find_session(upload_id)
+    if not session:
+        return jsonify({"message": "업로드를 찾을 수 없습니다."}), 404
+    upload_sessions.abort(mongo, session)
+    return jsonify({"message": "업로드가 취소되었습니다."}), 200
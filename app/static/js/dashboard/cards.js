@@ -44,8 +44,10 @@ window.initializeCards = function() {
 
         const newCard = await response.json();
         const container = document.querySelector(`.project-card-wrapper[data-project-id="${newCard.project_id}"] .card-container`);
-        const cardElement = createCardElement(newCard, false);
-        container.appendChild(cardElement);
+        // 서버 푸시가 응답보다 먼저 도착했으면 이미 추가되어 있음
+        if (!container.querySelector(`[data-card-id="${newCard.id}"]`)) {
+          container.appendChild(createCardElement(newCard, false));
+        }
 
         bootstrap.Modal.getInstance(document.getElementById("createCardModal")).hide();
         createCardForm.reset();
@@ -73,7 +75,7 @@ window.initializeCards = function() {
   socket.on('card_created', (data) => {
     console.log("card_created 이벤트 수신:", data);
     const container = document.querySelector(`.project-card-wrapper[data-project-id="${data.card.project_id}"] .card-container`);
-    if (container) {
+    if (container && !container.querySelector(`[data-card-id="${data.card.id}"]`)) {
       const cardElement = createCardElement(data.card, false);
       container.appendChild(cardElement);
     }
@@ -96,21 +98,32 @@ window.initializeCards = function() {
       done: "Done"
     }[updates.status] || updates.status;
 
+    // 서버 푸시는 바뀐 필드만 보내므로 없는 필드는 그대로 둠
     if (cardElement) {
-      cardElement.dataset.status = updates.status;
-      const badge = cardElement.querySelector(".badge");
-      badge.className = `badge ${statusClasses[updates.status] || "bg-secondary"} mt-2`;
-      badge.textContent = statusText;
-      cardElement.querySelector(".card-title").textContent = updates.title;
+      if (updates.status !== undefined) {
+        cardElement.dataset.status = updates.status;
+        const badge = cardElement.querySelector(".badge");
+        badge.className = `badge ${statusClasses[updates.status] || "bg-secondary"} mt-2`;
+        badge.textContent = statusText;
+      }
+      if (updates.title !== undefined) cardElement.querySelector(".card-title").textContent = updates.title;
     }
 
     if (modalCard) {
-      modalCard.dataset.status = updates.status;
-      const modalBadge = modalCard.querySelector(".badge");
-      modalBadge.className = `badge ${statusClasses[updates.status] || "bg-secondary"} mt-2`;
-      modalBadge.textContent = statusText;
-      modalCard.querySelector(".card-title").textContent = updates.title;
-      modalCard.querySelector(".card-description").textContent = updates.description;
+      if (updates.status !== undefined) {
+        modalCard.dataset.status = updates.status;
+        const modalBadge = modalCard.querySelector(".badge");
+        modalBadge.className = `badge ${statusClasses[updates.status] || "bg-secondary"} mt-2`;
+        modalBadge.textContent = statusText;
+      }
+      if (updates.title !== undefined) modalCard.querySelector(".card-title").textContent = updates.title;
+      if (updates.description !== undefined) modalCard.querySelector(".card-description").textContent = updates.description;
+    }
+
+    // 순서 변경(rank)은 해당 카드만 제자리로 옮김
+    if (updates.rank !== undefined) {
+      [cardElement, modalCard].forEach(el => el && placeCardByRank(el, updates.rank));
+      if (Object.keys(updates).length === 1) return;
     }
 
     if (typeof loadHistory === 'function') {
@@ -130,7 +143,7 @@ window.initializeCards = function() {
 
 async function loadCards() {
   try {
-    const mainResponse = await fetch("/projects/all/cards");
+    const mainResponse = await fetch("/projects/all/cards?stream=1");
     if (!mainResponse.ok) {
       const error = await mainResponse.json();
       throw new Error(error.message || "카드 로드 실패");
@@ -181,12 +194,23 @@ async function loadCards() {
   }
 }
 
+// 같은 컨테이너 안에서 rank 순서(서버 정렬과 같은 문자열 비교)에 맞는 위치로 카드를 옮김
+function placeCardByRank(cardElement, rank) {
+  cardElement.dataset.rank = rank || "";
+  const container = cardElement.parentNode;
+  if (!container) return;
+  const next = [...container.querySelectorAll(".task-card")]
+    .find(el => el !== cardElement && el.dataset.rank > cardElement.dataset.rank);
+  container.insertBefore(cardElement, next || null);
+}
+
 function createCardElement(card, isModal = false) {
   const cardElement = document.createElement("div");
   cardElement.className = "task-card";
   cardElement.dataset.cardId = card.id;
   cardElement.dataset.projectId = card.project_id;
   cardElement.dataset.status = card.status;
+  cardElement.dataset.rank = card.rank || "";
 
   const statusClasses = {
     todo: "bg-primary",
@@ -65,14 +65,26 @@ window.initializeChat = function () {
   });
 
   // Socket 이벤트 설정
-  socket.on("chat_history", (history) => {
-    history.forEach(data => {
-      if (data.project_id) {
-        appendChatMessage(data.project_id, data.nickname, data.message, data.timestamp);
-      }
+  socket.on("chat_history", (data) => {
+    if (!data.project_id) return;
+    const instance = chatInstances.get(data.project_id);
+    if (instance) {
+      instance.before = data.before;
+      instance.loadingOlder = false;
+    }
+    data.messages.forEach(msg => {
+      appendChatMessage(msg.project_id, msg.nickname, msg.message, msg.timestamp);
     });
   });
 
+  socket.on("older_messages", (data) => {
+    const instance = chatInstances.get(data.project_id);
+    if (!instance) return;
+    instance.before = data.before;
+    instance.loadingOlder = false;
+    prependChatMessages(data.project_id, data.messages);
+  });
+
   socket.on("message", (data) => {
     if (data.project_id) {
       appendChatMessage(data.project_id, data.nickname, data.message, data.timestamp);
@@ -199,10 +211,18 @@ function openChat(projectId, projectName) {
   chatBox.style.bottom = "20px";
   chatBox.style.zIndex = "10000";
 
-  chatInstances.set(projectId, { element: chatBox, isMinimized: false });
+  chatInstances.set(projectId, { element: chatBox, isMinimized: false, before: null, loadingOlder: false });
 
   makeDraggable(chatBox, chatBox.querySelector(".chat-header"));
 
+  // 맨 위로 스크롤하면 이전 메시지 불러오기
+  const chatMessages = chatBox.querySelector(`#chatMessages-${projectId}`);
+  chatMessages.addEventListener("scroll", () => {
+    if (chatMessages.scrollTop === 0) {
+      loadOlderMessages(projectId);
+    }
+  });
+
   // 최소화 버튼 이벤트 (클릭 + 터치)
   const minimizeBtn = chatBox.querySelector(`#minimizeChat-${projectId}`);
   minimizeBtn.addEventListener("click", (e) => {
@@ -293,6 +313,29 @@ function appendChatMessage(projectId, nickname, message, timestamp) {
   }
 }
 
+function loadOlderMessages(projectId) {
+  const instance = chatInstances.get(projectId);
+  if (!instance || !instance.before || instance.loadingOlder) return;
+  instance.loadingOlder = true;
+  socket.emit("load_older_messages", { project_id: projectId, before: instance.before });
+}
+
+function prependChatMessages(projectId, messages) {
+  const chatMessages = document.getElementById(`chatMessages-${projectId}`);
+  if (!chatMessages || messages.length === 0) return;
+  const previousHeight = chatMessages.scrollHeight;
+  const fragment = document.createDocumentFragment();
+  messages.forEach(msg => {
+    const div = document.createElement("div");
+    const color = (msg.nickname === window.currentUserNickname) ? "green" : "black";
+    div.innerHTML = `<strong style="color:${color}">${msg.nickname}</strong>: ${msg.message} <small class="text-muted">(${msg.timestamp})</small>`;
+    fragment.appendChild(div);
+  });
+  chatMessages.insertBefore(fragment, chatMessages.firstChild);
+  // 보고 있던 위치 유지
+  chatMessages.scrollTop = chatMessages.scrollHeight - previousHeight;
+}
+
 function appendSystemMessage(projectId, msg) {
   const chatMessages = document.getElementById(`chatMessages-${projectId}`);
   if (!chatMessages) return;
@@ -502,8 +502,10 @@ function initializeDragAndDrop() {
                 credentials: 'include',
                 body: JSON.stringify(payload)
             });
-            // 소켓 통신을 통해 다른 클라이언트에게 카드 이동 알림
-            socket.emit('card_moved', { card_id: cardId, source_project_id: sourceProjectId, target_project_id: targetProjectId, order });
+            // 소켓 통신을 통해 다른 클라이언트에게 카드 이동 알림 (서버 푸시 사용 시 서버가 전송)
+            if (!window.serverPush) {
+                socket.emit('card_moved', { card_id: cardId, source_project_id: sourceProjectId, target_project_id: targetProjectId, order });
+            }
 
             let errorData = null;
             try { errorData = await response.json(); } catch (e) {
@@ -537,13 +539,9 @@ socket.on("card_moved", data => {
     const { source_project_id, target_project_id } = data;
     const currentProjectIds = getVisibleProjectIds();
 
-    // 소스 프로젝트에 현재 표시된 카드가 있다면 다시 로드
-    if (currentProjectIds.includes(source_project_id)) {
-        loadCards(source_project_id);
-    }
-    // 대상 프로젝트에 현재 표시된 카드가 있다면 다시 로드
-    if (currentProjectIds.includes(target_project_id)) {
-        loadCards(target_project_id);
+    // 소스/대상 프로젝트 중 하나라도 표시 중이면 카드를 한 번만 다시 로드
+    if (currentProjectIds.includes(source_project_id) || currentProjectIds.includes(target_project_id)) {
+        loadCards();
     }
 });
 
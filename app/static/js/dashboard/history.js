@@ -1,3 +1,6 @@
+// 무한 스크롤 상태 (다음 페이지 커서)
+const historyState = { projectId: null, next: null, loading: false };
+
 document.addEventListener("DOMContentLoaded", function () {
   const toggle = document.getElementById("history-toggle");
   const list = document.getElementById("history-list");
@@ -9,12 +12,46 @@ document.addEventListener("DOMContentLoaded", function () {
     arrow.classList.toggle("bi-caret-right-fill");
     arrow.classList.toggle("bi-caret-down-fill");
   });
+
+  // 목록 끝에 가까워지면 다음 페이지 로드
+  list.addEventListener("scroll", function () {
+    if (list.scrollTop + list.clientHeight >= list.scrollHeight - 40) {
+      loadMoreHistory();
+    }
+  });
 });
 
+async function fetchHistoryPage(projectId, cursor) {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`/history/${projectId}?${params.toString()}`, {
+    headers: { "Content-Type": "application/json" },
+    credentials: "include"
+  });
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+  return response.json();
+}
+
+async function loadMoreHistory() {
+  if (!historyState.next || historyState.loading) return;
+  historyState.loading = true;
+  try {
+    const data = await fetchHistoryPage(historyState.projectId, historyState.next);
+    historyState.next = data.next || null;
+    renderHistoryEntries(data.history || []);
+  } catch (error) {
+    console.error("Failed to load more history:", error);
+  } finally {
+    historyState.loading = false;
+  }
+}
+
 async function loadHistory(projectId) {
+  const historyList = document.getElementById("history-list");
   try {
     const loading = document.getElementById("history-loading");
-    const historyList = document.getElementById("history-list");
     const arrow = document.getElementById("history-arrow");
 
     loading.style.display = "block";
@@ -23,17 +60,11 @@ async function loadHistory(projectId) {
     arrow.classList.remove("bi-caret-down-fill");
     arrow.classList.add("bi-caret-right-fill");
 
-    const response = await fetch(`/history/${projectId}`, {
-      headers: { "Content-Type": "application/json" },
-      credentials: "include"
-    });
+    historyState.projectId = projectId;
+    historyState.next = null;
+    const data = await fetchHistoryPage(projectId, null);
     loading.style.display = "none";
-
-    if (!response.ok) {
-      throw new Error(`HTTP error! status: ${response.status}`);
-    }
-
-    const data = await response.json();
+    historyState.next = data.next || null;
 
     if (!data.history || !Array.isArray(data.history) || data.history.length === 0) {
       const li = document.createElement("li");
@@ -42,7 +73,20 @@ async function loadHistory(projectId) {
       return;
     }
 
-    data.history.forEach(entry => {
+    renderHistoryEntries(data.history);
+  } catch (error) {
+    console.error("Failed to load history:", error);
+    document.getElementById("history-loading").style.display = "none";
+    historyList.innerHTML = "";
+    const li = document.createElement("li");
+    li.textContent = "히스토리를 불러오는 데 실패했습니다.";
+    historyList.appendChild(li);
+  }
+}
+
+function renderHistoryEntries(entries) {
+    const historyList = document.getElementById("history-list");
+    entries.forEach(entry => {
       const li = document.createElement("li");
       let detailText = "";
 
@@ -124,9 +168,13 @@ async function loadHistory(projectId) {
               : `알 수 없는 상태 변경`;
             break;
           case "card_reorder":
-            detailText = entry.details.title
-              ? `카드 순서 변경: ${entry.details.title} (새 순서: ${entry.details.new_order || '알 수 없음'})`
-              : `알 수 없는 순서 변경`;
+            if (entry.details.card_count > 1) {
+              detailText = `카드 순서 변경: ${entry.details.card_count}개 카드 (${(entry.details.titles || []).join(", ")})`;
+            } else {
+              detailText = entry.details.title
+                ? `카드 순서 변경: ${entry.details.title} (새 순서: ${entry.details.new_order ?? '알 수 없음'})`
+                : `알 수 없는 순서 변경`;
+            }
             break;
           case "card_title_update":
             detailText = `카드 제목 수정: ${entry.details.from_title || '없음'} -> ${entry.details.to_title || '없음'}`;
@@ -143,13 +191,4 @@ async function loadHistory(projectId) {
         historyList.appendChild(li);
       }
     });
-
-  } catch (error) {
-    console.error("Failed to load history:", error);
-    document.getElementById("history-loading").style.display = "none";
-    historyList.innerHTML = "";
-    const li = document.createElement("li");
-    li.textContent = "히스토리를 불러오는 데 실패했습니다.";
-    historyList.appendChild(li);
-  }
 }
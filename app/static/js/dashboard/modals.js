@@ -194,11 +194,11 @@ window.initializeModals = function() {
               return;
             }
 
-            const formData = new FormData();
-            if (content) formData.append('content', content);
-            if (fileInput?.files.length) formData.append('image', fileInput.files[0]);
-
             try {
+              const formData = new FormData();
+              if (content) formData.append('content', content);
+              if (fileInput?.files.length) formData.append('upload_id', await uploadImageResumable(fileInput.files[0]));
+
               const res = await fetch(`/projects/${projectId}/comments`, {
                 method: 'POST',
                 body: formData,
@@ -547,6 +547,50 @@ function startInlineEdit(div) {
   textarea.focus();
 }
 
+// 이미지를 조각으로 나누어 올림, 연결이 끊기면 서버가 받은 위치부터 다시 보냄 (upload_id 반환)
+async function uploadImageResumable(file, maxRetries = 5) {
+  const initRes = await fetch('/upload-sessions', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ size: file.size }),
+    credentials: 'include'
+  });
+  const session = await initRes.json().catch(() => ({}));
+  if (!initRes.ok) throw new Error(session.message || `업로드 시작 실패: ${initRes.status}`);
+
+  const uploadUrl = `/upload-sessions/${session.upload_id}`;
+  let offset = session.offset;
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const res = await fetch(`${uploadUrl}?offset=${offset}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(offset, offset + session.chunk_size),
+        credentials: 'include'
+      });
+      const data = await res.json().catch(() => ({}));
+      if (res.ok || res.status === 409) {
+        offset = data.offset;  // 409: 서버가 알려 준 위치부터 이어서
+        retries = 0;
+        continue;
+      }
+      if (res.status < 500) throw new Error(data.message || `업로드 실패: ${res.status}`);
+    } catch (err) {
+      if (!(err instanceof TypeError)) throw err;  // TypeError: 네트워크 오류
+    }
+    if (++retries > maxRetries) throw new Error('업로드 중 연결이 끊어졌습니다.');
+    await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** retries));
+    const stateRes = await fetch(uploadUrl, { credentials: 'include' }).catch(() => null);
+    if (stateRes?.ok) offset = (await stateRes.json()).offset;
+  }
+
+  const completeRes = await fetch(`${uploadUrl}/complete`, { method: 'POST', credentials: 'include' });
+  const completed = await completeRes.json().catch(() => ({}));
+  if (!completeRes.ok) throw new Error(completed.message || `업로드 완료 실패: ${completeRes.status}`);
+  return completed.upload_id;
+}
+
 async function saveInlineEdit(div, projectId) {
   const commentId = div.dataset.id;
   const textarea = div.querySelector('textarea');
@@ -564,7 +608,7 @@ async function saveInlineEdit(div, projectId) {
     if (hasImage || isImageRemoved) {
       const formData = new FormData();
       formData.append('content', newText);
-      if (hasImage) formData.append('image', fileInput.files[0]);
+      if (hasImage) formData.append('upload_id', await uploadImageResumable(fileInput.files[0]));
       if (isImageRemoved) formData.append('delete_image', '1');
 
       console.log('이미지 업로드/삭제 요청:', { hasImage, isImageRemoved, content: newText, file: hasImage ? fileInput.files[0].name : null });
@@ -578,7 +622,7 @@ async function saveInlineEdit(div, projectId) {
       responseData = await res.json();
       console.log('PUT API 응답:', responseData);
 
-      socket.emit('edit_comment', {
+      if (!window.serverPush) socket.emit('edit_comment', {
         project_id: projectId,
         comment_id: commentId,
         content: newText,
@@ -601,7 +645,7 @@ async function saveInlineEdit(div, projectId) {
       responseData = await res.json();
       console.log('PUT API 응답:', responseData);
 
-      socket.emit('edit_comment', {
+      if (!window.serverPush) socket.emit('edit_comment', {
         project_id: projectId,
         comment_id: commentId,
         content: newText,
@@ -646,7 +690,7 @@ async function deleteComment(commentId, projectId) {
     });
 
     if (!res.ok) throw new Error(`댓글 삭제 실패: ${res.status}`);
-    socket.emit('delete_comment', {
+    if (!window.serverPush) socket.emit('delete_comment', {
       project_id: projectId,
       comment_id: commentId
     });
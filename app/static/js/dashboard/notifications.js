@@ -327,6 +327,36 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // 초대할 닉네임 자동완성 (초성 검색 지원)
+    const inviteNicknameInput = document.querySelector('#inviteMemberForm input[name="nickname"]');
+    const inviteNicknameOptions = document.getElementById("inviteNicknameOptions");
+    if (inviteNicknameInput && inviteNicknameOptions) {
+        let suggestTimer = null;
+        inviteNicknameInput.addEventListener("input", () => {
+            clearTimeout(suggestTimer);
+            const keyword = inviteNicknameInput.value.trim();
+            if (!keyword) {
+                inviteNicknameOptions.innerHTML = "";
+                return;
+            }
+            suggestTimer = setTimeout(async () => {
+                try {
+                    const response = await fetch(`/projects/search/users?keyword=${encodeURIComponent(keyword)}`);
+                    if (!response.ok) return;
+                    const data = await response.json();
+                    inviteNicknameOptions.innerHTML = "";
+                    data.users.forEach(user => {
+                        const option = document.createElement("option");
+                        option.value = user.nickname;
+                        inviteNicknameOptions.appendChild(option);
+                    });
+                } catch (error) {
+                    console.error("닉네임 검색 오류:", error);
+                }
+            }, 200);
+        });
+    }
+
     // 초대 보내기 (새로 추가된 로직)
     const sendInviteButton = document.getElementById("sendInvite");
     if (sendInviteButton) {
@@ -17,7 +17,7 @@ window.initializeProjects = function() {
     }
 
     const list = document.getElementById("comment-list");
-    if (list) {
+    if (list && !list.querySelector(`.comment[data-id="${data.comment.id}"]`)) {
       const commentHTML = renderCommentHTML(data.comment);
       list.insertAdjacentHTML("beforeend", commentHTML);
       console.log('댓글 추가됨:', data.comment.id);
@@ -113,7 +113,22 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
-  async function performSearch(keyword, dueDate) {
+  // 현재까지 불러온 검색 결과 (더 보기 시 이어 붙임)
+  const searchState = { page: 1, projects: [], cards: [] };
+
+  function renderLoadMore(keyword, dueDate) {
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.className = 'btn btn-outline-secondary btn-sm w-100 mt-2';
+    button.textContent = '더 보기';
+    button.addEventListener('click', () => {
+      button.disabled = true;
+      performSearch(keyword, dueDate, searchState.page + 1);
+    });
+    searchResults.appendChild(button);
+  }
+
+  async function performSearch(keyword, dueDate, page = 1) {
     try {
       if (!keyword.trim() && !dueDate) {
         searchResults.innerHTML = '<p class="text-muted">키워드 또는 마감일을 입력하세요.</p>';
@@ -126,6 +141,7 @@ document.addEventListener('DOMContentLoaded', () => {
       if (dueDate) {
         queryParams.append('due_date', dueDate);
       }
+      queryParams.append('page', page);
       const response = await fetch(`/projects/search?${queryParams.toString()}`, {
         headers: { 'Content-Type': 'application/json' },
         credentials: 'include'
@@ -135,7 +151,17 @@ document.addEventListener('DOMContentLoaded', () => {
       }
       const data = await response.json();
       console.log('검색 결과:', data);
-      renderResults(data);
+      if (page === 1) {
+        searchState.projects = [];
+        searchState.cards = [];
+      }
+      searchState.page = page;
+      searchState.projects = searchState.projects.concat(data.projects);
+      searchState.cards = searchState.cards.concat(data.cards);
+      renderResults(searchState);
+      if (data.has_more) {
+        renderLoadMore(keyword, dueDate);
+      }
     } catch (error) {
       console.error('검색 오류:', error);
       searchResults.innerHTML = '<p class="text-danger">검색 중 오류가 발생했습니다.</p>';
@@ -0,0 +1,44 @@
+import threading
+from cachetools import TTLCache
+
+
+class TTLStore:
+    """크기 제한과 만료 시간을 가진 스레드 안전 인메모리 캐시"""
+
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+        # 무효화할 때마다 증가 (DB 조회 중에 무효화된 값을 캐시에 다시 넣지 않도록)
+        self.generation = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._cache.get(key, default)
+
+    def set(self, key, value, generation=None):
+        """generation(조회 전에 받아 둔 값)을 주면 그 사이 무효화가 없었을 때만 저장"""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._cache[key] = value
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._cache.pop(key, None)
+
+    def delete_where(self, predicate):
+        """predicate(key)가 참인 항목을 모두 제거"""
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in list(self._cache.keys()) if predicate(k)]:
+                self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._cache.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
@@ -0,0 +1,352 @@
+import atexit
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from .helpers import logger
+from .images import image_store
+
+WATCHED_COLLECTIONS = ("cards", "projects", "comments")
+CARD_FIELDS = ("title", "description", "status", "due_date", "rank")
+PROJECT_FIELDS = ("name", "description", "deadline")
+COMMENT_FIELDS = ("content", "image_filename")
+
+# 재개 토큰이 너무 오래되었거나 잘못된 경우의 서버 오류 코드
+_RESUME_ERRORS = (260, 280, 286)
+_STATE_ID = "realtime_changes"
+
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def _comment_image_url(filename):
+    return image_store.variant_url(filename, "thumb") if filename else None
+
+
+def enable_pre_images(mongo):
+    """삭제 이벤트에서도 프로젝트 ID를 알 수 있도록 컬렉션의 변경 전 문서(pre-image) 기록을 켬 (MongoDB 6.0+)"""
+    enabled = []
+    for collection in WATCHED_COLLECTIONS:
+        try:
+            mongo.db.command("collMod", collection, changeStreamPreAndPostImages={"enabled": True})
+            enabled.append(collection)
+        except PyMongoError as e:
+            logger.error(f"Failed to enable pre-images for {collection}: {str(e)}")
+    return enabled
+
+
+def missing_pre_images(mongo):
+    """변경 전 문서 기록이 꺼져 있는 감시 컬렉션 목록"""
+    infos = mongo.db.list_collections(filter={"name": {"$in": list(WATCHED_COLLECTIONS)}})
+    enabled = {
+        info["name"] for info in infos
+        if info.get("options", {}).get("changeStreamPreAndPostImages", {}).get("enabled")
+    }
+    return [collection for collection in WATCHED_COLLECTIONS if collection not in enabled]
+
+
+class ChangeBroadcaster:
+    """cards/projects/comments 컬렉션의 변경 스트림을 받아 프로젝트 방으로 변경 내용을 전송
+
+    여러 워커 중 리더 하나만 스트림을 열고, 메시지 큐(SOCKETIO_MESSAGE_QUEUE)를 통해 모든 워커의 클라이언트에게 보낸다.
+    리더는 change_stream_state 문서의 lease를 주기적으로 갱신하고, 갱신이 끊기면 다른 워커가 이어받는다.
+    마지막으로 처리한 재개 토큰은 리더만 같은 문서에 저장해 리더가 바뀌거나 재시작한 뒤에도 이어서 받는다.
+    """
+
+    def __init__(self):
+        self.mongo = None
+        self.socketio = None
+        self.enabled = False
+        self.save_interval = 1.0
+        self.lease = 15
+        # cards의 변경 전 문서 기록이 켜져 있어야 카드 이동의 원본 프로젝트를 알 수 있음 (확인 전에는 꺼진 것으로 봄)
+        self.pre_images = False
+        self._last_saved = 0.0
+        self._token = uuid.uuid4().hex[:8]
+
+    @property
+    def worker_id(self):
+        # fork된 워커끼리 구분되도록 pid 포함
+        return f"{socket.gethostname()}-{os.getpid()}-{self._token}"
+
+    def init_app(self, mongo, socketio, enabled=False, save_interval=1.0, lease=15):
+        self.mongo = mongo
+        self.socketio = socketio
+        self.enabled = enabled
+        self.save_interval = save_interval
+        self.lease = lease
+        if enabled:
+            socketio.start_background_task(self._run)
+            atexit.register(self._resign)
+
+    @property
+    def sends_card_moved(self):
+        """card_moved를 변경 스트림이 보내는지 (아니면 카드 이동 라우트가 직접 보냄)"""
+        return self.enabled and self.pre_images
+
+    def _check_pre_images(self):
+        try:
+            missing = missing_pre_images(self.mongo)
+        except PyMongoError as e:
+            logger.error(f"Failed to check change stream pre-images: {str(e)}")
+            return
+        self.pre_images = "cards" not in missing
+        if missing:
+            logger.warning(f"Change stream pre-images are disabled for {', '.join(missing)}: "
+                           "deletes are not broadcast and card moves are sent by the move route, "
+                           "run enable-change-stream-pre-images")
+
+    # 리더 lease
+    def _acquire(self):
+        """리더가 없거나 lease가 지났거나 이미 리더이면 lease를 잡고 True"""
+        now = datetime.utcnow()
+        try:
+            state = self.mongo.db.change_stream_state.find_one_and_update(
+                {"_id": _STATE_ID, "$or": [
+                    {"leader": self.worker_id},
+                    {"leader": {"$exists": False}},
+                    {"lease_until": {"$lt": now}}
+                ]},
+                {"$set": {"leader": self.worker_id, "lease_until": now + timedelta(seconds=self.lease)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return False  # 다른 워커가 리더
+        return state is not None
+
+    def _resign(self):
+        try:
+            self.mongo.db.change_stream_state.update_one(
+                {"_id": _STATE_ID, "leader": self.worker_id},
+                {"$unset": {"leader": "", "lease_until": ""}}
+            )
+        except PyMongoError:
+            pass
+
+    # 재개 토큰 저장/조회
+    def _load_token(self):
+        state = self.mongo.db.change_stream_state.find_one({"_id": _STATE_ID})
+        return state.get("resume_token") if state else None
+
+    def _save_token(self, token, force=False):
+        now = time.monotonic()
+        if not token or (not force and now - self._last_saved < self.save_interval):
+            return
+        # 리더를 넘겨준 뒤에는 새 리더의 토큰을 덮어쓰지 않음
+        self.mongo.db.change_stream_state.update_one(
+            {"_id": _STATE_ID, "leader": self.worker_id},
+            {"$set": {"resume_token": token, "updated_at": datetime.utcnow()}}
+        )
+        self._last_saved = now
+
+    def _clear_token(self):
+        self.mongo.db.change_stream_state.update_one({"_id": _STATE_ID}, {"$unset": {"resume_token": ""}})
+
+    @staticmethod
+    def _pipeline():
+        # 프로젝트 문서의 카운터(card_count, card_counts)나 version만 바뀐 update는 보낼 내용이 없으므로
+        # updateLookup(전체 문서 조회) 전에 서버에서 걸러냄
+        project_changes = [{f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in PROJECT_FIELDS]
+        project_changes.append({"updateDescription.removedFields": {"$in": list(PROJECT_FIELDS)}})
+        return [{"$match": {
+            "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+            "$or": [
+                {"ns.coll": {"$ne": "projects"}},
+                {"operationType": "replace"},
+                *project_changes
+            ]
+        }}]
+
+    def _run(self):
+        backoff = 1
+        # 모든 워커가 확인 (카드 이동 라우트가 card_moved를 직접 보낼지 정함), 리더가 되면 다시 확인
+        self._check_pre_images()
+        while True:
+            if not self._acquire():
+                self.socketio.sleep(self.lease / 3)
+                continue
+            logger.info(f"Change stream leader: {self.worker_id}")
+            self._check_pre_images()
+            try:
+                with self.mongo.db.watch(
+                    self._pipeline(),
+                    full_document="updateLookup",
+                    full_document_before_change="whenAvailable",
+                    resume_after=self._load_token(),
+                    max_await_time_ms=1000
+                ) as stream:
+                    backoff = 1
+                    renew_at = time.monotonic() + self.lease / 3
+                    while stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            try:
+                                self.dispatch(change)
+                            except Exception as e:
+                                logger.error(f"Failed to broadcast change {change.get('operationType')}: {str(e)}")
+                        self._save_token(stream.resume_token)
+                        if time.monotonic() >= renew_at:
+                            if not self._acquire():
+                                logger.warning("Lost change stream leadership")
+                                break
+                            renew_at = time.monotonic() + self.lease / 3
+                    continue
+            except OperationFailure as e:
+                if e.code in _RESUME_ERRORS:
+                    logger.warning(f"Change stream resume token rejected, starting from now: {str(e)}")
+                    self._clear_token()
+                    continue
+                logger.error(f"Change stream failed: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Change stream failed: {str(e)}")
+            self.socketio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _emit(self, event, data, room):
+        self.socketio.emit(event, data, to=room)
+
+    def dispatch(self, change):
+        """변경 이벤트 하나를 클라이언트 이벤트로 변환해 전송"""
+        handler = getattr(self, f"_on_{change['ns']['coll']}", None)
+        if handler:
+            handler(change["operationType"], change)
+
+    @staticmethod
+    def _diff(change, fields):
+        """updateDescription에서 fields에 해당하는 변경만 추출 (삭제된 필드는 None)"""
+        if change["operationType"] == "replace":
+            document = change.get("fullDocument") or {}
+            return {field: document.get(field) for field in fields}
+        description = change.get("updateDescription") or {}
+        updated = description.get("updatedFields", {})
+        diff = {field: updated[field] for field in fields if field in updated}
+        for field in description.get("removedFields", []):
+            if field in fields:
+                diff[field] = None
+        return diff
+
+    def _on_cards(self, operation, change):
+        card_id = str(change["documentKey"]["_id"])
+        document = change.get("fullDocument")
+        before = change.get("fullDocumentBeforeChange")
+
+        if operation == "insert":
+            project_id = str(document["project_id"])
+            self._emit("card_created", {
+                "project_id": project_id,
+                "card": {
+                    "id": card_id,
+                    "project_id": project_id,
+                    "title": document.get("title"),
+                    "description": document.get("description", ""),
+                    "status": document.get("status"),
+                    "rank": document.get("rank"),
+                    "due_date": _plain(document.get("due_date"))
+                }
+            }, room=project_id)
+            return
+
+        if operation == "delete":
+            if not before:
+                logger.warning(f"No pre-image for deleted card {card_id}, run enable-change-stream-pre-images")
+                return
+            project_id = str(before["project_id"])
+            self._emit("card_deleted", {"project_id": project_id, "card_id": card_id}, room=project_id)
+            return
+
+        if not document:
+            return  # 이미 삭제된 카드
+        project_id = str(document["project_id"])
+        source_id = str(before["project_id"]) if before else project_id
+        updated = (change.get("updateDescription") or {}).get("updatedFields", {})
+        # 같은 프로젝트 안의 순서 변경(rank)은 card_updated로 보내 클라이언트가 해당 카드 위치만 옮기게 함
+        # (재정렬 한 번에 rank가 바뀐 카드 수만큼 전체 카드 목록을 다시 받지 않도록)
+        if "project_id" in updated:
+            if not before:
+                # 원본 프로젝트 방을 알 수 없음, 이때는 카드 이동 라우트가 두 방에 보냄
+                logger.warning(f"No pre-image for moved card {card_id}, run enable-change-stream-pre-images")
+            else:
+                moved = {"card_id": card_id, "source_project_id": source_id, "target_project_id": project_id}
+                # 두 방에 모두 있는 클라이언트도 한 번만 받도록 방 목록으로 한 번에 전송
+                self._emit("card_moved", moved, room=[source_id, project_id] if source_id != project_id else source_id)
+
+        diff = self._diff(change, CARD_FIELDS)
+        if diff:
+            self._emit("card_updated", {
+                "project_id": project_id,
+                "card_id": card_id,
+                "updates": {field: _plain(value) for field, value in diff.items()}
+            }, room=project_id)
+
+    def _on_comments(self, operation, change):
+        comment_id = str(change["documentKey"]["_id"])
+        document = change.get("fullDocument")
+        before = change.get("fullDocumentBeforeChange")
+
+        if operation == "insert":
+            project_id = str(document["project_id"])
+            self._emit("create_comment", {
+                "project_id": project_id,
+                "comment": {
+                    "id": comment_id,
+                    "content": document.get("content"),
+                    "author_id": str(document.get("author_id")),
+                    "user_id": str(document.get("author_id")),
+                    "nickname": document.get("author_name"),
+                    "image_url": _comment_image_url(document.get("image_filename")),
+                    "timestamp": document["created_at"].isoformat() + "Z"
+                }
+            }, room=project_id)
+            return
+
+        if operation == "delete":
+            if not before:
+                logger.warning(f"No pre-image for deleted comment {comment_id}, run enable-change-stream-pre-images")
+                return
+            project_id = str(before["project_id"])
+            self._emit("comment_deleted", {"project_id": project_id, "comment_id": comment_id}, room=project_id)
+            return
+
+        diff = self._diff(change, COMMENT_FIELDS)
+        if not document or not diff:
+            return
+        project_id = str(document["project_id"])
+        self._emit("comment_edited", {
+            "project_id": project_id,
+            "comment": {
+                "id": comment_id,
+                "content": document.get("content"),
+                "image_url": _comment_image_url(document.get("image_filename")),
+                "delete_image": "image_filename" in diff and diff["image_filename"] is None
+            }
+        }, room=project_id)
+
+    def _on_projects(self, operation, change):
+        # 프로젝트 삭제/나가기는 누가 했는지가 필요하므로 기존 project_updated 이벤트를 그대로 사용
+        if operation not in ("update", "replace"):
+            return
+        document = change.get("fullDocument")
+        if not document or not self._diff(change, PROJECT_FIELDS):
+            return
+        project_id = str(document["_id"])
+        self._emit("project_updated", {
+            "project_id": project_id,
+            "action": "수정",
+            "name": document.get("name", ""),
+            "description": document.get("description", ""),
+            "deadline": _plain(document.get("deadline"))
+        }, room=project_id)
+
+
+change_broadcaster = ChangeBroadcaster()
@@ -0,0 +1,155 @@
+import base64
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from bson import ObjectId
+from .cache import TTLStore
+from .pubsub import on_queue_emit
+
+# 입장 시 보내는 최근 메시지 수 (= 방별 링 버퍼 크기)
+CHAT_RECENT_SIZE = int(os.getenv('CHAT_RECENT_SIZE', 50))
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
+
+_PROJECTION = {"nickname": 1, "message": 1, "timestamp": 1}
+
+
+class ChatBuffer:
+    """프로젝트(방)별 최근 채팅 메시지를 메모리에 보관하는 링 버퍼
+
+    버퍼가 없는 방은 첫 입장 때 Mongo에서 최근 메시지로 채우고, 이후에는
+    handle_send_message가 저장한 메시지를 덧붙인다. 다른 워커에서 보낸 메시지는
+    클라이언트에게 가는 'message' 이벤트를 메시지 큐에서 함께 받아(on_queue_emit) 같은 버퍼에
+    (timestamp, _id) 순서대로 넣는다. 큐에서 놓친 메시지는 버퍼 TTL이 지나 Mongo에서 다시 채울 때 반영된다.
+    """
+
+    def __init__(self, maxlen, max_rooms, ttl):
+        self.maxlen = maxlen
+        self._rooms = TTLStore(maxsize=max_rooms, ttl=ttl)
+        self._lock = threading.Lock()
+        # 방 버퍼를 Mongo에서 채우는 동안 도착한 메시지 (채운 뒤 합침)
+        self._filling = {}
+
+    def recent(self, mongo, project_id):
+        """방의 최근 메시지 목록 (오래된 것부터)"""
+        with self._lock:
+            buffer = self._rooms.get(project_id)
+            if buffer is not None:
+                return list(buffer)
+            late = self._filling.setdefault(project_id, [])
+
+        try:
+            docs = list(
+                mongo.db.chat_messages.find({"project_id": project_id}, _PROJECTION)
+                .sort([("timestamp", -1), ("_id", -1)])
+                .limit(self.maxlen)
+            )
+        except Exception:
+            with self._lock:
+                if self._filling.get(project_id) is late:
+                    del self._filling[project_id]
+            raise
+        with self._lock:
+            if self._filling.get(project_id) is late:
+                del self._filling[project_id]
+            buffer = self._rooms.get(project_id)
+            if buffer is None:
+                buffer = deque(reversed(docs), maxlen=self.maxlen)
+                self._rooms.set(project_id, buffer)
+            for doc in late:
+                self._insert(buffer, doc)
+            return list(buffer)
+
+    def _insert(self, buffer, doc):
+        # 다른 워커의 메시지는 늦게 도착할 수 있으므로 정렬 위치를 찾아 넣음 (이미 있으면 무시)
+        key = (doc["timestamp"], doc["_id"])
+        index = len(buffer)
+        while index > 0 and (buffer[index - 1]["timestamp"], buffer[index - 1]["_id"]) >= key:
+            if buffer[index - 1]["_id"] == doc["_id"]:
+                return
+            index -= 1
+        if len(buffer) == buffer.maxlen:
+            if index == 0:
+                return  # 버퍼의 모든 메시지보다 오래됨
+            buffer.popleft()
+            index -= 1
+        buffer.insert(index, doc)
+
+    def append(self, project_id, doc):
+        """저장된 메시지를 버퍼에 추가 (아직 버퍼가 없는 방이면 다음 입장 때 채움)"""
+        with self._lock:
+            buffer = self._rooms.get(project_id)
+            if buffer is not None:
+                self._insert(buffer, doc)
+            elif project_id in self._filling:
+                self._filling[project_id].append(doc)
+
+    def on_queued_message(self, data):
+        """다른 워커의 handle_send_message가 보낸 'message' 이벤트 데이터를 버퍼에 추가"""
+        self.append(data["project_id"], {
+            "_id": ObjectId(data["id"]),
+            "nickname": data.get("nickname"),
+            "message": data.get("message"),
+            "timestamp": datetime.fromisoformat(data["sent_at"])
+        })
+
+
+chat_buffer = ChatBuffer(
+    maxlen=CHAT_RECENT_SIZE,
+    max_rooms=int(os.getenv('CHAT_BUFFER_ROOMS', 1000)),
+    ttl=int(os.getenv('CHAT_BUFFER_TTL', 300))
+)
+on_queue_emit("message", chat_buffer.on_queued_message)
+
+
+def chat_timestamp():
+    """채팅 메시지 시각 (Mongo에 저장되는 밀리초 단위로 자름, 버퍼와 커서가 DB와 같은 값을 쓰도록)"""
+    now = datetime.now()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def encode_chat_cursor(doc):
+    """(timestamp, _id) -> 이전 메시지 조회용 커서 문자열"""
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_chat_cursor(cursor):
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(message_id)
+    except Exception:
+        return None
+
+
+def fetch_older_messages(mongo, project_id, cursor, limit=CHAT_PAGE_SIZE):
+    """커서보다 이전 메시지 한 페이지를 (timestamp, _id) 내림차순 keyset 방식으로 조회
+
+    반환값: (messages, next_cursor) - 메시지는 오래된 것부터, 더 없으면 next_cursor는 None
+    """
+    timestamp, message_id = cursor
+    limit = max(1, min(limit, CHAT_MAX_PAGE_SIZE))
+    docs = list(
+        mongo.db.chat_messages.find({
+            "project_id": project_id,
+            "$or": [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": message_id}}
+            ]
+        }, _PROJECTION)
+        .sort([("timestamp", -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    next_cursor = encode_chat_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return list(reversed(docs[:limit])), next_cursor
+
+
+def serialize_chat_message(project_id, doc):
+    return {
+        "id": str(doc["_id"]),
+        "project_id": project_id,
+        "nickname": doc.get("nickname"),
+        "message": doc.get("message"),
+        "timestamp": doc["timestamp"].strftime("%Y-%m-%d %H:%M")
+    }
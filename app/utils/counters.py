@@ -0,0 +1,110 @@
+import re
+from .helpers import logger
+
+# 프로젝트 문서에 저장하는 카드 개수
+# - card_count: 전체 개수
+# - card_counts: {status: 개수}
+_STATUS_KEY = re.compile(r"^\w+$")
+
+
+def _inc_fields(status, delta):
+    fields = {"card_count": delta}
+    # 상태 값은 필드 경로로 쓰이므로 '.', '$'가 들어간 값은 전체 개수만 반영
+    if status and _STATUS_KEY.match(status):
+        fields[f"card_counts.{status}"] = delta
+    return fields
+
+
+def _apply(mongo, project_oid, inc, session=None):
+    """카드 변경과 같은 트랜잭션(session)에서 호출하고, 같은 트랜잭션에서 bump_project_version도 호출해야 함
+    (standalone mongod에서는 session이 None이라 각각 따로 반영되고, 어긋난 값은 reconcile_card_counts가 맞춤)
+
+    카운터가 아직 없는 프로젝트는 건드리지 않는다($inc가 0부터 새로 만들면 실제 개수와 달라짐).
+    그런 프로젝트는 summary의 초기화가 세는데, version 갱신으로 프로젝트 문서에 쓰기가 생기므로
+    초기화 트랜잭션과 충돌해 둘 중 하나가 다시 실행된다. 실패는 호출한 쪽으로 전달해 카드 변경도 함께 취소되게 함.
+    """
+    mongo.db.projects.update_one({"_id": project_oid, "card_count": {"$exists": True}}, {"$inc": inc}, session=session)
+
+
+def count_card_added(mongo, project_oid, status, session=None):
+    _apply(mongo, project_oid, _inc_fields(status, 1), session)
+
+
+def count_card_removed(mongo, project_oid, status, session=None):
+    _apply(mongo, project_oid, _inc_fields(status, -1), session)
+
+
+def count_status_changed(mongo, project_oid, from_status, to_status, session=None):
+    if from_status == to_status:
+        return
+    inc = {}
+    for status, delta in ((from_status, -1), (to_status, 1)):
+        if status and _STATUS_KEY.match(status):
+            inc[f"card_counts.{status}"] = delta
+    if inc:
+        _apply(mongo, project_oid, inc, session)
+
+
+def compute_card_counts(mongo, project_oids=None, session=None):
+    """cards 컬렉션에서 직접 센 개수 {project_id: (전체, {status: 개수})}"""
+    pipeline = []
+    if project_oids is not None:
+        pipeline.append({"$match": {"project_id": {"$in": list(project_oids)}}})
+    pipeline.append({"$group": {"_id": {"project_id": "$project_id", "status": "$status"}, "count": {"$sum": 1}}})
+
+    counts = {}
+    for row in mongo.db.cards.aggregate(pipeline, session=session):
+        total, by_status = counts.setdefault(row["_id"]["project_id"], (0, {}))
+        status = row["_id"].get("status")
+        if status and _STATUS_KEY.match(status):
+            by_status[status] = row["count"]
+        counts[row["_id"]["project_id"]] = (total + row["count"], by_status)
+    return counts
+
+
+def reconcile_card_counts(mongo, project_oids=None, attempts=3):
+    """저장된 카운터를 실제 카드 개수와 비교해 다른 프로젝트만 수정하고, 수정한 프로젝트 수를 반환
+
+    프로젝트의 카운터와 version을 먼저 읽고 카드를 센 뒤, version이 그대로일 때만 덮어쓴다.
+    그 사이 카드 변경(version을 함께 올림)이 있었던 프로젝트는 다시 읽고 세어 최대 attempts번 시도한다.
+    """
+    fixed = 0
+    pending = list(project_oids) if project_oids is not None else None
+    for _ in range(attempts):
+        query = {"_id": {"$in": pending}} if pending is not None else {}
+        projects = list(mongo.db.projects.find(query, {"card_count": 1, "card_counts": 1, "version": 1}))
+        actual = compute_card_counts(mongo, pending)
+
+        conflicts = []
+        for project in projects:
+            total, by_status = actual.get(project["_id"], (0, {}))
+            stored = {k: v for k, v in (project.get("card_counts") or {}).items() if v}
+            if project.get("card_count") == total and stored == by_status:
+                continue
+            result = mongo.db.projects.update_one(
+                {"_id": project["_id"], "version": project.get("version")},
+                {"$set": {"card_count": total, "card_counts": by_status}, "$inc": {"version": 1}}
+            )
+            if result.modified_count:
+                fixed += 1
+            else:
+                conflicts.append(project["_id"])
+        if not conflicts:
+            break
+        pending = conflicts
+    else:
+        logger.warning(f"Card counters kept changing during reconcile, retrying next run: {pending}")
+
+    if fixed:
+        logger.warning(f"Reconciled card counters for {fixed} projects")
+    return fixed
+
+
+def run_counter_reconciler(mongo, sleep, interval):
+    """카드 카운터를 주기적으로 실제 값과 맞추는 백그라운드 루프"""
+    while True:
+        sleep(interval)
+        try:
+            reconcile_card_counts(mongo)
+        except Exception as e:
+            logger.error(f"Failed to reconcile card counters: {str(e)}")
@@ -0,0 +1,129 @@
+import os
+import threading
+from contextlib import contextmanager
+from pymongo import monitoring
+from .helpers import logger
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """커넥션 풀 이벤트를 받아 사용 현황을 집계"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.pools_cleared = 0
+
+    def _record_wait(self, event):
+        duration = getattr(event, "duration", None) or 0.0
+        self.total_wait += duration
+        self.max_wait = max(self.max_wait, duration)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "pid": os.getpid(),
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "pools_cleared": self.pools_cleared,
+            }
+
+
+pool_stats = PoolStats()
+
+
+def mongo_client_options(config):
+    """앱 설정에서 MongoClient 풀 옵션을 구성"""
+    return {
+        "maxPoolSize": int(config.get("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(config.get("MONGO_MIN_POOL_SIZE", 0)),
+        "waitQueueTimeoutMS": int(config.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000)),
+        "maxIdleTimeMS": int(config.get("MONGO_MAX_IDLE_TIME_MS", 60000)),
+        "event_listeners": [pool_stats],
+    }
+
+
+_transactions = {}
+
+
+def supports_transactions(mongo):
+    """다중 문서 트랜잭션을 쓸 수 있는 배포인지 (레플리카 셋/샤드 클러스터만 가능, standalone mongod는 불가)
+
+    처음 확인할 때 한 번만 서버에 묻고 결과를 보관한다.
+    """
+    if "supported" not in _transactions:
+        hello = mongo.db.command("hello")
+        supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        if not supported:
+            logger.warning("MongoDB is standalone: card writes run without transactions, "
+                           "card counters are corrected by the reconcile job (CARD_COUNT_RECONCILE_INTERVAL)")
+        _transactions["supported"] = supported
+    return _transactions["supported"]
+
+
+@contextmanager
+def optional_transaction(mongo):
+    """트랜잭션을 쓸 수 있으면 트랜잭션이 시작된 세션을, 아니면 None을 넘김
+
+    None이면 각 쓰기가 따로 반영되므로, 함께 쓰는 카운터는 counters.reconcile_card_counts가 맞춘다.
+    """
+    if not supports_transactions(mongo):
+        yield None
+        return
+    with mongo.cx.start_session() as session:
+        with session.start_transaction():
+            yield session
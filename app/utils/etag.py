@@ -0,0 +1,66 @@
+import hashlib
+from flask import make_response, request
+
+# 응답 형식이 바뀌면 올려서 기존 ETag를 모두 무효화
+ETAG_GENERATION = 3
+
+
+def bump_project_version(mongo, *project_oids, session=None):
+    """프로젝트(카드, 댓글, 프로젝트 정보 포함)가 바뀔 때마다 version을 1 올림
+
+    GET 응답의 ETag가 이 값으로 만들어지므로, 쓰기 후 호출하지 않으면 클라이언트가 이전 데이터를 계속 쓰게 된다.
+    """
+    oids = list({oid for oid in project_oids if oid})
+    if oids:
+        mongo.db.projects.update_many({"_id": {"$in": oids}}, {"$inc": {"version": 1}}, session=session)
+
+
+def member_project_version(mongo, user_oid, project_oid):
+    """사용자가 멤버이면 프로젝트 version(없으면 0), 아니면 None
+
+    멤버 확인과 version 조회를 한 번의 (_id) 조회로 처리해 304 재검증 경로의 왕복을 줄임
+    """
+    project = mongo.db.projects.find_one({"_id": project_oid, "members": user_oid}, {"version": 1})
+    return project.get("version", 0) if project else None
+
+
+def member_project_versions(mongo, user_oid):
+    """사용자가 속한 프로젝트의 [(ID, version)] 목록 (ID 순)"""
+    projects = mongo.db.projects.find({"members": user_oid}, {"version": 1})
+    return sorted((project["_id"], project.get("version", 0)) for project in projects)
+
+
+def project_order_state(mongo, user_oid):
+    """(사용자의 project_order, 사용자가 속한 프로젝트 ID 목록(ID 순)) 을 한 번의 aggregate로 조회"""
+    state = next(mongo.db.users.aggregate([
+        {"$match": {"_id": user_oid}},
+        {"$project": {"project_order": 1}},
+        {"$lookup": {
+            "from": "projects",
+            "pipeline": [{"$match": {"members": user_oid}}, {"$project": {"_id": 1}}],
+            "as": "projects"
+        }}
+    ]), None)
+    if not state:
+        return [], []
+    return state.get("project_order", []), sorted(str(project["_id"]) for project in state["projects"])
+
+
+def make_etag(*parts):
+    """엔드포인트, 쿼리 문자열과 parts로 ETag 값을 만듦"""
+    key = repr((ETAG_GENERATION, request.endpoint, request.query_string, parts))
+    return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def with_etag(response, etag):
+    # no-cache: 브라우저가 캐시를 쓰기 전에 항상 If-None-Match로 재검증
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag):
+    """If-None-Match가 etag와 같으면 304 응답을, 아니면 None을 반환"""
+    if request.if_none_match.contains_weak(etag):
+        return with_etag(make_response("", 304), etag)
+    return None
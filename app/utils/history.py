@@ -1,51 +1,257 @@
+import atexit
+import base64
+import threading
 from bson import ObjectId
 from datetime import datetime, timedelta, timezone
-from pymongo.errors import PyMongoError
+from pymongo.errors import BulkWriteError, PyMongoError
 from .helpers import logger, safe_object_id
+from .membership import is_member
+
+
+_DUPLICATE_KEY = 11000
+
+
+class HistoryWriter:
+    """히스토리를 메모리에 모았다가 insert_many로 한 번에 기록하는 write-behind 버퍼
+
+    - batch_size개가 쌓이거나 flush_interval초가 지나면 백그라운드 작업이 기록
+    - 버퍼(기록 중인 항목 포함)가 max_buffer에 도달하면 호출한 쪽이 직접 flush하고 자기 항목을 바로 기록
+      (Mongo가 느리거나 실패할 때의 backpressure, 기록 실패는 호출한 쪽으로 전달되어 로그에 남음)
+    - 기록에 실패한 항목은 버리지 않고 버퍼 앞에 되돌려 다음 flush에서 다시 시도
+    - sync 모드(테스트용)나 트랜잭션 세션이 주어진 경우에는 즉시 insert_one
+    - 프로세스 종료 시 남은 항목을 모두 기록
+    """
+
+    def __init__(self):
+        self.mongo = None
+        self.sync = True
+        self.batch_size = 100
+        self.max_buffer = 5000
+        self._buffer = []
+        self._inflight = 0  # flush가 기록 중인 항목 수
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def init_app(self, mongo, socketio=None, sync=True, batch_size=100, flush_interval=0.5, max_buffer=5000):
+        self.mongo = mongo
+        self.sync = sync or socketio is None
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        if not self.sync:
+            socketio.start_background_task(self._run, flush_interval)
+            atexit.register(self.flush)
+
+    def write(self, mongo, entry, session=None):
+        if self.sync or session is not None:
+            mongo.db.history.insert_one(entry, session=session)
+            return
+
+        with self._lock:
+            full = len(self._buffer) + self._inflight >= self.max_buffer
+            if not full:
+                self._buffer.append(entry)
+                size = len(self._buffer)
+
+        if full:
+            logger.warning(f"History buffer is full ({self.max_buffer} entries), writing synchronously")
+            self.flush()
+            mongo.db.history.insert_one(entry)
+        elif size >= self.batch_size:
+            self._wake.set()
+
+    def pending(self, project_oid):
+        """project_oid의 항목이 버퍼에 남아 있으면 True"""
+        with self._lock:
+            return any(entry["project_id"] == project_oid for entry in self._buffer)
+
+    def flush(self, project_oid=None):
+        """버퍼에 쌓인 항목을 기록 (project_oid가 있으면 그 프로젝트의 항목만)"""
+        if project_oid is not None and not self.pending(project_oid):
+            return 0  # 조회하는 프로젝트의 항목이 없으면 다른 프로젝트의 기록을 기다리지 않음
+        with self._flush_lock:
+            with self._lock:
+                if project_oid is None:
+                    entries, self._buffer = self._buffer, []
+                else:
+                    entries = [entry for entry in self._buffer if entry["project_id"] == project_oid]
+                    self._buffer = [entry for entry in self._buffer if entry["project_id"] != project_oid]
+                self._inflight = len(entries)
+            if not entries:
+                return 0
+            try:
+                self.mongo.db.history.insert_many(entries, ordered=False)
+            except BulkWriteError as e:
+                # 중복 키(이전 시도에서 이미 기록됨)가 아닌 실패만 다시 시도
+                failed = [entries[error["index"]] for error in e.details.get("writeErrors", [])
+                          if error.get("code") != _DUPLICATE_KEY]
+                self._requeue(failed, e)
+                return len(entries) - len(failed)
+            except PyMongoError as e:
+                # 어디까지 기록되었는지 알 수 없으므로 모두 다시 시도 (이미 기록된 항목은 다음 시도에서 중복 키로 걸러짐)
+                self._requeue(entries, e)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = 0
+            return len(entries)
+
+    def _requeue(self, entries, error):
+        if not entries:
+            return
+        logger.error(f"Failed to flush {len(entries)} history entries, will retry: {str(error)}")
+        with self._lock:
+            self._buffer = entries + self._buffer
+
+    def _run(self, flush_interval):
+        while True:
+            self._wake.wait(flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"History writer error: {str(e)}")
+
+
+history_writer = HistoryWriter()
+
 
 # 히스토리 기록
-def log_history(mongo, project_id, card_id, user_id, action, details, nickname):
+def log_history(mongo, project_id, card_id, user_id, action, details, nickname, session=None):
     try:
-        mongo.db.history.insert_one({
+        history_writer.write(mongo, {
             "project_id": safe_object_id(project_id),
-            "card_id": safe_object_id(card_id),
+            "card_id": safe_object_id(card_id) if card_id else None,
             "user_id": ObjectId(user_id),
             "nickname": nickname,
             "action": action,
             "details": details,
             "created_at": datetime.now(timezone.utc)
-        })
+        }, session=session)
         logger.info(f"Logged history: {action} for card {card_id} in project {project_id}")
     except PyMongoError as e:
         logger.error(f"Failed to log history: {str(e)}")
 
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+HISTORY_FIELDS = ("action", "details", "user_id", "nickname", "card_id", "created_at")
+
+
+def encode_history_cursor(entry):
+    """(created_at, _id) -> 다음 페이지 조회용 커서 문자열"""
+    raw = f"{entry['created_at'].isoformat()}|{entry['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(entry_id)
+    except Exception:
+        return None
+
+
+def fetch_history_page(mongo, project_oid, limit=HISTORY_PAGE_SIZE, cursor=None,
+                       action=None, card_id=None, user_id=None, fields=None):
+    """(created_at, _id) 내림차순 keyset 페이지네이션으로 히스토리 한 페이지를 조회
+
+    반환값: (entries, next_cursor) - 더 이상 없으면 next_cursor는 None
+    """
+    query = {"project_id": project_oid}
+    if action:
+        query["action"] = action
+    if card_id:
+        query["card_id"] = card_id
+    if user_id:
+        query["user_id"] = user_id
+    if cursor:
+        created_at, entry_id = cursor
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": entry_id}}
+        ]
+
+    projection = None
+    if fields:
+        projection = {field: 1 for field in fields}
+        projection["created_at"] = 1
+
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    entries = list(
+        mongo.db.history.find(query, projection)
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    next_cursor = encode_history_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def resolve_history_nicknames(mongo, entries):
+    """히스토리 항목별 작성자 닉네임 ({entry _id: nickname})
+
+    log_history가 저장해 둔 nickname을 우선 사용하고, 없는 예전 항목만 users에서 한 번에 조회한다.
+    """
+    nicknames = {entry["_id"]: entry["nickname"] for entry in entries if entry.get("nickname")}
+    legacy_user_ids = {entry["user_id"] for entry in entries if entry["_id"] not in nicknames and entry.get("user_id")}
+    if legacy_user_ids:
+        users = mongo.db.users.find({"_id": {"$in": list(legacy_user_ids)}}, {"nickname": 1})
+        user_nicknames = {user["_id"]: user.get("nickname") for user in users}
+        for entry in entries:
+            if entry["_id"] not in nicknames and user_nicknames.get(entry.get("user_id")):
+                nicknames[entry["_id"]] = user_nicknames[entry["user_id"]]
+    return nicknames
+
+
+def parse_history_args(args):
+    """요청 쿼리 파라미터 -> fetch_history_page 인자 (잘못된 값이면 None)"""
+    options = {}
+    try:
+        options["limit"] = int(args.get("limit", HISTORY_PAGE_SIZE))
+    except ValueError:
+        return None
+
+    if args.get("cursor"):
+        options["cursor"] = decode_history_cursor(args["cursor"])
+        if not options["cursor"]:
+            return None
+    for key in ("card_id", "user_id"):
+        if args.get(key):
+            options[key] = safe_object_id(args[key])
+            if not options[key]:
+                return None
+    if args.get("action"):
+        options["action"] = args["action"]
+    if args.get("fields"):
+        options["fields"] = [f for f in args["fields"].split(",") if f in HISTORY_FIELDS]
+    return options
+
+
 # 히스토리 조회
-def get_project_history(mongo, project_id, user_id):
+def get_project_history(mongo, project_id, user_id, **page_options):
     oid = safe_object_id(project_id)
     if not oid:
         return None, {"message": "유효하지 않은 프로젝트 ID입니다."}, 400
 
-    project = mongo.db.projects.find_one({"_id": oid, "members": ObjectId(user_id)})
-    if not project:
+    if not is_member(mongo, user_id, oid):
         return None, {"message": "프로젝트를 찾을 수 없거나 권한이 없습니다."}, 404
 
     try:
-        history = mongo.db.history.find({"project_id": oid}).sort("created_at", -1)
+        history_writer.flush(oid)
+        history, next_cursor = fetch_history_page(mongo, oid, **page_options)
+        nicknames = resolve_history_nicknames(mongo, history)
         history_list = []
         for entry in history:
-            user = mongo.db.users.find_one({"_id": entry["user_id"]})
-
             created_local = entry["created_at"] + timedelta(hours=9)
             timestamp = created_local.strftime("%Y-%m-%d %H:%M:%S")
 
             history_list.append({
                 "id": str(entry["_id"]),
-                "nickname": user["nickname"] if user else "Unknown",
-                "action": entry["action"],
-                "details": entry["details"],
+                "nickname": nicknames.get(entry["_id"], "Unknown"),
+                "action": entry.get("action"),
+                "details": entry.get("details"),
                 "created_at": timestamp
             })
-        return history_list, {"history": history_list}, 200
+        return history_list, {"history": history_list, "next": next_cursor}, 200
     except PyMongoError as e:
         logger.error(f"Failed to retrieve history: {str(e)}")
         return None, {"message": "히스토리 조회 중 오류가 발생했습니다."}, 500
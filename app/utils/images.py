@@ -0,0 +1,265 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from .helpers import logger
+from .pool import make_process_pool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow가 없으면 축소본 없이 원본만 제공
+    Image = None
+
+# 확장자는 클라이언트가 보낸 파일명이 아니라 실제 내용(시그니처)으로 결정
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+READ_CHUNK = 64 * 1024
+
+# 축소본 종류: (최대 가로, 최대 세로)
+# - thumb: 댓글 목록 (max-height 200px의 2배)
+# - large: 크게 보기
+VARIANTS = {
+    "thumb": (640, 400),
+    "large": (1600, 1600),
+}
+VARIANT_FORMAT = "webp"
+_VARIANT_SUFFIXES = tuple(f".{variant}.{VARIANT_FORMAT}" for variant in VARIANTS)
+
+# 내용 해시로 이름 붙은 파일(원본/축소본): 내용이 바뀌지 않으므로 오래 캐시해도 됨
+_CONTENT_NAME = re.compile(r"[0-9a-f]{2}/[0-9a-f]{64}\.(?:jpg|png|gif|webp)"
+                           + r"(?:\.(?:" + "|".join(VARIANTS) + r")\." + VARIANT_FORMAT + r")?")
+
+# 같은 이미지가 방금 다시 올라온 경우 삭제하지 않도록 두는 여유 시간(초)
+RELEASE_GRACE = 60
+
+
+class UploadError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _detect_extension(head):
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def make_variants(source, targets):
+    """원본 이미지로 축소/재압축본을 만듦 (프로세스 풀에서 실행)
+
+    targets: [(저장 경로, (최대 가로, 최대 세로))]
+    """
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info or "A" in original.mode else "RGB")
+        for path, size in targets:
+            image = original.copy()
+            image.thumbnail(size, Image.LANCZOS)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            image.save(temp_path, VARIANT_FORMAT, quality=80, method=4)
+            os.replace(temp_path, path)
+    return len(targets)
+
+
+class ImageStore:
+    """댓글 이미지를 내용의 sha256 이름으로 저장하는 저장소
+
+    같은 이미지는 한 번만 저장되고(<sha256 앞 2자리>/<sha256>.<확장자>),
+    축소본(<이름>.thumb.webp, <이름>.large.webp)은 프로세스 풀에서 만들어진다.
+    DB의 image_filename에는 저장소 기준 상대 경로가 들어간다.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.url_prefix = "/uploads"
+        self.max_bytes = 10 * 1024 * 1024
+        self._executor = None
+        self._pending = set()  # 축소본을 만들고 있는 이미지
+        self._failed = set()  # 축소본을 만들지 못한 이미지 (요청마다 다시 맡기지 않음)
+
+    def init_app(self, root, max_bytes=10 * 1024 * 1024, workers=2):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        if Image is not None and workers > 0:
+            self._executor = make_process_pool(workers, preload=[__name__])
+        elif Image is None:
+            logger.warning("Pillow is not installed, comment images are served without thumbnails")
+
+    def path(self, filename, variant=None):
+        name = f"{filename}.{variant}.{VARIANT_FORMAT}" if variant else filename
+        return os.path.join(self.root, *name.split("/"))
+
+    def url(self, filename, variant=None):
+        name = f"{filename}.{variant}.{VARIANT_FORMAT}" if variant else filename
+        return f"{self.url_prefix}/{name}"
+
+    def is_content_named(self, filename):
+        """내용 해시 이름의 파일이면 True (uuid 이름의 이전 방식 파일은 같은 이름으로 덮어쓰일 수 있음)"""
+        return _CONTENT_NAME.fullmatch(filename) is not None
+
+    def has_variants(self, filename):
+        """축소본을 만드는 이미지인지 (Pillow와 프로세스 풀이 있고, 내용 해시 이름이며 GIF가 아님)"""
+        return self._executor is not None and self.is_content_named(filename) and not filename.endswith(".gif")
+
+    def variant_url(self, filename, variant):
+        """축소본 URL (축소본을 만들지 않는 이미지면 원본 URL)
+
+        축소본이 다 만들어졌는지와 관계없이 같은 URL을 돌려주므로 ETag로 캐시된 목록에 넣어도 된다.
+        아직 파일이 없으면 /uploads가 원본으로 잠시 리다이렉트한다.
+        """
+        if self.has_variants(filename):
+            return self.url(filename, variant)
+        return self.url(filename)
+
+    def split_variant(self, name):
+        """저장소 상대 경로 -> (원본 이름, 축소본 종류), 축소본 이름이 아니면 종류는 None"""
+        for variant, suffix in zip(VARIANTS, _VARIANT_SUFFIXES):
+            if name.endswith(suffix):
+                return name[:-len(suffix)], variant
+        return name, None
+
+    def ensure_variants(self, filename):
+        """원본은 있는데 축소본이 없으면 다시 만들도록 맡김 (이전에 올라온 이미지, 생성 실패 후 재시도)"""
+        if self.has_variants(filename) and filename not in self._failed and os.path.exists(self.path(filename)):
+            self._submit_variants(filename)
+
+    def save(self, file):
+        """업로드 파일을 제한 크기까지만 읽으며 저장하고 저장소 상대 경로를 반환
+
+        제한을 넘거나 이미지가 아니면 UploadError
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                digest, extension = self._check(iter(lambda: file.stream.read(READ_CHUNK), b""), out)
+            return self._commit(temp_path, digest, extension)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _check(self, chunks, out=None):
+        """chunks를 읽으며 sha256과 형식을 구하고 (out이 있으면 그대로 기록), 제한을 넘거나 이미지가 아니면 UploadError"""
+        digest = hashlib.sha256()
+        size = 0
+        extension = None
+        for chunk in chunks:
+            if extension is None:
+                extension = _detect_extension(chunk)
+                if extension is None:
+                    raise UploadError("지원하지 않는 이미지 형식입니다.")
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise UploadError(f"이미지는 {self.max_bytes // (1024 * 1024)}MB까지 올릴 수 있습니다.", 413)
+            digest.update(chunk)
+            if out is not None:
+                out.write(chunk)
+        if not size:
+            raise UploadError("빈 파일입니다.")
+        return digest.hexdigest(), extension
+
+    def adopt(self, source_path):
+        """다른 곳에서 다 받은 파일(이어 올리기 세션 등)을 검사해 저장소로 옮기고 상대 경로를 반환
+
+        source_path는 성공/실패와 관계없이 없어진다. 제한을 넘거나 이미지가 아니면 UploadError
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".upload")
+        os.close(fd)
+        try:
+            shutil.move(source_path, temp_path)  # 같은 파일시스템이면 이름만 바뀜
+            with open(temp_path, "rb") as source:
+                digest, extension = self._check(iter(lambda: source.read(READ_CHUNK), b""))
+            return self._commit(temp_path, digest, extension)
+        finally:
+            for path in (source_path, temp_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _commit(self, temp_path, digest, extension):
+        filename = f"{digest[:2]}/{digest}{extension}"
+        final_path = self.path(filename)
+        if os.path.exists(final_path):
+            # 이미 있는 이미지: 다시 쓰지 않고 release의 유예 시간만 갱신
+            os.utime(final_path)
+            os.remove(temp_path)
+            logger.info(f"Reused stored comment image: {filename}")
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+            logger.info(f"Stored comment image: {filename}")
+        self._submit_variants(filename)
+        return filename
+
+    def _submit_variants(self, filename):
+        if self._executor is None or filename.endswith(".gif") or filename in self._pending:
+            return  # 움직이는 GIF는 원본 그대로 제공
+        targets = [(self.path(filename, variant), size) for variant, size in VARIANTS.items()
+                   if not os.path.exists(self.path(filename, variant))]
+        if not targets:
+            return
+        self._pending.add(filename)
+        try:
+            future = self._executor.submit(make_variants, self.path(filename), targets)
+        except RuntimeError as e:  # 풀이 종료되었거나 깨진 경우, 원본은 그대로 제공됨
+            self._pending.discard(filename)
+            logger.error(f"Failed to submit variants of {filename}: {str(e)}")
+            return
+
+        def finished(done):
+            self._pending.discard(filename)
+            if done.exception():
+                self._failed.add(filename)
+                logger.error(f"Failed to make variants of {filename}: {str(done.exception())}")
+        future.add_done_callback(finished)
+
+    def _referenced(self, mongo, filename):
+        # 댓글 또는 아직 댓글에 붙지 않은 완료된 업로드 세션
+        return (mongo.db.comments.count_documents({"image_filename": filename}, limit=1) > 0
+                or mongo.db.upload_sessions.count_documents({"image_filename": filename}, limit=1) > 0)
+
+    def _remove(self, filename):
+        for variant in (None, *VARIANTS):
+            try:
+                os.remove(self.path(filename, variant))
+            except FileNotFoundError:
+                pass
+
+    def release(self, mongo, filename):
+        """더 이상 참조하는 댓글이 없으면 원본과 축소본을 삭제 (댓글 수정/삭제 후 호출)"""
+        if not filename or self._referenced(mongo, filename):
+            return False
+        try:
+            if time.time() - os.path.getmtime(self.path(filename)) < RELEASE_GRACE:
+                return False  # 방금 같은 이미지가 다시 올라옴, sweep_orphans가 나중에 정리
+        except FileNotFoundError:
+            return False
+        self._remove(filename)
+        logger.info(f"Removed unreferenced comment image: {filename}")
+        return True
+
+    def sweep_orphans(self, mongo):
+        """어떤 댓글도 참조하지 않는 이미지 파일을 삭제하고 삭제한 개수를 반환 (프로젝트 삭제 등으로 남은 파일)"""
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith((".upload", ".tmp", *_VARIANT_SUFFIXES)):
+                    continue
+                filename = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+                if self.release(mongo, filename):
+                    removed += 1
+        return removed
+
+
+image_store = ImageStore()
@@ -0,0 +1,192 @@
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from .helpers import logger
+from .search import parse_query
+
+# 컬렉션별 인덱스 정의 (이름을 고정해 두어야 재실행 시 중복 생성되지 않음)
+INDEXES = {
+    "cards": [
+        {"name": "project_rank_order", "keys": [("project_id", ASCENDING), ("rank", ASCENDING), ("order", ASCENDING)]},
+        {"name": "project_due_date", "keys": [("project_id", ASCENDING), ("due_date", ASCENDING)]},
+    ],
+    "history": [
+        {"name": "project_created_at_id", "keys": [
+            ("project_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)
+        ]},
+        {"name": "project_card_created_at_id", "keys": [
+            ("project_id", ASCENDING), ("card_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)
+        ]},
+    ],
+    "notifications": [
+        {"name": "user_timestamp", "keys": [("user_id", ASCENDING), ("timestamp", DESCENDING)]},
+        {"name": "user_project_type_timestamp", "keys": [
+            ("user_id", ASCENDING), ("project_id", ASCENDING), ("type", ASCENDING), ("timestamp", DESCENDING)
+        ]},
+    ],
+    "chat_messages": [
+        {"name": "project_timestamp_id", "keys": [
+            ("project_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)
+        ]},
+    ],
+    "comments": [
+        {"name": "project_created_at", "keys": [("project_id", ASCENDING), ("created_at", ASCENDING)]},
+        {"name": "image_filename", "keys": [("image_filename", ASCENDING)], "sparse": True},
+    ],
+    "mail_outbox": [
+        {"name": "status_next_attempt_at", "keys": [("status", ASCENDING), ("next_attempt_at", ASCENDING)]},
+        # 보낸 메일은 7일 뒤 삭제 (실패한 메일은 sent_at이 없어 남음)
+        {"name": "sent_at_ttl", "keys": [("sent_at", ASCENDING)], "expireAfterSeconds": 7 * 24 * 60 * 60},
+    ],
+    "projects": [
+        {"name": "members", "keys": [("members", ASCENDING)]},
+        {"name": "owner", "keys": [("owner", ASCENDING)]},
+    ],
+    "search_index": [
+        {"name": "project_terms", "keys": [("project_id", ASCENDING), ("terms", ASCENDING)]},
+        {"name": "indexed_at", "keys": [("indexed_at", ASCENDING)]},
+    ],
+    "upload_sessions": [
+        {"name": "user_status", "keys": [("user_id", ASCENDING), ("status", ASCENDING)]},
+        {"name": "image_filename", "keys": [("image_filename", ASCENDING)], "sparse": True},
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "users": [
+        {"name": "email", "keys": [("email", ASCENDING)]},
+        {"name": "nickname", "keys": [("nickname", ASCENDING)]},
+    ],
+}
+
+# 인덱스 범위가 실제로 좁혀져야 하는 필드 (project_id만으로 스캔하고 나머지를 필터로 검사하면 실패)
+BOUNDED_FIELDS = {"search_index": "terms"}
+
+# 새 인덱스로 대체되어 ensure_indexes가 삭제하는 인덱스
+REPLACED_INDEXES = {
+    "cards": ["project_rank"],  # -> project_rank_order
+}
+
+
+def ensure_indexes(mongo):
+    """INDEXES에 정의된 인덱스를 생성 (이미 있으면 그대로 둠)하고 REPLACED_INDEXES를 삭제"""
+    created = []
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            name = mongo.db[collection].create_index(spec["keys"], **options)
+            created.append(f"{collection}.{name}")
+    for collection, names in REPLACED_INDEXES.items():
+        existing = mongo.db[collection].index_information()
+        for name in names:
+            if name in existing:
+                mongo.db[collection].drop_index(name)
+                logger.info(f"Dropped replaced index {collection}.{name}")
+    logger.info(f"Ensured {len(created)} indexes: {', '.join(created)}")
+    return created
+
+
+def _query_shapes():
+    """라우트에서 실제로 사용하는 쿼리 형태 (explain 검증용)"""
+    oid = ObjectId()
+    now = datetime.utcnow()
+    return [
+        # cards.py
+        ("cards.get_project_cards", "cards", {"project_id": oid}, [("rank", ASCENDING), ("order", ASCENDING)]),
+        ("cards.get_all_cards", "cards", {"project_id": {"$in": [oid, ObjectId()]}}, [("rank", ASCENDING), ("order", ASCENDING)]),
+        ("cards.create_card.next_rank", "cards", {"project_id": oid}, [("rank", DESCENDING)]),
+        ("cards.find_card", "cards", {"_id": oid, "project_id": oid}, None),
+        ("summary.next_due_date", "cards", {"project_id": oid, "due_date": {"$type": "date"}}, [("due_date", ASCENDING)]),
+        # projects.py
+        ("projects.member_projects", "projects", {"members": oid}, None),
+        ("projects.member_check", "projects", {"_id": oid, "members": oid}, None),
+        ("projects.owned_projects", "projects", {"owner": oid}, None),
+        ("projects.get_comments", "comments", {"project_id": oid}, [("created_at", ASCENDING)]),
+        ("images.references", "comments", {"image_filename": "ab/ab.jpg"}, None),
+        ("images.session_references", "upload_sessions", {"image_filename": "ab/ab.jpg"}, None),
+        ("upload_sessions.open_count", "upload_sessions", {"user_id": oid, "status": "open"}, None),
+        # 검색은 parse_query가 만든 실제 단어 조건을 그대로 사용
+        ("projects.search", "search_index", {
+            "project_id": {"$in": [oid, ObjectId()]}, "$and": parse_query("프로젝트")[0]
+        }, None),
+        ("projects.search_short_word", "search_index", {
+            "project_id": {"$in": [oid, ObjectId()]}, "$and": parse_query("프")[0]
+        }, None),
+        ("projects.search_users", "search_index", {"project_id": None, "kind": "user", "$and": parse_query("프로")[0]}, None),
+        ("auth.find_by_email", "users", {"email": "user@example.com"}, None),
+        ("auth.find_by_nickname", "users", {"nickname": "nickname"}, None),
+        ("mail.claim", "mail_outbox", {
+            "status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}
+        }, [("next_attempt_at", ASCENDING)]),
+        # history.py
+        ("history.get_project_history", "history", {"project_id": oid}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ("history.next_page", "history", {"project_id": oid, "$or": [
+            {"created_at": {"$lt": now}}, {"created_at": now, "_id": {"$lt": oid}}
+        ]}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ("history.card_filter", "history", {"project_id": oid, "card_id": oid}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # socket.py
+        ("socket.chat_history", "chat_messages", {"project_id": str(oid)}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("socket.load_older_messages", "chat_messages", {"project_id": str(oid), "$or": [
+            {"timestamp": {"$lt": now}}, {"timestamp": now, "_id": {"$lt": oid}}
+        ]}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("socket.get_notifications", "notifications", {"user_id": oid}, [("timestamp", DESCENDING)]),
+        ("socket.deadline_notification", "notifications", {
+            "user_id": oid, "project_id": oid, "type": "deadline_reminder",
+            "timestamp": {"$gte": now, "$lt": now}
+        }, None),
+    ]
+
+
+def _plan_stages(plan):
+    """explain 결과의 실행 계획 트리에서 stage 이름을 모두 수집"""
+    stages = []
+    if not isinstance(plan, dict):
+        return stages
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan"):
+        stages.extend(_plan_stages(plan.get(key)))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _unbounded_scans(plan, field):
+    """실행 계획의 IXSCAN 중 field 범위가 [MinKey, MaxKey] 전체인(또는 field를 쓰지 않는) 스캔 수"""
+    if not isinstance(plan, dict):
+        return 0
+    count = 0
+    if plan.get("stage") == "IXSCAN":
+        bounds = plan.get("indexBounds", {}).get(field)
+        if not bounds or bounds == ["[MinKey, MaxKey]"]:
+            count += 1
+    for key in ("inputStage", "queryPlan"):
+        count += _unbounded_scans(plan.get(key), field)
+    for child in plan.get("inputStages", []):
+        count += _unbounded_scans(child, field)
+    return count
+
+
+def verify_indexes(mongo):
+    """각 쿼리를 explain()으로 확인해 COLLSCAN이 발생하거나 BOUNDED_FIELDS 범위를 좁히지 못하는 쿼리 목록을 반환"""
+    failures = []
+    for name, collection, query, sort in _query_shapes():
+        try:
+            cursor = mongo.db[collection].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        except PyMongoError as e:
+            logger.error(f"Failed to explain query {name}: {str(e)}")
+            failures.append((name, "EXPLAIN_ERROR"))
+            continue
+
+        stages = _plan_stages(plan)
+        if "COLLSCAN" in stages:
+            logger.error(f"COLLSCAN detected for query {name}: {stages}")
+            failures.append((name, "COLLSCAN"))
+        elif collection in BOUNDED_FIELDS and _unbounded_scans(plan, BOUNDED_FIELDS[collection]):
+            logger.error(f"Query {name} does not narrow the index on {BOUNDED_FIELDS[collection]}: {stages}")
+            failures.append((name, "UNBOUNDED_SCAN"))
+        else:
+            logger.info(f"Query {name} uses plan: {' <- '.join(stages)}")
+    return failures
@@ -0,0 +1,107 @@
+import os
+import uuid
+from datetime import datetime
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from .helpers import logger
+
+_COLLECTION = "cache_invalidations"
+
+
+class InvalidationBus:
+    """워커(프로세스)마다 따로 가진 인메모리 캐시를 함께 무효화하기 위한 채널
+
+    - publish: 무효화 대상을 cache_invalidations(capped 컬렉션)에 기록
+    - 각 워커의 백그라운드 작업이 tailable cursor로 새 기록을 받아 subscribe로 등록된 핸들러를 호출
+    - 커서를 다시 열 때는 처음부터 다시 읽고(중복 무효화는 무해), 읽던 커서가 닫히거나 오류가 나면
+      놓친 기록이 있을 수 있으므로 등록된 캐시를 모두 비운다
+    - 다시 읽어도 무해한 무효화 기록 전용 (메시지 내용 전달은 Socket.IO 메시지 큐의 pubsub.on_queue_emit 사용)
+    """
+
+    def __init__(self):
+        self.mongo = None
+        self.socketio = None
+        self.size = 1024 * 1024
+        self._token = uuid.uuid4().hex[:8]
+        self._handlers = {}
+
+    @property
+    def origin(self):
+        # fork된 워커끼리 구분되도록 pid 포함
+        return f"{os.getpid()}-{self._token}"
+
+    def init_app(self, mongo, socketio=None, size=1024 * 1024):
+        """socketio가 없으면(CLI, 풀 자식 프로세스) 기록만 하고 받지는 않음"""
+        self.mongo = mongo
+        self.socketio = socketio
+        self.size = size
+        if socketio is not None:
+            socketio.start_background_task(self._run)
+
+    def subscribe(self, kind, handler, clear):
+        """handler(**keys): kind 기록을 받았을 때, clear(): 기록을 놓쳤을 수 있을 때 호출"""
+        self._handlers[kind] = (handler, clear)
+
+    def publish(self, kind, **keys):
+        if self.mongo is None:
+            return
+        try:
+            self.mongo.db[_COLLECTION].insert_one({
+                "kind": kind,
+                "keys": {name: str(value) for name, value in keys.items() if value is not None},
+                "origin": self.origin,
+                "at": datetime.utcnow()
+            })
+        except PyMongoError as e:
+            logger.error(f"Failed to publish {kind} cache invalidation: {str(e)}")
+
+    def _ensure_collection(self):
+        try:
+            self.mongo.db.create_collection(_COLLECTION, capped=True, size=self.size)
+        except CollectionInvalid:
+            # 이미 있음 (publish가 먼저 일반 컬렉션으로 만든 경우 capped로 변환)
+            if not self.mongo.db[_COLLECTION].options().get("capped"):
+                self.mongo.db.command("convertToCapped", _COLLECTION, size=self.size)
+
+    def _clear_all(self):
+        for _, clear in self._handlers.values():
+            clear()
+
+    def _dispatch(self, record):
+        if record.get("origin") == self.origin:
+            return  # 보낸 워커는 이미 직접 무효화함
+        entry = self._handlers.get(record.get("kind"))
+        if entry:
+            entry[0](**record.get("keys", {}))
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                self._ensure_collection()
+                cursor = self.mongo.db[_COLLECTION].find(
+                    {}, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=1000
+                )
+                backoff = 1
+                received = False
+                while cursor.alive:
+                    for record in cursor:
+                        received = True
+                        self._dispatch(record)
+                    self.socketio.sleep(0.1)
+                if received:
+                    # 읽던 커서가 닫힘 (capped 컬렉션이 한 바퀴 돌아 덮어쓴 경우 등)
+                    self._clear_all()
+                # 빈 컬렉션이면 커서가 바로 닫히므로 잠시 뒤 다시 엶
+                self.socketio.sleep(1)
+                continue
+            except PyMongoError as e:
+                logger.error(f"Cache invalidation listener failed: {str(e)}")
+            except Exception as e:
+                logger.error(f"Cache invalidation handler failed: {str(e)}")
+            self._clear_all()
+            self.socketio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+invalidation_bus = InvalidationBus()
@@ -1,4 +1,193 @@
 # app/utils/mail.py
-from flask_mail import Mail
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from flask_mail import Mail, Message
+from pymongo import ASCENDING, ReturnDocument
+from .helpers import logger
 
 mail = Mail()
+
+# SMTP 서버 연결 실패 시 발송을 쉬는 최대 시간(초)
+MAX_CONNECTION_BACKOFF = 60 * 60
+
+
+def _is_connection_error(error):
+    # SMTPException도 OSError의 하위 클래스이므로 SMTP 응답 오류(수신 거부 등)와 소켓 오류를 구분
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _is_permanent(error):
+    # 5xx 응답(없는 주소 등)은 다시 보내도 실패하므로 재시도하지 않음
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+class MailOutbox:
+    """보낼 메일을 mail_outbox 컬렉션에 저장해 두고 백그라운드 작업이 보내는 발송함
+
+    - 요청 처리 중에는 enqueue(insert_one)만 하므로 SMTP 서버 속도와 무관하게 응답
+    - 발송 작업은 SMTP 연결 하나로 최대 per_connection개를 연달아 보냄 (TLS/로그인은 연결당 한 번)
+    - 실패하면 retry_base * 2^(실패 횟수 - 1)초 뒤 다시 시도, max_attempts번 실패하거나 5xx로 거부되면 failed로 남김
+    - SMTP 서버에 연결/로그인하지 못하거나 연결이 끊긴 경우는 메일의 실패로 세지 않고(attempts 그대로)
+      발송함 전체를 retry_base * 2^(연속 연결 실패 횟수 - 1)초(최대 MAX_CONNECTION_BACKOFF) 동안 쉼,
+      같은 메일이 max_deferrals번 연기되면 failed로 남김
+    - 여러 워커가 함께 돌아도 find_one_and_update로 한 메일은 한 워커만 가져감,
+      가져간 워커가 죽으면 lease가 지난 뒤 다른 워커가 다시 가져감
+    """
+
+    def __init__(self):
+        self.app = None
+        self.max_attempts = 5
+        self.retry_base = 30
+        self.per_connection = 50
+        self.lease = 300
+        self.max_deferrals = 100
+        self.connection_failures = 0
+        self.paused_until = 0.0
+        self._wake = threading.Event()
+
+    def init_app(self, app, mongo, socketio=None, interval=5, max_attempts=5, retry_base=30, per_connection=50, lease=300,
+                 max_deferrals=100):
+        """interval: 발송 작업이 발송함을 확인하는 주기(초), 0이면 백그라운드 작업 없이 CLI(drain-mail-outbox)로만 발송"""
+        self.app = app
+        self.max_attempts = max_attempts
+        self.max_deferrals = max_deferrals
+        self.retry_base = retry_base
+        self.per_connection = per_connection
+        self.lease = lease
+        if socketio is not None and interval > 0:
+            socketio.start_background_task(self._run, mongo, interval)
+
+    def enqueue(self, mongo, subject, recipients, body, sender=None):
+        """메일을 발송함에 넣고 id를 반환 (발송은 백그라운드 작업이 수행)"""
+        now = datetime.utcnow()
+        result = mongo.db.mail_outbox.insert_one({
+            "subject": subject,
+            "sender": sender,
+            "recipients": list(recipients),
+            "body": body,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now
+        })
+        self._wake.set()
+        logger.info(f"Queued mail {result.inserted_id}: {subject}")
+        return result.inserted_id
+
+    def _claim(self, mongo):
+        # 보낼 차례가 된 메일 하나를 가져감 (sending 상태는 lease가 지난 경우만 다시 가져감)
+        now = datetime.utcnow()
+        return mongo.db.mail_outbox.find_one_and_update(
+            {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}},
+            {"$set": {"status": "sending", "next_attempt_at": now + timedelta(seconds=self.lease)}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _sent(self, mongo, message):
+        mongo.db.mail_outbox.update_one(
+            {"_id": message["_id"]},
+            {"$set": {"status": "sent", "sent_at": datetime.utcnow()}, "$unset": {"next_attempt_at": "", "last_error": ""}}
+        )
+
+    def _failed(self, mongo, message, error):
+        attempts = message["attempts"] + 1
+        if attempts >= self.max_attempts or _is_permanent(error):
+            update = {"status": "failed", "attempts": attempts, "last_error": str(error)}
+            logger.error(f"Giving up on mail {message['_id']} after {attempts} attempts: {str(error)}")
+        else:
+            delay = self.retry_base * 2 ** (attempts - 1)
+            update = {
+                "status": "pending",
+                "attempts": attempts,
+                "last_error": str(error),
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)
+            }
+            logger.error(f"Failed to send mail {message['_id']} (attempt {attempts}), retrying in {delay}s: {str(error)}")
+        mongo.db.mail_outbox.update_one({"_id": message["_id"]}, {"$set": update})
+
+    def _connection_delay(self):
+        return min(self.retry_base * 2 ** (self.connection_failures - 1), MAX_CONNECTION_BACKOFF)
+
+    def _deferred(self, mongo, message, error):
+        # 연결 문제로 보내지 못함: attempts는 그대로 두고 연결 백오프가 끝난 뒤 다시 시도
+        deferrals = message.get("deferrals", 0) + 1
+        if deferrals >= self.max_deferrals:
+            update = {"status": "failed", "deferrals": deferrals, "last_error": str(error)}
+            logger.error(f"Giving up on mail {message['_id']} after {deferrals} connection failures: {str(error)}")
+        else:
+            update = {
+                "status": "pending",
+                "deferrals": deferrals,
+                "last_error": str(error),
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=self._connection_delay())
+            }
+        mongo.db.mail_outbox.update_one({"_id": message["_id"]}, {"$set": update})
+
+    def deliver_pending(self, mongo):
+        """보낼 차례가 된 메일을 모두 보내고 보낸 개수를 반환
+
+        SMTP 서버에 연결하지 못하거나 연결이 끊기면 해당 메일을 연기하고 이번 회차를 멈춤
+        """
+        delivered = 0
+        message = None
+        with self.app.app_context():
+            while True:
+                message = message or self._claim(mongo)
+                if message is None:
+                    return delivered
+                try:
+                    with mail.connect() as connection:
+                        self.connection_failures = 0
+                        for _ in range(self.per_connection):
+                            try:
+                                connection.send(Message(
+                                    subject=message["subject"],
+                                    sender=message["sender"],
+                                    recipients=message["recipients"],
+                                    body=message["body"]
+                                ))
+                            except Exception as e:
+                                if _is_connection_error(e):
+                                    raise
+                                # 수신 거부, 잘못된 헤더 등 이 메일만의 문제 (연결은 계속 사용)
+                                self._failed(mongo, message, e)
+                            else:
+                                self._sent(mongo, message)
+                                delivered += 1
+                            message = self._claim(mongo)
+                            if message is None:
+                                break
+                except (smtplib.SMTPException, OSError) as e:
+                    # 연결, TLS, 로그인 실패 또는 연결 끊김 (메일 자체의 문제가 아님)
+                    self.connection_failures += 1
+                    self.paused_until = time.monotonic() + self._connection_delay()
+                    logger.error(f"SMTP connection failed ({self.connection_failures} in a row), "
+                                 f"pausing mail outbox for {self._connection_delay()}s: {str(e)}")
+                    if message is not None:
+                        self._deferred(mongo, message, e)
+                    return delivered
+
+    def _run(self, mongo, interval):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            if time.monotonic() < self.paused_until:
+                continue  # SMTP 서버 연결 실패 후 쉬는 중
+            try:
+                self.deliver_pending(mongo)
+            except Exception as e:
+                logger.error(f"Mail outbox error: {str(e)}")
+
+    def stats(self, mongo):
+        """상태별 메일 수"""
+        counts = mongo.db.mail_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+        return {row["_id"]: row["count"] for row in counts}
+
+
+mail_outbox = MailOutbox()
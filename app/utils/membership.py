@@ -0,0 +1,60 @@
+import os
+from .cache import TTLStore
+from .helpers import safe_object_id
+from .invalidation import invalidation_bus
+
+# (user_id, project_id) -> {"_id", "name", "owner"}
+# 멤버인 경우만 캐시함 (비멤버를 캐시하면 초대 수락 직후 다른 워커에서 거부될 수 있음)
+membership_cache = TTLStore(
+    maxsize=int(os.getenv('MEMBERSHIP_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('MEMBERSHIP_CACHE_TTL', 30))
+)
+
+_PROJECTION = {"name": 1, "owner": 1}
+
+
+def get_member_project(mongo, user_id, project_id):
+    """사용자가 프로젝트 멤버이면 프로젝트 요약(_id, name, owner)을, 아니면 None을 반환"""
+    key = (str(user_id), str(project_id))
+    cached = membership_cache.get(key)
+    if cached is not None:
+        return cached
+
+    oid = safe_object_id(project_id)
+    uid = safe_object_id(user_id)
+    if not oid or not uid:
+        return None
+
+    generation = membership_cache.generation
+    project = mongo.db.projects.find_one({"_id": oid, "members": uid}, _PROJECTION)
+    if project:
+        membership_cache.set(key, project, generation)
+    return project
+
+
+def is_member(mongo, user_id, project_id):
+    return get_member_project(mongo, user_id, project_id) is not None
+
+
+def _evict(user_id=None, project_id=None):
+    user_key = str(user_id) if user_id is not None else None
+    project_key = str(project_id) if project_id is not None else None
+
+    if user_key and project_key:
+        membership_cache.delete((user_key, project_key))
+    elif user_key:
+        membership_cache.delete_where(lambda key: key[0] == user_key)
+    elif project_key:
+        membership_cache.delete_where(lambda key: key[1] == project_key)
+
+
+def invalidate_membership(user_id=None, project_id=None):
+    """멤버십 변경 시 캐시 무효화 (user/project 중 지정된 조건에 맞는 항목만 제거)
+
+    다른 워커의 캐시도 invalidation_bus로 함께 무효화한다.
+    """
+    _evict(user_id, project_id)
+    invalidation_bus.publish("membership", user_id=user_id, project_id=project_id)
+
+
+invalidation_bus.subscribe("membership", _evict, membership_cache.clear)
@@ -0,0 +1,92 @@
+import queue
+from datetime import datetime
+from pymongo.errors import PyMongoError
+from .helpers import logger
+
+
+class NotificationFanout:
+    """프로젝트 멤버들에게 알림을 일괄 저장/전송
+
+    수신자 닉네임은 한 번의 $in 조회로, 알림 저장은 insert_many 한 번으로 처리한다.
+    비동기 모드에서는 제한된 크기의 큐에 넣고 백그라운드 워커가 처리하며,
+    큐가 가득 차면 호출한 쪽에서 바로 처리한다.
+    """
+
+    def __init__(self):
+        self.mongo = None
+        self.socketio = None
+        self._queue = None
+
+    def init_app(self, mongo, socketio, async_delivery=False, queue_size=1000, workers=1):
+        self.mongo = mongo
+        self.socketio = socketio
+        if async_delivery:
+            self._queue = queue.Queue(maxsize=queue_size)
+            for _ in range(workers):
+                socketio.start_background_task(self._worker)
+
+    def publish(self, member_ids, exclude_user_id, notification, payload, extra_events=()):
+        """member_ids 중 exclude_user_id를 제외한 멤버에게 알림 전송
+
+        notification: DB에 저장할 공통 필드 (message, type, project_id ...)
+        payload: 'notification' 이벤트로 보낼 공통 필드 (id/timestamp/read는 자동으로 채움)
+        extra_events: 같은 수신자들에게 함께 보낼 (이벤트 이름, 데이터) 목록
+        """
+        job = (list(member_ids), str(exclude_user_id), notification, payload, list(extra_events))
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(job)
+                return
+            except queue.Full:
+                logger.warning("Notification queue is full, delivering inline")
+        self._deliver(*job)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._deliver(*job)
+            except Exception as e:
+                logger.error(f"Failed to deliver notifications: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, member_ids, exclude_user_id, notification, payload, extra_events):
+        recipients = [member for member in member_ids if str(member) != exclude_user_id]
+        if not recipients:
+            return
+
+        try:
+            users = self.mongo.db.users.find({"_id": {"$in": recipients}}, {"nickname": 1})
+            nicknames = {user["_id"]: user.get("nickname") for user in users}
+
+            timestamp = datetime.utcnow()
+            docs = [{
+                **notification,
+                "user_id": member,
+                "timestamp": timestamp,
+                "read": False
+            } for member in recipients if nicknames.get(member)]
+            if not docs:
+                return
+            self.mongo.db.notifications.insert_many(docs, ordered=False)
+        except PyMongoError as e:
+            logger.error(f"Failed to store notifications: {str(e)}")
+            return
+
+        for doc in docs:
+            self.socketio.emit("notification", {
+                **payload,
+                "id": str(doc["_id"]),
+                "timestamp": timestamp.isoformat(),
+                "read": False
+            }, to=nicknames[doc["user_id"]])
+
+        rooms = [nicknames[doc["user_id"]] for doc in docs]
+        for event, data in extra_events:
+            self.socketio.emit(event, data, to=rooms)
+
+        logger.info(f"Delivered {len(docs)} '{notification.get('type')}' notifications")
+
+
+notification_fanout = NotificationFanout()
@@ -0,0 +1,44 @@
+from pymongo import ASCENDING, UpdateOne
+from .ranking import MAX_RANK_LENGTH, plan_ranks, rank_between, request_rebalance
+
+# 카드 목록 정렬 순서 (아직 rank가 없는 이전 카드는 rank 재배치 전까지 기존 order 순서를 따름)
+CARD_SORT = [("rank", ASCENDING), ("order", ASCENDING)]
+
+
+def apply_card_order(mongo, project_oid, order_oids, session=None):
+    """카드 순서를 한 번의 $in 조회와 한 번의 bulk write로 반영
+
+    이미 올바른 상대 순서에 있는 카드의 rank는 그대로 두고, 위치가 바뀐 카드에만 새 rank를 부여한다.
+    반환값: (프로젝트에 없는 카드 ID 목록, 순서가 바뀐 카드 목록)
+    누락된 카드가 있으면 아무것도 쓰지 않는다.
+    """
+    cards = mongo.db.cards.find(
+        {"_id": {"$in": order_oids}, "project_id": project_oid},
+        {"title": 1, "rank": 1},
+        session=session
+    )
+    found = {card["_id"]: card for card in cards}
+    missing = [cid for cid in order_oids if cid not in found]
+    if missing:
+        return missing, []
+
+    new_ranks = plan_ranks([found[cid].get("rank") for cid in order_oids])
+
+    operations = []
+    changed = []
+    for index, rank in sorted(new_ranks.items()):
+        cid = order_oids[index]
+        operations.append(UpdateOne({"_id": cid, "project_id": project_oid}, {"$set": {"rank": rank}}))
+        changed.append({"id": cid, "title": found[cid]["title"], "new_order": index})
+        if len(rank) > MAX_RANK_LENGTH:
+            request_rebalance(project_oid)
+
+    if operations:
+        mongo.db.cards.bulk_write(operations, ordered=False, session=session)
+    return [], changed
+
+
+def next_card_rank(mongo, project_oid):
+    """프로젝트 맨 뒤에 추가될 카드의 rank"""
+    last = next(mongo.db.cards.find({"project_id": project_oid}, {"rank": 1}).sort("rank", -1).limit(1), None)
+    return rank_between(last.get("rank") if last else None, None)
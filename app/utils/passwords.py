@@ -0,0 +1,148 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+import bcrypt
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from .helpers import logger
+from .pool import make_process_pool
+
+
+class PasswordHasherBusy(RuntimeError):
+    """대기 중인 해시 작업이 너무 많거나 제한 시간 안에 끝나지 않음"""
+
+
+# 프로세스 풀에서 실행되는 함수 (Flask-Bcrypt와 같은 방식이라 기존 해시와 호환)
+# 반환값: (결과, 실제 계산에 걸린 시간)
+def _to_bytes(password, handle_long):
+    password = password.encode("utf-8")
+    if handle_long:
+        password = hashlib.sha256(password).hexdigest().encode("utf-8")
+    return password
+
+
+def _hash(password, rounds, prefix, handle_long):
+    started = time.perf_counter()
+    salt = bcrypt.gensalt(rounds=rounds, prefix=prefix.encode())
+    pw_hash = bcrypt.hashpw(_to_bytes(password, handle_long), salt).decode("utf-8")
+    return pw_hash, time.perf_counter() - started
+
+
+def _check(pw_hash, password, handle_long):
+    started = time.perf_counter()
+    try:
+        pw_hash = pw_hash.encode("utf-8")
+        matched = hmac.compare_digest(bcrypt.hashpw(_to_bytes(password, handle_long), pw_hash), pw_hash)
+    except ValueError:  # 잘못된 형식의 해시
+        matched = False
+    return matched, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """bcrypt 해시/검증을 프로세스 풀에서 실행해 eventlet 허브(실시간 처리)를 막지 않게 함
+
+    - 동시에 풀에 넣을 수 있는 작업 수를 max_pending으로 제한하고, timeout초 안에 자리가 나지 않거나
+      끝나지 않으면 PasswordHasherBusy (로그인 폭주 시 요청이 무한정 쌓이지 않도록)
+    - 대기 시간(슬롯 + 풀 큐)과 계산 시간을 집계해 snapshot()으로 제공
+    - workers=0이면 호출한 스레드에서 바로 계산 (CLI, 풀 자식 프로세스)
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.prefix = "2b"
+        self.handle_long = False
+        self.timeout = 10.0
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def init_app(self, app, workers=2, max_pending=8, timeout=10.0):
+        # Flask-Bcrypt와 같은 설정 이름 사용
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        self.prefix = app.config.get("BCRYPT_HASH_PREFIX", "2b")
+        self.handle_long = app.config.get("BCRYPT_HANDLE_LONG_PASSWORDS", False)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        if workers > 0:
+            self._executor = make_process_pool(workers, preload=[__name__])
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)[0]
+
+        queued = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            logger.error(f"Password hasher is busy, rejected after waiting {self.timeout}s")
+            raise PasswordHasherBusy()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # 제한 시간이 지나도 풀에서는 계속 계산하므로 슬롯은 작업이 실제로 끝날 때 반환
+        future.add_done_callback(self._release)
+        try:
+            remaining = self.timeout - (time.perf_counter() - queued)
+            result, run = future.result(timeout=max(remaining, 0.1))
+        except FutureTimeoutError:
+            with self._lock:
+                self.rejected += 1
+            logger.error(f"Password hashing did not finish within {self.timeout}s")
+            raise PasswordHasherBusy()
+
+        wait = max(time.perf_counter() - queued - run, 0.0)
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += run
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def hash(self, password):
+        """비밀번호 해시 문자열 (검증을 모두 통과한 뒤에만 호출)"""
+        return self._submit(_hash, password, self.rounds, self.prefix, self.handle_long)
+
+    def check(self, pw_hash, password):
+        return self._submit(_check, pw_hash, password, self.handle_long)
+
+    def needs_rehash(self, pw_hash):
+        """저장된 해시의 cost가 현재 BCRYPT_LOG_ROUNDS와 다르면 True (로그인 성공 시 다시 해시)"""
+        try:
+            return int(pw_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "rounds": self.rounds,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_run_ms": round(self.total_run / self.completed * 1000, 3) if self.completed else 0.0,
+            }
+
+
+password_hasher = PasswordHasher()
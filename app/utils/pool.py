@@ -0,0 +1,33 @@
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .helpers import logger
+
+# forkserver가 시작될 때 미리 import할 모듈 (풀마다 추가)
+_preload = set()
+
+
+def make_process_pool(max_workers, preload=()):
+    """CPU를 많이 쓰는 작업(이미지 변환, bcrypt 등)을 돌릴 프로세스 풀
+
+    자식이 워커의 스레드/eventlet 상태를 복제하지 않도록 fork는 쓰지 않는다.
+    - forkserver: preload 모듈만 미리 불러 둔 서버 프로세스에서 자식을 만듦
+    - spawn: eventlet.monkey_patch() 이후(gunicorn -k eventlet)에는 forkserver가 목록에서 빠지므로 사용,
+      자식은 새 인터프리터에서 작업 함수의 모듈만 import함
+    스레드 풀로 대신하지 않는다. monkey patch 환경에서는 스레드가 green thread라 허브를 그대로 막기 때문.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" in methods:
+        context = multiprocessing.get_context("forkserver")
+        _preload.update(preload)
+        context.set_forkserver_preload(sorted(_preload))
+    elif "spawn" in methods:
+        context = multiprocessing.get_context("spawn")
+    else:
+        logger.error(f"No usable process start method for the process pool: {methods}")
+        raise RuntimeError("forkserver/spawn 방식의 프로세스를 만들 수 없습니다.")
+    logger.info(f"Process pool: {max_workers} workers ({context.get_start_method()})")
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    # 자식 프로세스를 먼저 종료시킴 (그러지 않으면 eventlet 환경에서 multiprocessing의 종료 처리가 자식을 기다리며 멈춤)
+    atexit.register(executor.shutdown, cancel_futures=True)
+    return executor
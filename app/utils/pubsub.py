@@ -0,0 +1,156 @@
+import atexit
+import glob
+import os
+import socket
+import stat
+import uuid
+from urllib.parse import urlparse
+import socketio
+from socketio import PubSubManager
+from .helpers import logger
+from .serialize import dumps_bytes
+
+# 데이터그램 하나의 최대 크기 (실제 한도는 커널 설정 net.core.wmem_max에 따라 더 작을 수 있음)
+MAX_DATAGRAM_SIZE = 4 * 1024 * 1024
+SEND_TIMEOUT = 2.0
+
+
+# 메시지 큐로 받은 emit 중 서버도 처리해야 하는 이벤트 {event: [handler(data)]}
+_queue_listeners = {}
+
+
+def on_queue_emit(event, handler):
+    """다른 워커가 메시지 큐로 보낸 event를 이 워커에서 받을 때 handler(data)도 호출
+
+    클라이언트에게 보내는 메시지를 그대로 받으므로 별도 저장/전송 없이 워커별 상태(채팅 버퍼 등)를 맞출 수 있다.
+    메시지 큐를 쓰지 않으면(단일 워커) 호출되지 않는다.
+    """
+    _queue_listeners.setdefault(event, []).append(handler)
+
+
+class QueueListenerMixin:
+    """PubSubManager가 다른 워커의 emit을 처리할 때 on_queue_emit 처리기도 호출"""
+
+    def _handle_emit(self, message):
+        super()._handle_emit(message)
+        if message.get('host_id') == self.host_id:
+            return  # 이 워커가 보낸 메시지 (보낸 쪽에서 직접 처리함)
+        for handler in _queue_listeners.get(message.get('event'), ()):
+            try:
+                handler(message.get('data'))
+            except Exception as e:
+                logger.error(f"Failed to handle queued {message.get('event')} event: {str(e)}")
+
+
+def default_socket_directory():
+    """소켓 디렉터리 기본값: 사용자 전용 런타임 디렉터리($XDG_RUNTIME_DIR), 없으면 /tmp 아래 uid별 디렉터리"""
+    runtime = os.getenv('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'collab-socketio')
+    return os.path.join('/tmp', f'collab-socketio-{os.getuid()}')
+
+
+def ensure_private_directory(path):
+    """path를 0700으로 만들고, 심볼릭 링크이거나 다른 사용자 소유이거나 권한이 0700이 아니면 RuntimeError
+
+    다른 로컬 사용자가 먼저 만든 디렉터리에 소켓을 두면 브로드캐스트를 엿듣거나
+    (PubSubManager가 pickle.loads로 읽는) 메시지를 끼워 넣을 수 있으므로 시작하지 않는다.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    problem = None
+    if stat.S_ISLNK(info.st_mode) or not stat.S_ISDIR(info.st_mode):
+        problem = "not a real directory"
+    elif info.st_uid != os.getuid():
+        problem = f"owned by uid {info.st_uid}"
+    elif stat.S_IMODE(info.st_mode) != 0o700:
+        problem = f"mode {oct(stat.S_IMODE(info.st_mode))}"
+    if problem:
+        logger.error(f"Refusing to use Socket.IO socket directory {path}: {problem}")
+        raise RuntimeError(f"Socket.IO 소켓 디렉터리 {path}를 사용할 수 없습니다 ({problem}). 0700 권한의 전용 디렉터리를 지정하세요.")
+
+
+class UnixSocketManager(QueueListenerMixin, PubSubManager):
+    """같은 서버의 워커끼리 Unix 데이터그램 소켓으로 Socket.IO 이벤트를 주고받는 클라이언트 매니저
+
+    각 워커는 공유 디렉터리에 자기 소켓 파일(<channel>-<id>.sock)을 만들고,
+    이벤트를 보낼 때는 디렉터리의 다른 소켓 파일 전부에 같은 메시지를 보낸다.
+    외부 서비스가 필요 없지만 한 서버 안에서만 동작하므로, 여러 서버로 확장할 때는
+    SOCKETIO_MESSAGE_QUEUE에 redis:// 등의 주소를 지정한다.
+    """
+    name = 'unix'
+
+    def __init__(self, url='unix://', channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.directory = os.path.normpath(urlparse(url).path or default_socket_directory())
+        ensure_private_directory(self.directory)
+        self.path = None
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, MAX_DATAGRAM_SIZE)
+        self._sender.settimeout(SEND_TIMEOUT)
+
+    def _peers(self):
+        return [path for path in glob.glob(os.path.join(self.directory, f"{self.channel}-*.sock"))
+                if path != self.path]
+
+    def _publish(self, data):
+        payload = dumps_bytes(data)
+        for path in self._peers():
+            try:
+                self._sender.sendto(payload, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 종료된 워커가 남긴 소켓 파일
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.error(f"Failed to publish Socket.IO message to {path}: {str(e)}")
+
+    def _bind(self):
+        self.path = os.path.join(self.directory, f"{self.channel}-{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, MAX_DATAGRAM_SIZE)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        atexit.register(self._unlink)
+        return sock
+
+    def _unlink(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _listen(self):
+        sock = self._bind()
+        try:
+            while True:
+                yield sock.recv(MAX_DATAGRAM_SIZE)
+        finally:
+            sock.close()
+            self._unlink()
+
+
+def socketio_queue_options(url, channel='socketio'):
+    """SOCKETIO_MESSAGE_QUEUE 값에 맞는 SocketIO() 인자를 반환
+
+    - 비어 있음: 메시지 큐 없음 (단일 워커)
+    - unix:///경로: UnixSocketManager (같은 서버의 워커끼리), unix:// 이면 default_socket_directory()
+    - redis://, kafka:// 등: Flask-SocketIO가 고르는 것과 같은 매니저 (여러 서버)
+    모두 on_queue_emit 처리기를 호출하도록 QueueListenerMixin을 붙인다.
+    """
+    if not url:
+        return {}
+    if url.startswith('unix://'):
+        return {"client_manager": UnixSocketManager(url, channel=channel)}
+    if url.startswith(('redis://', 'rediss://')):
+        base = socketio.RedisManager
+    elif url.startswith('kafka://'):
+        base = socketio.KafkaManager
+    elif url.startswith('zmq'):
+        base = socketio.ZmqManager
+    else:
+        base = socketio.KombuManager
+    manager_class = type(f"Listening{base.__name__}", (QueueListenerMixin, base), {})
+    return {"client_manager": manager_class(url, channel=channel)}
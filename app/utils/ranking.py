@@ -0,0 +1,165 @@
+import threading
+from pymongo import UpdateOne
+from .etag import bump_project_version
+from .helpers import logger
+
+# 순서 키 문자 (ASCII 순서 = 사전순)
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(ALPHABET)
+_DIGIT = {ch: i for i, ch in enumerate(ALPHABET)}
+
+# 키가 이 길이를 넘으면 해당 프로젝트의 키를 다시 균등 배치함
+MAX_RANK_LENGTH = 24
+
+
+def rank_between(before=None, after=None):
+    """두 키 사이에 오는 새 키를 생성 (None은 각각 맨 앞/맨 뒤를 의미)
+
+    생성되는 키는 '0'으로 끝나지 않으므로 항상 앞에 또 다른 키를 끼워 넣을 수 있다.
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Invalid rank bounds: {before!r} >= {after!r}")
+
+    before = before or ""
+    result = []
+    i = 0
+    while True:
+        lo = _DIGIT[before[i]] if i < len(before) else 0
+        if after is not None and i >= len(after):
+            raise ValueError(f"Rank {after!r} has no room before it")
+        hi = _DIGIT[after[i]] if after is not None else BASE
+        if lo == hi:
+            result.append(ALPHABET[lo])
+            i += 1
+            continue
+
+        mid = (lo + hi) // 2
+        if mid > lo:
+            result.append(ALPHABET[mid])
+            return "".join(result)
+
+        # 바로 인접한 자리 -> lo를 고정하고 다음 자리에서 상한 없이 계속
+        result.append(ALPHABET[lo])
+        i += 1
+        after = None
+
+
+def evenly_spaced_ranks(count):
+    """count개의 키를 키 공간에 균등하게 배치해 생성"""
+    width = 2
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    step = BASE ** width // (count + 1)
+
+    ranks = []
+    for index in range(1, count + 1):
+        value = index * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(ALPHABET[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+def _longest_increasing(ranks):
+    """ranks 중 순서를 유지해도 되는 위치(최장 증가 부분수열)의 인덱스 집합"""
+    tails = []      # 길이별 마지막 원소의 인덱스
+    previous = [None] * len(ranks)
+    for index, rank in enumerate(ranks):
+        if rank is None:
+            continue
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ranks[tails[mid]] < rank:
+                lo = mid + 1
+            else:
+                hi = mid
+        previous[index] = tails[lo - 1] if lo > 0 else None
+        if lo == len(tails):
+            tails.append(index)
+        else:
+            tails[lo] = index
+
+    keep = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        keep.add(index)
+        index = previous[index]
+    return keep
+
+
+def plan_ranks(current_ranks):
+    """원하는 순서대로 나열된 현재 키 목록을 받아, 새 키가 필요한 위치만 {인덱스: 새 키}로 반환
+
+    이미 올바른 상대 순서에 있는 카드는 건드리지 않으므로 카드 하나를 옮기면 그 카드만 갱신된다.
+    """
+    if any(rank is None for rank in current_ranks):
+        # 키가 없는 기존 데이터가 섞여 있으면 전체를 다시 배치
+        return dict(enumerate(evenly_spaced_ranks(len(current_ranks))))
+
+    keep = _longest_increasing(current_ranks)
+
+    # 각 위치 뒤에서 처음 만나는 유지 카드의 키
+    next_kept = [None] * len(current_ranks)
+    upcoming = None
+    for index in range(len(current_ranks) - 1, -1, -1):
+        next_kept[index] = upcoming
+        if index in keep:
+            upcoming = current_ranks[index]
+
+    assigned = {}
+    prev_rank = None
+    for index, rank in enumerate(current_ranks):
+        if index in keep:
+            prev_rank = rank
+            continue
+        new_rank = rank_between(prev_rank, next_kept[index])
+        assigned[index] = new_rank
+        prev_rank = new_rank
+    return assigned
+
+
+# 키가 길어진 프로젝트 목록 (백그라운드 작업에서 재배치)
+_pending_rebalance = set()
+_pending_lock = threading.Lock()
+
+
+def request_rebalance(project_oid):
+    with _pending_lock:
+        _pending_rebalance.add(project_oid)
+
+
+def rebalance_project_ranks(mongo, project_oid):
+    """프로젝트의 모든 카드 키를 현재 순서를 유지한 채 균등하게 다시 배치"""
+    cards = list(mongo.db.cards.find({"project_id": project_oid}, {"_id": 1}).sort([("rank", 1), ("order", 1)]))
+    ranks = evenly_spaced_ranks(len(cards))
+    operations = [UpdateOne({"_id": card["_id"]}, {"$set": {"rank": rank}}) for card, rank in zip(cards, ranks)]
+    if operations:
+        mongo.db.cards.bulk_write(operations, ordered=False)
+        bump_project_version(mongo, project_oid)
+    logger.info(f"Rebalanced {len(operations)} card ranks in project {project_oid}")
+    return len(operations)
+
+
+def find_projects_needing_rebalance(mongo):
+    """키가 너무 길거나 아직 키가 없는 카드가 있는 프로젝트 ID 목록"""
+    return mongo.db.cards.distinct("project_id", {"$or": [
+        {"rank": {"$exists": False}},
+        {"$expr": {"$gt": [{"$strLenCP": {"$ifNull": ["$rank", ""]}}, MAX_RANK_LENGTH]}}
+    ]})
+
+
+def run_rank_rebalancer(mongo, sleep, interval):
+    """request_rebalance로 등록된 프로젝트를 주기적으로 재배치하는 백그라운드 루프"""
+    while True:
+        sleep(interval)
+        with _pending_lock:
+            project_oids = list(_pending_rebalance)
+            _pending_rebalance.clear()
+        for project_oid in project_oids:
+            try:
+                rebalance_project_ranks(mongo, project_oid)
+            except Exception as e:
+                logger.error(f"Failed to rebalance ranks for project {project_oid}: {str(e)}")
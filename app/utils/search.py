@@ -0,0 +1,318 @@
+import re
+import unicodedata
+from datetime import datetime
+from pymongo import ReplaceOne
+from pymongo.errors import PyMongoError
+from .helpers import logger
+
+# 단어마다 앞부분(접두어)을 이 길이까지 색인 -> 입력 중인 검색어도 일치
+MAX_PREFIX_LENGTH = 15
+# 모든 단어는 자모 1~3-gram도 색인 -> 짧은 단어, 중간 일치 (제목은 관련도 계산에도 사용)
+JAMO_GRAM = 3
+# 제목(프로젝트 이름/카드 제목/닉네임)은 초성 n-gram도 색인 -> 초성 검색
+CHOSUNG_GRAM = 2
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+_WORD = re.compile(r"\w+")
+
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSUNG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ",
+            "ㄿ", "ㅀ", "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+_SYLLABLE_START, _SYLLABLE_END = 0xAC00, 0xD7A3
+
+# NFKC는 호환 자모(ㅍ)를 조합용 자모(U+1111)로 바꾸므로 다시 호환 자모로 되돌림
+_CONJOINING = {}
+_CONJOINING.update({chr(0x1100 + i): ch for i, ch in enumerate(CHOSUNG)})
+_CONJOINING.update({chr(0x1161 + i): ch for i, ch in enumerate(JUNGSUNG)})
+_CONJOINING.update({chr(0x11A8 + i): ch for i, ch in enumerate(JONGSUNG[1:])})
+
+
+def _words(text):
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = "".join(_CONJOINING.get(ch, ch) for ch in text)
+    return _WORD.findall(text)
+
+
+def _prefixes(words):
+    terms = set()
+    for word in words:
+        for length in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+            terms.add(word[:length])
+    return terms
+
+
+def decompose(word):
+    """한글 음절을 자모로 분해 (프로 -> ㅍㅡㄹㅗ), 한글이 아닌 문자는 그대로"""
+    result = []
+    for ch in word:
+        code = ord(ch)
+        if _SYLLABLE_START <= code <= _SYLLABLE_END:
+            index = code - _SYLLABLE_START
+            result.append(CHOSUNG[index // 588])
+            result.append(JUNGSUNG[(index % 588) // 28])
+            result.append(JONGSUNG[index % 28])
+        else:
+            result.append(ch)
+    return "".join(result)
+
+
+def initials(word):
+    """한글 음절의 초성만 추출 (프로젝트 -> ㅍㄹㅈㅌ), 한글이 아닌 문자는 그대로"""
+    result = []
+    for ch in word:
+        code = ord(ch)
+        if _SYLLABLE_START <= code <= _SYLLABLE_END:
+            result.append(CHOSUNG[(code - _SYLLABLE_START) // 588])
+        else:
+            result.append(ch)
+    return "".join(result)
+
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _jamo_grams(words):
+    """단어의 자모 1~JAMO_GRAM-gram(g:)"""
+    terms = set()
+    for word in words:
+        jamo = decompose(word)
+        for size in range(1, JAMO_GRAM + 1):
+            terms.update("g:" + gram for gram in _grams(jamo, size))
+    return terms
+
+
+def _query_grams(word):
+    """검색 단어가 포함된 항목을 찾기 위한 자모 gram 목록 (JAMO_GRAM보다 짧은 단어는 단어 전체가 gram 하나)"""
+    jamo = decompose(word)
+    if len(jamo) < JAMO_GRAM:
+        return ["g:" + jamo]
+    return sorted("g:" + gram for gram in _grams(jamo, JAMO_GRAM))
+
+
+def _title_grams(words):
+    """제목 단어의 자모 n-gram(g:)과 초성 n-gram(c:), 초성 첫 글자(c:)"""
+    terms = _jamo_grams(words)
+    for word in words:
+        chosung = initials(word)
+        terms.add("c:" + chosung[0])
+        terms.update("c:" + gram for gram in _grams(chosung, CHOSUNG_GRAM))
+    return terms
+
+
+def _is_chosung(word):
+    return all(ch in CHOSUNG for ch in word)
+
+
+def parse_query(keyword):
+    """검색어 -> (색인 조건 목록, 관련도 계산용 토큰 목록)
+
+    - 초성만 입력한 단어(ㅍㄹㅈ): 제목 초성 n-gram이 모두 일치
+    - 그 외 단어: 단어 접두어가 일치하거나, 자모 n-gram이 모두 일치(중간 일치/입력 중인 음절/짧은 단어)
+    모든 단어의 조건을 만족해야 결과에 포함된다.
+    단어가 하나도 없는 검색어(특수문자만 입력)는 조건이 비므로 scan_search/scan_user_ids로 원본을 검색한다.
+    """
+    clauses = []
+    tokens = set()
+    for word in dict.fromkeys(_words(keyword)):
+        if _is_chosung(word):
+            grams = sorted("c:" + gram for gram in _grams(word, CHOSUNG_GRAM)) or ["c:" + word]
+            clauses.append({"terms": {"$all": grams}})
+            tokens.update(grams)
+            continue
+
+        prefix = word[:MAX_PREFIX_LENGTH]
+        tokens.add(prefix)
+        grams = _query_grams(word)
+        clauses.append({"$or": [{"terms": prefix}, {"terms": {"$all": grams}}]})
+        tokens.update(grams)
+    return clauses, sorted(tokens)
+
+
+def _index_doc(kind, ref_id, project_id, title, description=None):
+    title_words = _words(title)
+    words = title_words + _words(description)
+    title_terms = _prefixes(title_words) | _title_grams(title_words)
+    return {
+        "_id": ref_id,
+        "kind": kind,
+        "project_id": project_id,
+        "terms": sorted(_prefixes(words) | _jamo_grams(words) | title_terms),
+        "title_terms": sorted(title_terms),
+        "words": sorted(set(words)),
+        "indexed_at": datetime.utcnow()
+    }
+
+
+def project_index_doc(project):
+    return _index_doc("project", project["_id"], project["_id"],
+                      project.get("name"), project.get("description"))
+
+
+def card_index_doc(card):
+    return _index_doc("card", card["_id"], card["project_id"],
+                      card.get("title"), card.get("description"))
+
+
+def user_index_doc(user):
+    # 사용자는 프로젝트에 속하지 않으므로 project_id는 None
+    return _index_doc("user", user["_id"], None, user.get("nickname"))
+
+
+def _replace(mongo, doc):
+    try:
+        mongo.db.search_index.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    except PyMongoError as e:
+        logger.error(f"Failed to index {doc['kind']} {doc['_id']}: {str(e)}")
+
+
+def index_project(mongo, project):
+    """프로젝트 생성/수정 후 검색 색인 갱신 (project: _id, name, description 필요)"""
+    _replace(mongo, project_index_doc(project))
+
+
+def index_card(mongo, card):
+    """카드 생성/수정/이동 후 검색 색인 갱신 (card: _id, project_id, title, description 필요)"""
+    _replace(mongo, card_index_doc(card))
+
+
+def index_user(mongo, user):
+    """회원가입/닉네임 변경 후 닉네임 색인 갱신 (user: _id, nickname 필요)"""
+    _replace(mongo, user_index_doc(user))
+
+
+def unindex(mongo, ref_ids):
+    """삭제된 카드/프로젝트/사용자를 색인에서 제거"""
+    try:
+        mongo.db.search_index.delete_many({"_id": {"$in": list(ref_ids)}})
+    except PyMongoError as e:
+        logger.error(f"Failed to remove search entries {ref_ids}: {str(e)}")
+
+
+def unindex_projects(mongo, project_oids):
+    """삭제된 프로젝트와 그 카드들을 색인에서 제거"""
+    try:
+        mongo.db.search_index.delete_many({"project_id": {"$in": list(project_oids)}})
+    except PyMongoError as e:
+        logger.error(f"Failed to remove search entries for projects {project_oids}: {str(e)}")
+
+
+def rebuild_search_index(mongo, batch_size=500):
+    """projects/cards/users 전체로 색인을 다시 만들고, 더 이상 없는 항목은 제거"""
+    started = datetime.utcnow()
+    count = 0
+    sources = [
+        (mongo.db.projects.find({}, {"name": 1, "description": 1}), project_index_doc),
+        (mongo.db.cards.find({}, {"project_id": 1, "title": 1, "description": 1}), card_index_doc),
+        (mongo.db.users.find({"nickname": {"$exists": True}}, {"nickname": 1}), user_index_doc),
+    ]
+    for cursor, build in sources:
+        operations = []
+        for item in cursor:
+            doc = build(item)
+            operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            if len(operations) >= batch_size:
+                mongo.db.search_index.bulk_write(operations, ordered=False)
+                count += len(operations)
+                operations = []
+        if operations:
+            mongo.db.search_index.bulk_write(operations, ordered=False)
+            count += len(operations)
+
+    removed = mongo.db.search_index.delete_many({"indexed_at": {"$lt": started}}).deleted_count
+    logger.info(f"Rebuilt search index: {count} entries indexed, {removed} stale entries removed")
+    return count, removed
+
+
+def query_search_index(mongo, query, card_project_ids, project_ids, page=1, limit=SEARCH_PAGE_SIZE):
+    """색인에서 검색 조건을 모두 만족하는 항목을 관련도 순으로 한 페이지 조회
+
+    query: parse_query()의 결과
+    card_project_ids: 카드 검색 대상 프로젝트, project_ids: 프로젝트 검색 대상 프로젝트
+    관련도: 제목 토큰 일치 2점 + 단어 전체 일치 1점 (토큰마다)
+    반환값: (hits, has_more) - hits는 {_id, kind, project_id, score}
+    """
+    clauses, tokens = query
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    page = max(1, page)
+    scope = []
+    if card_project_ids:
+        scope.append({"kind": "card", "project_id": {"$in": list(card_project_ids)}})
+    if project_ids:
+        scope.append({"kind": "project", "project_id": {"$in": list(project_ids)}})
+    if not clauses or not scope:
+        return [], False
+
+    pipeline = [
+        {"$match": {
+            "project_id": {"$in": list(set(card_project_ids) | set(project_ids))},
+            "$and": clauses + [{"$or": scope}]
+        }},
+        _score_stage(tokens),
+        {"$sort": {"score": -1, "indexed_at": -1, "_id": -1}},
+        {"$skip": (page - 1) * limit},
+        {"$limit": limit + 1}
+    ]
+    hits = list(mongo.db.search_index.aggregate(pipeline))
+    return hits[:limit], len(hits) > limit
+
+
+def scan_search(mongo, keyword, card_project_ids, project_ids, page=1, limit=SEARCH_PAGE_SIZE):
+    """색인으로 찾을 수 없는 검색어(특수문자만 입력)를 projects/cards 원본에 정규식으로 검색
+
+    query_search_index와 같은 형식으로 프로젝트, 카드 순서의 한 페이지를 반환
+    """
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    skip = (max(1, page) - 1) * limit
+    pattern = {"$regex": re.escape(keyword), "$options": "i"}
+
+    hits = [
+        {"_id": project["_id"], "kind": "project", "project_id": project["_id"]}
+        for project in mongo.db.projects.find(
+            {"_id": {"$in": list(project_ids)}, "$or": [{"name": pattern}, {"description": pattern}]},
+            {"_id": 1}
+        ).sort("_id", 1)
+    ]
+    card_skip = max(0, skip - len(hits))
+    hits = hits[skip:skip + limit + 1]
+    if len(hits) <= limit and card_project_ids:
+        cards = mongo.db.cards.find(
+            {"project_id": {"$in": list(card_project_ids)}, "$or": [{"title": pattern}, {"description": pattern}]},
+            {"project_id": 1}
+        ).sort("_id", 1).skip(card_skip).limit(limit + 1 - len(hits))
+        hits.extend({"_id": card["_id"], "kind": "card", "project_id": card["project_id"]} for card in cards)
+    return hits[:limit], len(hits) > limit
+
+
+def scan_user_ids(mongo, keyword, limit=10):
+    """색인으로 찾을 수 없는 검색어(특수문자만 입력)를 users.nickname에 정규식으로 검색"""
+    pattern = {"$regex": re.escape(keyword), "$options": "i"}
+    return [user["_id"] for user in mongo.db.users.find({"nickname": pattern}, {"_id": 1}).limit(limit)]
+
+
+def search_user_ids(mongo, query, limit=10):
+    """닉네임 색인에서 검색 조건을 만족하는 사용자 ID를 관련도 순으로 조회"""
+    clauses, tokens = query
+    if not clauses:
+        return []
+    pipeline = [
+        {"$match": {"project_id": None, "kind": "user", "$and": clauses}},
+        _score_stage(tokens),
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
+    return [hit["_id"] for hit in mongo.db.search_index.aggregate(pipeline)]
+
+
+def _score_stage(tokens):
+    return {"$project": {
+        "kind": 1,
+        "project_id": 1,
+        "indexed_at": 1,
+        "score": {"$add": [
+            {"$multiply": [2, {"$size": {"$setIntersection": ["$title_terms", tokens]}}]},
+            {"$size": {"$setIntersection": ["$words", tokens]}}
+        ]}
+    }}
@@ -0,0 +1,112 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json 모듈로 같은 결과를 만듦
+    orjson = None
+
+# JSON 기본 타입이 아닌 값의 변환 함수 {타입: 함수}
+_ENCODERS = {}
+
+
+def register_encoder(type_, encoder):
+    """type_ 값을 encoder(value)의 반환값으로 직렬화하도록 등록"""
+    _ENCODERS[type_] = encoder
+
+
+def _default(value):
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        for type_, candidate in _ENCODERS.items():
+            if isinstance(value, type_):
+                encoder = candidate
+                break
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return encoder(value)
+
+
+def _utc_isoformat(value):
+    # DB의 datetime은 UTC 기준 naive 값이므로 Z를 붙임 (orjson의 OPT_NAIVE_UTC | OPT_UTC_Z와 같은 형식)
+    if value.tzinfo is None or value.utcoffset() == timedelta(0):
+        return value.replace(tzinfo=None).isoformat() + "Z"
+    return value.isoformat()
+
+
+register_encoder(ObjectId, str)
+register_encoder(Decimal, str)
+
+if orjson is not None:
+    # datetime, date, UUID는 orjson이 직접 ISO 8601 / 문자열로 변환
+    _OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    register_encoder(datetime, _utc_isoformat)
+    register_encoder(date, date.isoformat)
+    register_encoder(uuid.UUID, str)
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+    def dumps_bytes(obj):
+        return _encoder.encode(obj).encode()
+
+    loads = json.loads
+
+
+def dumps(obj):
+    return dumps_bytes(obj).decode()
+
+
+class FastJSONProvider(JSONProvider):
+    """jsonify, request.get_json, 템플릿 tojson이 이 모듈의 직렬화를 쓰도록 하는 Flask JSON 공급자"""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+class SocketIOJSON:
+    """SocketIO(json=...)에 넘기는 dumps/loads (separators 등 추가 인자는 무시)"""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return dumps(obj)
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return loads(s)
+
+
+def serialize_card(card):
+    """카드 문서를 API 응답 형식의 dict로 변환
+
+    created_at은 "%H:%M:%S", due_date는 "%Y-%m-%d"와 같은 문자열을 strftime보다 빠른 isoformat으로 만든다.
+    """
+    due_date = card.get("due_date")
+    return {
+        "id": str(card["_id"]),
+        "title": card["title"],
+        "description": card["description"],
+        "status": card["status"],
+        "project_id": str(card["project_id"]),
+        "created_by": str(card["created_by"]),
+        "created_at": card["created_at"].time().isoformat("seconds"),
+        "rank": card.get("rank"),
+        "due_date": due_date.date().isoformat() if due_date else None
+    }
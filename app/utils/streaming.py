@@ -0,0 +1,71 @@
+from flask import Response, request, stream_with_context
+from pymongo.errors import PyMongoError
+from .helpers import logger
+from .serialize import dumps_bytes
+
+# 커서에서 한 번에 가져올 문서 수, 한 번에 내보낼 응답 크기
+STREAM_BATCH_SIZE = 500
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def stream_format():
+    """?stream=1 이면 "json", ?stream=ndjson 이면 "ndjson", 아니면 None
+
+    - json: 기존과 같은 {key: [...]} 응답을 원소 단위로 나누어 전송
+    - ndjson: 한 줄에 원소 하나 (application/x-ndjson)
+    """
+    value = request.args.get("stream", "").lower()
+    if value == "ndjson":
+        return "ndjson"
+    if value in ("1", "true", "json"):
+        return "json"
+    return None
+
+
+def _chunks(pieces):
+    # 작은 조각을 모아 STREAM_CHUNK_BYTES 단위로 내보냄
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _json_pieces(key, items):
+    yield b"{" + dumps_bytes(key) + b":["
+    first = True
+    for item in items:
+        if not first:
+            yield b","
+        first = False
+        yield dumps_bytes(item)
+    yield b"]}"
+
+
+def _ndjson_pieces(items):
+    for item in items:
+        yield dumps_bytes(item) + b"\n"
+
+
+def _guarded(pieces):
+    # 전송 도중 DB 오류가 나면 응답이 잘린 채로 끝나므로 클라이언트는 JSON 파싱 오류로 알 수 있음
+    try:
+        yield from pieces
+    except PyMongoError as e:
+        logger.error(f"Streaming response aborted: {str(e)}")
+
+
+def stream_list(key, items, fmt):
+    """items(커서 등 이터러블)를 메모리에 모으지 않고 {key: [...]} 또는 NDJSON으로 보내는 응답
+
+    Content-Length 없이 chunked로 전송되므로 앞단 프록시의 gzip 압축과 함께 쓸 수 있다.
+    """
+    if fmt == "ndjson":
+        pieces, mimetype = _ndjson_pieces(items), "application/x-ndjson"
+    else:
+        pieces, mimetype = _json_pieces(key, items), "application/json"
+    return Response(stream_with_context(_chunks(_guarded(pieces))), mimetype=mimetype)
@@ -0,0 +1,85 @@
+from datetime import date, datetime
+from pymongo import UpdateOne
+from .counters import compute_card_counts
+from .db import supports_transactions
+
+
+def format_d_day(deadline, today=None):
+    """마감일까지 남은 날짜를 D-n / D-Day / D+n 형식으로 변환 (마감일이 없으면 None)"""
+    if not isinstance(deadline, datetime):
+        return None
+    today = today or date.today()
+    delta_days = (deadline.date() - today).days
+    if delta_days > 0:
+        return f"D-{delta_days}"
+    if delta_days == 0:
+        return "D-Day"
+    return f"D+{abs(delta_days)}"
+
+
+def init_card_counts(mongo, project_oids):
+    """카운터가 없는 프로젝트의 카드 개수를 세어 저장하고 센 값을 반환
+
+    세기와 저장을 한 트랜잭션에서 하므로, 그 사이 카드를 추가/삭제한 트랜잭션(프로젝트 version을 함께 올림)과
+    충돌하면 with_transaction이 다시 세어 저장한다. 이미 다른 요청이 초기화한 프로젝트는 덮어쓰지 않음.
+    """
+    def count_and_store(session):
+        actual = compute_card_counts(mongo, project_oids, session=session)
+        mongo.db.projects.bulk_write([
+            UpdateOne(
+                {"_id": project_oid, "card_count": {"$exists": False}},
+                {"$set": dict(zip(("card_count", "card_counts"), actual.get(project_oid, (0, {}))))}
+            ) for project_oid in project_oids
+        ], ordered=False, session=session)
+        return actual
+
+    if not supports_transactions(mongo):
+        # standalone mongod: 그 사이 바뀐 카드 개수는 reconcile_card_counts가 맞춤
+        return count_and_store(None)
+    with mongo.cx.start_session() as session:
+        return session.with_transaction(count_and_store)
+
+
+def project_summaries(mongo, user_oid, sort=None):
+    """사용자가 속한 프로젝트마다 카드 상태별 개수, 가장 가까운 카드 마감일, D-Day를 한 번의 aggregate로 조회
+
+    카드 개수는 프로젝트 문서에 유지되는 카운터(card_count, card_counts)를 그대로 읽고,
+    가장 가까운 마감일은 (project_id, due_date) 인덱스에서 카드 1건만 조회한다.
+    반환되는 프로젝트 문서에는 아래 필드가 추가된다.
+    - card_counts: {status: 개수}, card_count: 전체 개수
+    - next_due_date: 카드 마감일 중 가장 이른 날짜 (없으면 None)
+    - d_day: 프로젝트 마감일 기준, next_due_d_day: next_due_date 기준
+    """
+    pipeline = [{"$match": {"members": user_oid}}]
+    if sort:
+        pipeline.append({"$sort": sort})
+    pipeline.append({"$lookup": {
+        "from": "cards",
+        "localField": "_id",
+        "foreignField": "project_id",
+        "pipeline": [
+            {"$match": {"due_date": {"$type": "date"}}},
+            {"$sort": {"due_date": 1}},
+            {"$limit": 1},
+            {"$project": {"_id": 0, "due_date": 1}}
+        ],
+        "as": "next_due"
+    }})
+    projects = list(mongo.db.projects.aggregate(pipeline))
+
+    # 카운터가 아직 없는 기존 프로젝트는 한 번 세어서 채워 둠
+    missing = [project["_id"] for project in projects if "card_count" not in project]
+    if missing:
+        actual = init_card_counts(mongo, missing)
+        for project in projects:
+            if "card_count" not in project:
+                project["card_count"], project["card_counts"] = actual.get(project["_id"], (0, {}))
+
+    today = date.today()
+    for project in projects:
+        next_due = project.pop("next_due", [])
+        project["card_counts"] = {k: v for k, v in (project.get("card_counts") or {}).items() if v}
+        project["next_due_date"] = next_due[0]["due_date"] if next_due else None
+        project["d_day"] = format_d_day(project.get("deadline"), today)
+        project["next_due_d_day"] = format_d_day(project["next_due_date"], today)
+    return projects
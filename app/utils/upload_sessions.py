@@ -0,0 +1,176 @@
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from werkzeug.exceptions import ClientDisconnected
+from .helpers import logger
+from .images import READ_CHUNK, UploadError, _detect_extension, image_store
+
+# 클라이언트에 권장하는 조각 크기, 사용자당 동시에 열어 둘 수 있는 세션 수
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_OPEN_SESSIONS = 10
+
+
+class UploadSessions:
+    """끊겨도 이어서 올릴 수 있는 댓글 이미지 업로드 세션
+
+    1. create: 전체 크기를 알려 세션을 만듦 (upload_sessions 컬렉션)
+    2. write_chunk: offset부터 이어서 받아 <root>/<세션 id>.part에 기록, 받은 크기(received)는 DB에만 두어
+       어느 워커가 다음 조각을 받아도 됨
+    3. complete: 다 받으면 image_store로 옮기고(sha256 이름) image_filename을 기록
+    4. completed/abort: 댓글 작성 시 upload_id로 꺼내 쓰고 세션을 지움
+    완료되지 않은 세션은 expires_at이 지나면 TTL 인덱스로 지워지고, 남은 .part 파일은 sweep이 정리한다.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.chunk_size = UPLOAD_CHUNK_SIZE
+        self.ttl = timedelta(hours=24)
+
+    def init_app(self, root, chunk_size=UPLOAD_CHUNK_SIZE, ttl_seconds=24 * 60 * 60):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, upload_oid):
+        return os.path.join(self.root, f"{upload_oid}.part")
+
+    def create(self, mongo, user_oid, size):
+        if size <= 0:
+            raise UploadError("빈 파일입니다.")
+        if size > image_store.max_bytes:
+            raise UploadError(f"이미지는 {image_store.max_bytes // (1024 * 1024)}MB까지 올릴 수 있습니다.", 413)
+        if mongo.db.upload_sessions.count_documents({"user_id": user_oid, "status": "open"}) >= MAX_OPEN_SESSIONS:
+            raise UploadError("진행 중인 업로드가 너무 많습니다.", 429)
+
+        now = datetime.utcnow()
+        session = {
+            "user_id": user_oid,
+            "size": size,
+            "received": 0,
+            "status": "open",
+            "created_at": now,
+            "expires_at": now + self.ttl
+        }
+        session["_id"] = mongo.db.upload_sessions.insert_one(session).inserted_id
+        open(self._path(session["_id"]), "wb").close()
+        logger.info(f"Created upload session {session['_id']} ({size} bytes)")
+        return session
+
+    def get(self, mongo, user_oid, upload_oid):
+        return mongo.db.upload_sessions.find_one({"_id": upload_oid, "user_id": user_oid})
+
+    def write_chunk(self, mongo, session, offset, stream, length):
+        """offset부터 length 바이트를 받아 기록하고 새 received를 반환
+
+        offset이 received와 다르면 409 (클라이언트는 세션을 조회해 received부터 다시 보냄).
+        연결이 중간에 끊겨도 받은 만큼은 반영된다.
+        """
+        if session["status"] != "open":
+            raise UploadError("이미 완료된 업로드입니다.", 409)
+        if offset != session["received"]:
+            raise UploadError("업로드 위치가 맞지 않습니다.", 409)
+        if length <= 0 or offset + length > session["size"]:
+            raise UploadError("업로드 크기가 세션 크기를 넘습니다.", 413)
+
+        written = 0
+        try:
+            with open(self._path(session["_id"]), "r+b") as out:
+                out.seek(offset)
+                while written < length:
+                    chunk = stream.read(min(READ_CHUNK, length - written))
+                    if not chunk:
+                        break
+                    if offset == 0 and written == 0 and _detect_extension(chunk) is None:
+                        raise UploadError("지원하지 않는 이미지 형식입니다.")
+                    out.write(chunk)
+                    written += len(chunk)
+                out.truncate()
+        except ClientDisconnected:
+            logger.info(f"Upload session {session['_id']} disconnected after {offset + written} bytes")
+        if not written:
+            return offset
+
+        # 같은 위치를 먼저 반영한 요청이 있으면 실패 (중복 재전송은 같은 내용이므로 파일은 그대로 유효)
+        updated = mongo.db.upload_sessions.find_one_and_update(
+            {"_id": session["_id"], "status": "open", "received": offset},
+            {"$set": {"received": offset + written, "expires_at": datetime.utcnow() + self.ttl}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            raise UploadError("업로드 위치가 맞지 않습니다.", 409)
+        return updated["received"]
+
+    def complete(self, mongo, session):
+        """모두 받은 세션을 이미지 저장소로 옮기고 image_filename을 반환 (다시 호출해도 같은 결과)"""
+        if session["status"] == "complete":
+            return session["image_filename"]
+        if session["received"] != session["size"]:
+            raise UploadError(f"아직 {session['size'] - session['received']}바이트를 더 보내야 합니다.", 409)
+        claimed = mongo.db.upload_sessions.find_one_and_update(
+            {"_id": session["_id"], "status": "open", "received": session["size"]},
+            {"$set": {"status": "completing"}}
+        )
+        if not claimed:
+            raise UploadError("이미 처리 중인 업로드입니다.", 409)
+
+        # adopt는 실패해도 .part 파일을 지우므로, 어떤 오류든 세션을 open으로 되돌리지 않고 삭제함
+        # (completing으로 남으면 재시도도 취소도 안 되는 세션이 TTL까지 남음)
+        image_filename = None
+        try:
+            image_filename = image_store.adopt(self._path(session["_id"]))
+            mongo.db.upload_sessions.update_one(
+                {"_id": session["_id"]},
+                {"$set": {
+                    "status": "complete",
+                    "image_filename": image_filename,
+                    "expires_at": datetime.utcnow() + self.ttl
+                }}
+            )
+        except Exception as e:
+            logger.error(f"Failed to complete upload session {session['_id']}: {str(e)}")
+            self._discard(mongo, session, image_filename)
+            raise
+        logger.info(f"Completed upload session {session['_id']} as {image_filename}")
+        return image_filename
+
+    def _discard(self, mongo, session, image_filename):
+        try:
+            mongo.db.upload_sessions.delete_one({"_id": session["_id"]})
+            if image_filename:
+                image_store.release(mongo, image_filename)
+        except PyMongoError as e:
+            # 남은 세션 문서는 expires_at이 지나면 TTL 인덱스로 지워짐
+            logger.error(f"Failed to discard upload session {session['_id']}: {str(e)}")
+
+    def completed(self, mongo, user_oid, upload_oid):
+        """댓글에 붙일 완료된 세션, 없거나 완료 전이면 None
+
+        댓글을 저장한 뒤 abort로 지운다. (그 전까지는 세션이 이미지를 참조하고 있어 정리되지 않음)
+        """
+        return mongo.db.upload_sessions.find_one({"_id": upload_oid, "user_id": user_oid, "status": "complete"})
+
+    def abort(self, mongo, session):
+        mongo.db.upload_sessions.delete_one({"_id": session["_id"]})
+        try:
+            os.remove(self._path(session["_id"]))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, mongo):
+        """세션 문서가 없어진(만료된) .part 파일을 삭제하고 삭제한 개수를 반환"""
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".part"):
+                continue
+            upload_id = name[:-len(".part")]
+            if ObjectId.is_valid(upload_id) and mongo.db.upload_sessions.count_documents({"_id": ObjectId(upload_id)}, limit=1):
+                continue
+            os.remove(os.path.join(self.root, name))
+            removed += 1
+        return removed
+
+
+upload_sessions = UploadSessions()
@@ -0,0 +1,43 @@
+import os
+from .cache import TTLStore
+from .helpers import safe_object_id
+from .invalidation import invalidation_bus
+
+# user_id -> User 생성에 필요한 필드만 담은 문서
+user_cache = TTLStore(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('USER_CACHE_TTL', 300))
+)
+
+_PROJECTION = {"nickname": 1}
+
+
+def get_user_identity(mongo, user_id):
+    """로그인 세션 로딩용 사용자 정보 조회 (캐시 우선)"""
+    key = str(user_id)
+    cached = user_cache.get(key)
+    if cached is not None:
+        return cached
+
+    oid = safe_object_id(user_id)
+    if not oid:
+        return None
+
+    generation = user_cache.generation
+    user_data = mongo.db.users.find_one({"_id": oid}, _PROJECTION)
+    if user_data:
+        user_cache.set(key, user_data, generation)
+    return user_data
+
+
+def _evict(user_id):
+    user_cache.delete(str(user_id))
+
+
+def invalidate_user(user_id):
+    """닉네임 변경/계정 삭제 시 캐시 무효화 (다른 워커에도 invalidation_bus로 전달)"""
+    _evict(user_id)
+    invalidation_bus.publish("user", user_id=user_id)
+
+
+invalidation_bus.subscribe("user", _evict, user_cache.clear)
@@ -0,0 +1,105 @@
+"""카드 목록 JSON 응답 생성 시간 비교
+
+카드 N개(기본 10,000개)로 get_all_cards와 같은 응답을 만들 때
+- 기존 경로: 라우트 안의 dict 변환 + Flask-PyMongo의 bson.json_util 기반 jsonify
+- 표준 json: 같은 dict + Flask 기본 JSON 공급자
+- FastJSONProvider: serialize_card + app.utils.serialize (orjson)
+의 소요 시간을 비교한다. MongoDB 없이 실행된다.
+
+    python benchmarks/serialize_cards.py --cards 10000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from flask import Flask, jsonify  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from flask_pymongo.helpers import BSONProvider  # noqa: E402
+from app.utils.serialize import FastJSONProvider, orjson, serialize_card  # noqa: E402
+
+
+def make_cards(count):
+    project_ids = [ObjectId() for _ in range(20)]
+    user_ids = [ObjectId() for _ in range(10)]
+    now = datetime.utcnow()
+    cards = []
+    for i in range(count):
+        card = {
+            "_id": ObjectId(),
+            "project_id": random.choice(project_ids),
+            "title": f"카드 {i} - 로그인 화면 개선",
+            "description": "세부 작업 내용을 적는 설명입니다. " * random.randint(0, 4),
+            "status": random.choice(["todo", "in_progress", "done"]),
+            "created_by": random.choice(user_ids),
+            "created_at": now - timedelta(minutes=i),
+            "rank": f"{i:08d}",
+        }
+        if i % 3 == 0:
+            card["due_date"] = now + timedelta(days=i % 30)
+        cards.append(card)
+    return cards
+
+
+def legacy_card(card):
+    # 기존 라우트에 복사되어 있던 변환
+    return {
+        "id": str(card["_id"]),
+        "title": card["title"],
+        "description": card["description"],
+        "status": card["status"],
+        "project_id": str(card["project_id"]),
+        "created_by": str(card["created_by"]),
+        "created_at": card["created_at"].strftime("%H:%M:%S"),
+        "rank": card.get("rank"),
+        "due_date": card["due_date"].strftime("%Y-%m-%d") if card.get("due_date") else None
+    }
+
+
+def measure(app, convert, cards, repeat):
+    timings = []
+    size = 0
+    with app.test_request_context("/projects/all/cards"):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = jsonify({"cards": [convert(card) for card in cards]})
+            body = response.get_data()
+            timings.append(time.perf_counter() - started)
+            size = len(body)
+    return timings, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cards = make_cards(args.cards)
+    cases = [
+        ("bson.json_util (기존)", BSONProvider, legacy_card),
+        ("Flask 기본 json", DefaultJSONProvider, legacy_card),
+        (f"FastJSONProvider ({'orjson' if orjson else 'json'})", FastJSONProvider, serialize_card),
+    ]
+
+    print(f"cards={args.cards} repeat={args.repeat}")
+    baseline = None
+    for name, provider, convert in cases:
+        app = Flask(__name__)
+        app.json = provider(app)
+        timings, size = measure(app, convert, cards, args.repeat)
+        ms = [value * 1000 for value in timings]
+        median = statistics.median(ms)
+        baseline = baseline or median
+        print(f"{name:28} median={median:8.2f}ms min={min(ms):8.2f}ms "
+              f"size={size / 1024:8.1f}KB x{baseline / median:.1f}")
+
+
+if __name__ == "__main__":
+    main()
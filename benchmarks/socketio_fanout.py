@@ -0,0 +1,89 @@
+"""워커 간 Socket.IO 메시지 전달 지연 측정
+
+UnixSocketManager로 N개의 워커 프로세스(수신자)에 메시지를 보내고,
+각 워커가 메시지를 받기까지 걸린 시간의 분포를 출력한다.
+
+    python benchmarks/socketio_fanout.py --workers 4 --messages 2000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.pubsub import UnixSocketManager  # noqa: E402
+
+CHANNEL = "bench"
+
+
+def worker(url, messages, results):
+    manager = UnixSocketManager(url, channel=CHANNEL)
+    latencies = []
+    for payload in manager._listen():
+        received = time.time()
+        latencies.append(received - json.loads(payload)["sent"])
+        if len(latencies) >= messages:
+            break
+    results.put(latencies)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=200, help="이벤트 데이터 크기(바이트)")
+    parser.add_argument("--interval", type=float, default=0.0005, help="메시지 간격(초)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="socketio-bench-")
+    url = f"unix://{directory}"
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(url, args.messages, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    publisher = UnixSocketManager(url, channel=CHANNEL, write_only=True)
+    deadline = time.time() + 10
+    while len(publisher._peers()) < args.workers:
+        if time.time() > deadline:
+            raise SystemExit("워커 소켓이 준비되지 않았습니다.")
+        time.sleep(0.01)
+
+    body = "x" * args.size
+    started = time.time()
+    for _ in range(args.messages):
+        publisher._publish({"method": "emit", "event": "bench", "data": body, "sent": time.time()})
+        if args.interval:
+            time.sleep(args.interval)
+    elapsed = time.time() - started
+
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get(timeout=30))
+    for process in processes:
+        process.join()
+
+    ms = [value * 1000 for value in latencies]
+    delivered = len(ms)
+    expected = args.workers * args.messages
+    print(f"workers={args.workers} messages={args.messages} size={args.size}B")
+    print(f"delivered {delivered}/{expected} in {elapsed:.2f}s ({expected / elapsed:.0f} deliveries/s)")
+    print(f"latency ms: p50={statistics.median(ms):.3f} p95={percentile(ms, 95):.3f} "
+          f"p99={percentile(ms, 99):.3f} max={max(ms):.3f}")
+
+
+if __name__ == "__main__":
+    main()